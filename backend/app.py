@@ -2,27 +2,66 @@
 Mochi Flask Backend
 ====================
 Run:  python app.py
+      gunicorn -c gunicorn.conf.py   (async serving, see asgi.py)
 Seed: python seed.py
 """
 
-from flask import Flask, jsonify
+import logging
+import time
+import uuid
+from flask import Flask, Response, g, jsonify, request
 from flask_cors import CORS
 from config import Config
 from revisionGamesBackend import revision_config
+from revisionGamesBackend.json_provider import make_json_provider
+from revisionGamesBackend.compression import compress_response
+from revisionGamesBackend.metrics import HTTP_REQUESTS, HTTP_SECONDS, render_prometheus
 from revisionGamesBackend.routes import revision_games_bp
 
+logger = logging.getLogger(__name__)
+
+CORS_ORIGINS = [Config.FRONTEND_URL, "http://localhost:5173", "http://localhost:3000", "http://localhost:8080"]
+
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
-    CORS(app, origins=[Config.FRONTEND_URL, "http://localhost:5173", "http://localhost:3000", "http://localhost:8080"])
+    app.json = make_json_provider(app)
+    CORS(app, origins=CORS_ORIGINS)
 
     # Initialise Revision Games tables
-    #revision_config.init_db()
+    if Config.DB_ENABLED:
+        revision_config.init_db()
 
     # Register Revision Games blueprint
     app.register_blueprint(revision_games_bp)
 
+    # ──────────────────────────────────────
+    # REQUEST IDS & METRICS
+    # ──────────────────────────────────────
+
+    @app.before_request
+    def start_request():
+        g.request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def finish_request(response):
+        elapsed = time.perf_counter() - g.get("request_started", time.perf_counter())
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        HTTP_REQUESTS.inc(request.method, endpoint, str(response.status_code))
+        HTTP_SECONDS.observe(elapsed, request.method, endpoint)
+        response.headers["X-Request-ID"] = g.get("request_id", "")
+        logger.info(f"⏱️ [{g.get('request_id')}] {request.method} {request.path} {response.status_code} {elapsed * 1000:.1f}ms")
+        return response
+
+    # Registered last so it runs first, and the timing above includes it
+    app.after_request(compress_response)
+
+    @app.route("/api/metrics", methods=["GET"])
+    def metrics():
+        return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
     # ──────────────────────────────────────
     # HEALTH CHECK
     # ──────────────────────────────────────
@@ -0,0 +1,147 @@
+"""
+Mochi ASGI Entry Point
+=======================
+Async serving mode. POST /api/generate and POST /api/feedback are served by
+the coroutine views in revisionGamesBackend/async_routes.py, so a worker
+waiting on Gemini holds no thread and one process keeps hundreds of model
+calls in flight. Every other request (including CORS preflights) goes to the
+Flask app from create_app(), run on ASGI_WSGI_THREADS threads by a2wsgi.
+Buffered responses from the coroutine views are compressed the same way as
+the Flask ones (see compression); streams are sent as they are.
+
+Run:  gunicorn -c gunicorn.conf.py
+      uvicorn asgi:app --port 5000          (single process, for development)
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from a2wsgi import WSGIMiddleware
+from config import Config
+from app import create_app, CORS_ORIGINS
+from revisionGamesBackend.async_routes import ASYNC_ROUTES, MAX_BODY_BYTES, AsyncRequest, json_response
+from revisionGamesBackend.metrics import HTTP_REQUESTS, HTTP_SECONDS
+from revisionGamesBackend.compression import compressible, negotiate, compress
+
+logger = logging.getLogger(__name__)
+
+
+class MochiASGI:
+    """Routes the async endpoints to coroutines and everything else to Flask."""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = WSGIMiddleware(flask_app, workers=Config.ASGI_WSGI_THREADS)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] == "http":
+            view = ASYNC_ROUTES.get((scope["method"], scope["path"]))
+            if view is not None:
+                return await self._serve(view, scope, receive, send)
+        return await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    @staticmethod
+    async def _read_body(receive):
+        """The request body, or None if it is over MAX_BODY_BYTES or the client went away."""
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return None
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            if size > MAX_BODY_BYTES:
+                return None
+            if not message.get("more_body"):
+                return b"".join(chunks)
+
+    async def _serve(self, view, scope, receive, send):
+        started = time.perf_counter()
+        request = AsyncRequest(scope, b"")
+        request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+
+        body = await self._read_body(receive)
+        if body is None:
+            response = json_response({"error": "Request body too large."}, 413)
+        else:
+            request.body = body
+            response = await view(request)
+
+        headers = dict(response.headers, **{"X-Request-ID": request_id})
+        vary = []
+        origin = request.headers.get("Origin")
+        if origin in CORS_ORIGINS:
+            headers["Access-Control-Allow-Origin"] = origin
+            vary.append("Origin")
+
+        # Same negotiation as compression.compress_response; streams stay uncompressed
+        body = response.body
+        if response.stream is None and compressible(headers["Content-Type"], len(body)):
+            vary.append("Accept-Encoding")
+            encoding = negotiate(request.accept_encodings)
+            if encoding:
+                body = await asyncio.to_thread(compress, body, encoding)
+                headers["Content-Encoding"] = encoding
+        if vary:
+            headers["Vary"] = ", ".join(vary)
+
+        await send({
+            "type": "http.response.start",
+            "status": response.status,
+            "headers": [(k.lower().encode("latin-1"), str(v).encode("latin-1")) for k, v in headers.items()],
+        })
+
+        if response.stream is None:
+            await send({"type": "http.response.body", "body": body})
+        else:
+            await self._send_stream(response.stream, receive, send)
+
+        elapsed = time.perf_counter() - started
+        HTTP_REQUESTS.inc(request.method, request.path, str(response.status))
+        HTTP_SECONDS.observe(elapsed, request.method, request.path)
+        logger.info(f"⏱️ [{request_id}] {request.method} {request.path} {response.status} {elapsed * 1000:.1f}ms")
+
+    @staticmethod
+    async def _send_stream(stream, receive, send):
+        """Send chunks as they come; stop generating (cancelling its work) if the client disconnects."""
+        async def pump():
+            async for chunk in stream:
+                await send({"type": "http.response.body",
+                            "body": chunk.encode("utf-8") if isinstance(chunk, str) else chunk,
+                            "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+
+        async def disconnected():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+
+        sending = asyncio.ensure_future(pump())
+        watching = asyncio.ensure_future(disconnected())
+        try:
+            await asyncio.wait({sending, watching}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            watching.cancel()
+            if not sending.done():
+                sending.cancel()
+                logger.info("⏱️ Client went away mid-stream; generation cancelled.")
+            await asyncio.gather(sending, return_exceptions=True)
+            await stream.aclose()
+
+
+def create_asgi_app() -> MochiASGI:
+    return MochiASGI(create_app())
+
+
+app = create_asgi_app()
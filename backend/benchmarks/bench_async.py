@@ -0,0 +1,159 @@
+"""
+Async serving benchmark
+========================
+Shows how many model calls one process keeps in flight. The fake backend
+answers every call after a fixed latency. The same burst of concurrent
+requests is sent to:
+
+- sync:  the Flask views, on --threads threads (a gthread worker)
+- async: the coroutine views behind asgi.py, on one event loop
+
+The sync phases send fewer requests (8 per thread for feedback, 2 for
+generate) to keep the run short; compare throughput and in-flight peaks.
+The sync feedback view is further capped by FEEDBACK_MAX_WORKERS, the
+thread pool that lets it stop waiting at the latency budget.
+
+Reported per phase: latency, throughput and the peak number of model calls
+in flight at once (sampled from the call governors). Requests go through
+httpx's in-memory ASGI transport, so no sockets are involved.
+
+Run from backend/:  python -m benchmarks.bench_async [--requests 500] [--latency 1000] [--threads 16]
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+import tracemalloc
+from benchmarks.harness import use_offline_env, Phase, print_table
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500, help="concurrent /api/feedback requests")
+    parser.add_argument("--games", type=int, default=100, help="concurrent /api/generate requests")
+    parser.add_argument("--latency", type=int, default=1000, help="fake model latency (ms)")
+    parser.add_argument("--threads", type=int, default=16, help="threads for the sync phase")
+    return parser.parse_args()
+
+
+class PeakSampler:
+    """Tracks the highest in-flight count seen across the given governors."""
+
+    def __init__(self, governors):
+        self.governors = governors
+        self.peak = 0
+
+    def sample(self):
+        self.peak = max(self.peak, sum(g.stats()["in_flight"] for g in self.governors))
+
+    def run_in_thread(self, stop: threading.Event):
+        def loop():
+            while not stop.is_set():
+                self.sample()
+                time.sleep(0.005)
+        thread = threading.Thread(target=loop, daemon=True)
+        thread.start()
+        return thread
+
+    async def run_in_loop(self):
+        while True:
+            self.sample()
+            await asyncio.sleep(0.005)
+
+
+def feedback_body(i: int, phase: str) -> dict:
+    # Unique answers, so every request misses the feedback cache
+    return {"user_answer": f"{phase} answer {i}", "correct_answer": "Apple", "target_item": "Fruit"}
+
+
+def game_body(i: int, phase: str) -> dict:
+    return {"gameTopic": f"{phase} topic {i}", "subject": "Counting", "description": "1 questions"}
+
+
+def sync_phase(name, flask_app, path, bodies, threads, governors):
+    client = flask_app.test_client()
+    sampler = PeakSampler(governors)
+    stop = threading.Event()
+    sampler_thread = sampler.run_in_thread(stop)
+
+    def worker(i, phase):
+        for body in bodies[i::threads]:
+            start = time.perf_counter()
+            response = client.post(path, json=body)
+            phase.record(time.perf_counter() - start, response.status_code)
+
+    phase = Phase(name).run(threads, worker)
+    stop.set()
+    sampler_thread.join()
+    return phase.summary(), sampler.peak
+
+
+async def async_phase(name, asgi_app, path, bodies, governors):
+    import httpx
+
+    phase = Phase(name)
+    sampler = PeakSampler(governors)
+    sampling = asyncio.ensure_future(sampler.run_in_loop())
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=asgi_app), base_url="http://bench",
+                                 timeout=None) as client:
+        async def one(body):
+            start = time.perf_counter()
+            response = await client.post(path, json=body)
+            phase.record(time.perf_counter() - start, response.status_code)
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        await asyncio.gather(*(one(body) for body in bodies))
+        phase.wall = time.perf_counter() - started
+        phase.peak_mb = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        tracemalloc.stop()
+
+    sampling.cancel()
+    return phase.summary(), sampler.peak
+
+
+def main():
+    args = parse_args()
+    use_offline_env(
+        FAKE_TEXT_LATENCY=f"fixed:{args.latency}",
+        FAKE_IMAGE_LATENCY=f"fixed:{args.latency}",
+        # Let the governors admit everything, so the serving model is the only limit
+        MODEL_TEXT_RPS=0, MODEL_TEXT_CONCURRENCY=10_000,
+        MODEL_IMAGE_RPS=0, MODEL_IMAGE_CONCURRENCY=10_000,
+        FEEDBACK_LATENCY_BUDGET=600,
+        FEEDBACK_PRECOMPUTE=0,
+        IMAGE_VARIANTS_ENABLED=0,
+        GAME_BANK_ENABLED=0,
+        FAKE_IMAGE_BYTES=2000,
+    )
+
+    from asgi import app as asgi_app  # noqa: E402 (reads the environment above)
+    from revisionGamesBackend.gemini_services import text_governor, image_governor  # noqa: E402
+    governors = [text_governor, image_governor]
+
+    rows, peaks = [], {}
+    sync_count = min(args.requests, args.threads * 8)
+    for name, path, count, make in [
+        ("feedback", "/api/feedback", (sync_count, args.requests), feedback_body),
+        ("generate", "/api/generate", (min(args.games, args.threads * 2), args.games), game_body),
+    ]:
+        label = f"sync {name} ({args.threads} threads)"
+        summary, peaks[label] = sync_phase(label, asgi_app.flask_app, path,
+                                           [make(i, "sync") for i in range(count[0])], args.threads, governors)
+        rows.append(summary)
+
+        label = f"async {name}"
+        summary, peaks[label] = asyncio.run(async_phase(label, asgi_app, path,
+                                                        [make(i, "async") for i in range(count[1])], governors))
+        rows.append(summary)
+
+    print_table(rows)
+    print()
+    for label, peak in peaks.items():
+        print(f"{label:<34} peak model calls in flight: {peak}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+End-to-end endpoint benchmark
+==============================
+Drives the Flask app from create_app() against the offline fake model
+backend: N teachers generating games concurrently, then a classroom of
+children tapping answers (feedback) and health checks. Reports p50/p95/p99
+latency, throughput and peak traced memory per endpoint.
+
+Run from backend/:
+    python -m benchmarks.bench_endpoints --teachers 4 --children 30
+    python -m benchmarks.bench_endpoints --json results.json     # for CI
+"""
+
+import argparse
+import json
+import time
+from benchmarks.harness import use_offline_env, Phase, print_table
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--teachers", type=int, default=4, help="concurrent teachers calling /api/generate")
+    parser.add_argument("--games", type=int, default=2, help="games generated per teacher")
+    parser.add_argument("--questions", type=int, default=3, help="questions per generated game")
+    parser.add_argument("--children", type=int, default=30, help="concurrent children calling /api/feedback")
+    parser.add_argument("--taps", type=int, default=10, help="answers tapped per child")
+    parser.add_argument("--text-latency", default="lognormal:80,0.3", help="fake text latency spec (ms)")
+    parser.add_argument("--image-latency", default="lognormal:400,0.4", help="fake image latency spec (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fake backend error rate")
+    parser.add_argument("--image-bytes", type=int, default=150_000, help="fake image size")
+    parser.add_argument("--no-image-cache", action="store_true", help="disable the generated image cache")
+    parser.add_argument("--json", help="write the results to this file")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    use_offline_env(
+        FAKE_TEXT_LATENCY=args.text_latency,
+        FAKE_IMAGE_LATENCY=args.image_latency,
+        FAKE_ERROR_RATE=args.error_rate,
+        FAKE_IMAGE_BYTES=args.image_bytes,
+        IMAGE_CACHE_ENABLED="0" if args.no_image_cache else "1",
+        FEEDBACK_PRECOMPUTE="0",
+    )
+
+    from app import create_app
+    app = create_app()
+    app.logger.disabled = True
+
+    def teacher(i, phase):
+        client = app.test_client()
+        for g in range(args.games):
+            body = {
+                "gameTopic": f"Topic {i}-{g}",
+                "subject": "Counting",
+                "description": f"Count things, {args.questions} questions",
+            }
+            start = time.perf_counter()
+            response = client.post("/api/generate", json=body)
+            phase.record(time.perf_counter() - start, response.status_code)
+
+    def child(i, phase):
+        client = app.test_client()
+        for t in range(args.taps):
+            body = {
+                "user_answer": f"{(i + t) % 3 + 1} apples",
+                "correct_answer": "2 apples",
+                "target_item": "Can you find the picture with 2 apples?",
+            }
+            start = time.perf_counter()
+            response = client.post("/api/feedback", json=body)
+            phase.record(time.perf_counter() - start, response.status_code)
+
+    def health(i, phase):
+        client = app.test_client()
+        for _ in range(args.taps):
+            start = time.perf_counter()
+            response = client.get("/api/health")
+            phase.record(time.perf_counter() - start, response.status_code)
+
+    results = [
+        Phase("POST /api/generate").run(args.teachers, teacher).summary(),
+        Phase("POST /api/feedback").run(args.children, child).summary(),
+        Phase("GET /api/health").run(args.children, health).summary(),
+    ]
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
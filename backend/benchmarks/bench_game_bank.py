@@ -0,0 +1,64 @@
+"""
+Game bank micro-benchmark
+==========================
+Builds an in-memory GameBank of synthetic games and times indexing and
+similarity lookups, reporting the index's memory footprint.
+
+Run from backend/:  python -m benchmarks.bench_game_bank [--games 100000] [--queries 500]
+"""
+
+import argparse
+import random
+import time
+from revisionGamesBackend.game_bank import GameBank
+
+TOPICS = ["apples", "bananas", "ducks", "balloons", "cars", "stars", "fish", "cats", "trains", "shoes"]
+VERBS = ["Count", "Find", "Match", "Spot", "Sort"]
+COLOURS = ["red", "blue", "green", "yellow", "orange", "purple"]
+SUBJECTS = ["Counting", "Colours", "Shapes", "Animals", "Letters"]
+
+
+def synthetic_request(rng: random.Random):
+    topic = rng.choice(TOPICS)
+    colour = rng.choice(COLOURS)
+    game_topic = f"{rng.choice(VERBS)} {colour} {topic}"
+    description = f"{rng.randint(1, 9)} questions about {colour} {topic} number {rng.randint(1, 10_000)}"
+    return game_topic, rng.choice(SUBJECTS), description
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=100_000, help="synthetic games in the bank")
+    parser.add_argument("--queries", type=int, default=500, help="lookups to time")
+    parser.add_argument("--dims", type=int, default=256, help="vector dimensions")
+    args = parser.parse_args()
+
+    rng = random.Random(13)
+    bank = GameBank(path=None, dims=args.dims)
+    games = [synthetic_request(rng) + ([],) for _ in range(args.games)]
+
+    start = time.perf_counter()
+    bank.add_many(games)
+    build_s = time.perf_counter() - start
+
+    queries = [synthetic_request(rng) for _ in range(args.queries)]
+    hits = 0
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        if bank.find(*query, threshold=0.85):
+            hits += 1
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    used_mb = len(bank) * args.dims * 4 / 1e6
+    allocated_mb = bank._matrix.nbytes / 1e6
+    print(f"games indexed:   {len(bank):,} in {build_s:.2f}s ({build_s / args.games * 1e6:.1f} µs/game)")
+    print(f"index memory:    {used_mb:.1f} MB used, {allocated_mb:.1f} MB allocated ({args.dims} float32 dims)")
+    print(f"lookup p50/p95:  {latencies[len(latencies) // 2] * 1000:.2f} / "
+          f"{latencies[int(len(latencies) * 0.95)] * 1000:.2f} ms")
+    print(f"hits >= 0.85:    {hits}/{args.queries}")
+
+
+if __name__ == "__main__":
+    main()
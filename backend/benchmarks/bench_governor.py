@@ -0,0 +1,80 @@
+"""
+Call governor benchmark
+========================
+Drives the fake backend with injected 429s (carrying a retry-after) and
+compares calling it directly with calling it through a CallGovernor:
+success rate, latency and upstream attempts. A second scenario takes the
+upstream down completely and shows the circuit breaker failing calls fast.
+
+Run from backend/:  python -m benchmarks.bench_governor [--calls 200] [--error-rate 0.3]
+"""
+
+import argparse
+import time
+from benchmarks.harness import use_offline_env, Phase, print_table
+
+use_offline_env()
+
+from revisionGamesBackend.call_governor import CallGovernor  # noqa: E402
+from revisionGamesBackend.model_backends import FakeBackend  # noqa: E402
+
+
+def make_backend(error_rate: float, seed: int) -> FakeBackend:
+    return FakeBackend(image_latency="lognormal:50,0.3", error_rate=error_rate,
+                       image_bytes=1000, seed=seed, error_status=429, retry_after=0.05)
+
+
+def make_governor(name: str) -> CallGovernor:
+    return CallGovernor(name, rate=200, burst=20, max_concurrency=16, max_retries=4,
+                        base_delay=0.02, max_delay=0.5, failure_threshold=8, reset_timeout=1.0)
+
+
+def drive(name: str, call, workers: int, calls_per_worker: int) -> Phase:
+    def worker(i, phase):
+        for n in range(calls_per_worker):
+            start = time.perf_counter()
+            try:
+                call(f"prompt {i}-{n}")
+                status = 200
+            except Exception as e:
+                status = getattr(e, "status", None) or 500
+            phase.record(time.perf_counter() - start, status)
+
+    return Phase(name).run(workers, worker)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200, help="calls per scenario")
+    parser.add_argument("--workers", type=int, default=20, help="concurrent callers")
+    parser.add_argument("--error-rate", type=float, default=0.3, help="injected 429 rate")
+    args = parser.parse_args()
+    per_worker = max(1, args.calls // args.workers)
+
+    rows, attempts = [], {}
+
+    backend = make_backend(args.error_rate, seed=1)
+    rows.append(drive("direct", lambda p: backend.generate_image("fake", p),
+                      args.workers, per_worker).summary())
+    attempts["direct"] = backend.calls["image"]
+
+    backend = make_backend(args.error_rate, seed=1)
+    governor = make_governor("governed")
+    rows.append(drive("governed", lambda p: governor.call(backend.generate_image, "fake", p),
+                      args.workers, per_worker).summary())
+    attempts["governed"] = backend.calls["image"]
+
+    backend = make_backend(1.0, seed=1)
+    governor = make_governor("outage")
+    rows.append(drive("outage (breaker)", lambda p: governor.call(backend.generate_image, "fake", p),
+                      args.workers, per_worker).summary())
+    attempts["outage (breaker)"] = backend.calls["image"]
+
+    print_table(rows)
+    print()
+    for name, count in attempts.items():
+        print(f"{name:<18} upstream attempts: {count}")
+
+
+if __name__ == "__main__":
+    main()
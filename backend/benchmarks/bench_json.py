@@ -0,0 +1,103 @@
+"""
+JSON serialization and compression benchmark
+=============================================
+For typical response bodies, compares:
+
+- serialization time of Flask's stdlib JSON provider vs OrjsonProvider
+  (the full jsonify path, response object included)
+- bytes on the wire uncompressed, gzipped and brotli-compressed (when the
+  `brotli` package is installed), and the time each encoding takes
+
+Payloads: generated games from the fake backend, with images as asset URLs
+(IMAGE_DELIVERY=url) and inlined as data URIs, a question page and a
+category page as the list endpoints return them.
+
+Run from backend/:  python -m benchmarks.bench_json [--questions 5] [--page 50] [--image-bytes 150000]
+"""
+
+import argparse
+import time
+from benchmarks.harness import use_offline_env
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=5, help="questions per generated game")
+    parser.add_argument("--page", type=int, default=50, help="rows per list page")
+    parser.add_argument("--image-bytes", type=int, default=150000, help="fake image size for the data URI game")
+    return parser.parse_args()
+
+
+def timed_ms(fn, min_seconds: float = 0.2) -> float:
+    """Mean ms per call, repeating until at least min_seconds have passed."""
+    fn()
+    runs, start = 0, time.perf_counter()
+    while True:
+        fn()
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / runs * 1000
+
+
+def question_page(n: int) -> list:
+    return [{
+        "id": 1000 + i, "category_id": 7, "target_item": f"Can you find the picture with {i % 9 + 1} apples?",
+        "correct_answer": f"{i % 9 + 1} apples", "audio_url": None,
+        "options": [{"id": 5000 + 3 * i + k, "label": f"{(i + k) % 9 + 1} apples",
+                     "image_url": f"/api/images/{(i * 3 + k):032x}?w=512"} for k in range(3)],
+    } for i in range(n)]
+
+
+def category_page(n: int) -> list:
+    return [{"id": i, "name": f"Category {i}", "description": "Count and learn numbers",
+             "icon_url": "https://images.unsplash.com/photo-1509228468518-180dd4864904?w=400&h=300&fit=crop",
+             "color": "bg-blue-100"} for i in range(n)]
+
+
+def main():
+    args = parse_args()
+    use_offline_env(FAKE_TEXT_LATENCY="fixed:0", FAKE_IMAGE_LATENCY="fixed:0", FAKE_IMAGE_BYTES=args.image_bytes,
+                    IMAGE_VARIANTS_ENABLED=0, FEEDBACK_PRECOMPUTE=0, GAME_BANK_ENABLED=0)
+
+    from flask import Flask  # noqa: E402 (reads the environment above)
+    from flask.json.provider import DefaultJSONProvider  # noqa: E402
+    from config import Config  # noqa: E402
+    from revisionGamesBackend.gemini_services import generate_questions  # noqa: E402
+    from revisionGamesBackend.json_provider import OrjsonProvider, orjson  # noqa: E402
+    from revisionGamesBackend.compression import compress, encodings  # noqa: E402
+
+    if orjson is None:
+        print("orjson is not installed; the orjson column uses the stdlib fallback.")
+    description = f"{args.questions} questions"
+    payloads = [("generated game (image URLs)", generate_questions("Apples", "Counting", description))]
+    Config.IMAGE_DELIVERY = "data_uri"
+    payloads.append(("generated game (data URIs)", generate_questions("Pears", "Counting", description)))
+    payloads.append((f"question page ({args.page})", question_page(args.page)))
+    payloads.append((f"category page ({args.page})", category_page(args.page)))
+
+    app = Flask(__name__)
+    providers = {"stdlib": DefaultJSONProvider(app), "orjson": OrjsonProvider(app)}
+    available = encodings()
+
+    header = f"{'payload':<28} {'stdlib ms':>9} {'orjson ms':>9} {'speedup':>7} {'raw KB':>9}"
+    for encoding in ("gzip", "br"):
+        header += f" {encoding + ' KB':>8} {encoding + ' ms':>7}"
+    print(header)
+    for name, payload in payloads:
+        with app.app_context():
+            ms = {label: timed_ms(lambda p=provider: p.response(payload)) for label, provider in providers.items()}
+            body = providers["orjson"].response(payload).get_data()
+        row = (f"{name:<28} {ms['stdlib']:>9.3f} {ms['orjson']:>9.3f} {ms['stdlib'] / ms['orjson']:>6.1f}x"
+               f" {len(body) / 1024:>9.1f}")
+        for encoding in ("gzip", "br"):
+            if encoding in available:
+                size = len(compress(body, encoding))
+                row += f" {size / 1024:>8.1f} {timed_ms(lambda e=encoding: compress(body, e)):>7.2f}"
+            else:
+                row += f" {'n/a':>8} {'n/a':>7}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Safety matcher micro-benchmark
+===============================
+Compares the compiled SafetyMatcher with the old per-term substring scan, for
+blocklists from the bundled size up to thousands of terms.
+
+Before timing anything, the bundled blocklist is checked against
+safety_false_positives.txt (ordinary preschool phrases that must stay
+allowed) and a few phrases that must stay blocked; the run exits non-zero
+if either list fails.
+
+Run from backend/:  python -m benchmarks.bench_safety [--checks 2000]
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import time
+from revisionGamesBackend.safety import SafetyMatcher, build_matcher, load_blocklist, DEFAULT_BLOCKLIST_PATH
+
+FALSE_POSITIVES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "safety_false_positives.txt")
+
+MUST_BLOCK = [
+    "Count the guns on the table",
+    "A killer clown",
+    "Two people fighting",
+    "Soldiers at war",
+    "A bloody knife",
+    "Drugs and cigarettes",
+    "Pillow fighters with knives",
+    # Inflections and compounds of the original list's terms
+    "Count the deaths",
+    "deathly",
+    "warfare toys",
+    "Show me the warships",
+    "gunshot sounds",
+    "bloodshed",
+    "A bloodbath",
+    "swordfight",
+    "weaponry",
+    "scariest",
+    "A gunfight at noon",
+    "Swords and daggers",
+    "Killers on the loose",
+    "A fistfight in the playground",
+]
+
+SAMPLE_TEXTS = [
+    "Counting Apples",
+    "Learn to count red apples from one to five with Mochi",
+    "Exactly 2 bright red apples isolated on a plain white background",
+    "A warm sunny day at the farm with three fluffy sheep",
+    "Colours of the rainbow: find the picture with the blue balloon",
+    "Exactly 3 orange carrots isolated on a plain white background",
+]
+
+
+def check_regressions() -> bool:
+    """Print any false positive or missed block for the bundled list; True when there are none."""
+    matcher = build_matcher()
+    ok = True
+    for text in load_blocklist(FALSE_POSITIVES_PATH):
+        term = matcher.find(text)
+        if term:
+            print(f"FALSE POSITIVE: {text!r} blocked on {term!r}")
+            ok = False
+    for text in MUST_BLOCK:
+        if matcher.is_safe(text):
+            print(f"NOT BLOCKED: {text!r}")
+            ok = False
+    return ok
+
+
+def synthetic_terms(n: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    terms = set(load_blocklist(DEFAULT_BLOCKLIST_PATH))
+    while len(terms) < n:
+        length = rng.randint(4, 12)
+        terms.add("".join(rng.choice(string.ascii_lowercase) for _ in range(length)))
+    return sorted(terms)
+
+
+def substring_is_safe(terms, text):
+    normalized = text.lower().strip()
+    return not any(word in normalized for word in terms)
+
+
+def timed(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checks", type=int, default=2000, help="texts checked per measurement")
+    args = parser.parse_args()
+
+    if not check_regressions():
+        sys.exit(1)
+    print("Regression lists pass.")
+
+    texts = [SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)] for i in range(args.checks)]
+    print(f"{'terms':>7} {'compile ms':>11} {'regex µs/text':>14} {'batch µs/text':>14} {'substring µs/text':>18}")
+    for n in (len(build_matcher().terms), 1000, 5000, 20000):
+        terms = synthetic_terms(n)
+
+        start = time.perf_counter()
+        matcher = SafetyMatcher(terms)
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        single = timed(lambda: [matcher.is_safe(t) for t in texts], 3) / len(texts) * 1e6
+        batch = timed(lambda: matcher.check_batch(texts), 3) / len(texts) * 1e6
+        naive = timed(lambda: [substring_is_safe(terms, t) for t in texts], 1) / len(texts) * 1e6
+        print(f"{len(terms):>7} {compile_ms:>11.1f} {single:>14.2f} {batch:>14.2f} {naive:>18.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Startup benchmark
+==================
+How long a fresh worker takes to become useful. Each run starts a new
+interpreter (so nothing is already imported) and times, in order:
+
+- import:   `from app import create_app`
+- create:   create_app()
+- health:   the first GET /api/health
+- warm_up:  gemini_services.warm_up(), i.e. building the model client
+- feedback: the first POST /api/feedback (fake backend only)
+
+and reports the median of --runs runs, which heavy modules were loaded after
+the first health check, and the modules with the most import time
+(`python -X importtime`, from the last run).
+
+With --backend gemini the client is built with a dummy key and no request is
+sent, so the run stays offline.
+
+Run from backend/:  python -m benchmarks.bench_startup [--runs 5] [--backend fake] [--top 15]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules create_app() should not need; each is reported as loaded or not
+HEAVY_MODULES = ("google.genai", "numpy", "PIL.Image", "httpx")
+
+PROBE = """
+import json, sys, time
+timings = {}
+started = time.perf_counter()
+from app import create_app
+timings["import"] = time.perf_counter() - started
+
+mark = time.perf_counter()
+app = create_app()
+timings["create"] = time.perf_counter() - mark
+
+client = app.test_client()
+mark = time.perf_counter()
+assert client.get("/api/health").status_code == 200
+timings["health"] = time.perf_counter() - mark
+loaded = {name: name in sys.modules for name in HEAVY_MODULES}
+
+from revisionGamesBackend.gemini_services import warm_up
+mark = time.perf_counter()
+warm_up()
+timings["warm_up"] = time.perf_counter() - mark
+
+if FEEDBACK:
+    mark = time.perf_counter()
+    response = client.post("/api/feedback", json={"user_answer": "Pear", "correct_answer": "Apple", "target_item": "Fruit"})
+    assert response.status_code == 200, response.status_code
+    timings["feedback"] = time.perf_counter() - mark
+
+timings["total"] = time.perf_counter() - started
+print(json.dumps({"timings": timings, "loaded": loaded}))
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to start")
+    parser.add_argument("--backend", choices=["fake", "gemini"], default="fake", help="MODEL_BACKEND for the runs")
+    parser.add_argument("--top", type=int, default=15, help="modules to list by import time")
+    return parser.parse_args()
+
+
+def probe_env(backend: str) -> dict:
+    scratch = tempfile.mkdtemp(prefix="mochi-bench-")
+    env = dict(os.environ)
+    env.update({
+        "MODEL_BACKEND": backend,
+        "GEMINI_API_KEY": "bench-dummy-key",
+        "DB_ENABLED": "0",
+        "IMAGE_CACHE_DIR": os.path.join(scratch, "image_cache"),
+        "IMAGE_STORE_DIR": os.path.join(scratch, "images"),
+        "FEEDBACK_BANK_PATH": os.path.join(scratch, "feedback_bank.json"),
+        "GAME_BANK_PATH": os.path.join(scratch, "game_bank.jsonl"),
+        "FAKE_TEXT_LATENCY": "fixed:0",
+        "FAKE_IMAGE_LATENCY": "fixed:0",
+        "PYTHONPATH": BACKEND_DIR,
+    })
+    return env
+
+
+def run_once(backend: str):
+    """One fresh interpreter: (probe result, `-X importtime` lines)."""
+    code = f"HEAVY_MODULES = {HEAVY_MODULES!r}\nFEEDBACK = {backend == 'fake'}\n{PROBE}"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=BACKEND_DIR,
+                          env=probe_env(backend), capture_output=True, text=True)
+    if proc.returncode != 0:
+        sys.exit(f"Probe failed:\n{proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    return result, [line for line in proc.stderr.splitlines() if line.startswith("import time:")]
+
+
+def slowest_imports(lines, top: int):
+    """(cumulative µs, self µs, module) for the imports with the most cumulative time."""
+    rows = []
+    for line in lines[1:]:  # the first line is the column header
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    # Top-level imports and their direct children only, so deep subtrees don't crowd the list
+    shallow = [row for row in rows if len(row[2]) - len(row[2].lstrip()) <= 3]
+    return sorted(shallow, reverse=True)[:top]
+
+
+def main():
+    args = parse_args()
+    results, lines = [], []
+    for _ in range(args.runs):
+        result, lines = run_once(args.backend)
+        results.append(result)
+
+    steps = list(results[0]["timings"])
+    print(f"{args.runs} runs, MODEL_BACKEND={args.backend}")
+    print(f"{'step':<10}  {'median_ms':>9}  {'min_ms':>7}  {'max_ms':>7}")
+    for step in steps:
+        ms = [r["timings"][step] * 1000 for r in results]
+        print(f"{step:<10}  {statistics.median(ms):>9.1f}  {min(ms):>7.1f}  {max(ms):>7.1f}")
+
+    print()
+    print("Loaded after the first /api/health:")
+    for name, loaded in results[-1]["loaded"].items():
+        print(f"  {name:<14} {'yes' if loaded else 'no'}")
+
+    print()
+    print("Slowest imports (last run, ms):")
+    print(f"{'cumulative':>10}  {'self':>7}  module")
+    for cumulative_us, self_us, name in slowest_imports(lines, args.top):
+        print(f"{cumulative_us / 1000:>10.1f}  {self_us / 1000:>7.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
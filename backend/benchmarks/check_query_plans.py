@@ -0,0 +1,167 @@
+"""
+Query plan regression check
+============================
+Creates a scratch database, migrates it, seeds a large dataset (thousands
+of categories, hundreds of thousands of questions, options and progress
+rows) and runs EXPLAIN (ANALYZE, FORMAT JSON) on every query the routes
+issue. Exits non-zero if any plan falls back to a sequential scan, so a
+missing or unusable index fails CI instead of slowing production down.
+
+Needs a Postgres server reachable with DATABASE_URL and a role allowed to
+create databases. The scratch database is dropped afterwards (--keep to
+leave it for poking at).
+
+Run from backend/:  python -m benchmarks.check_query_plans [--categories 4000] [--questions 50]
+"""
+
+import argparse
+import json
+import sys
+import time
+import psycopg2
+import psycopg2.extensions
+from config import Config
+from revisionGamesBackend import revision_queries as q
+from revisionGamesBackend.migrations import migrate, MIGRATIONS
+
+SEED_SQL = """
+INSERT INTO categories (name, description, created_at)
+SELECT 'Category ' || g, 'Seeded for the plan check', NOW() - g * INTERVAL '1 minute'
+FROM generate_series(1, %(categories)s) g;
+
+INSERT INTO questions (category_id, target_item, correct_answer)
+SELECT c.id, 'Item ' || g, 'Item ' || g
+FROM categories c, generate_series(1, %(questions)s) g;
+
+INSERT INTO question_options (question_id, label)
+SELECT qq.id, 'Option ' || g
+FROM questions qq, generate_series(1, 3) g;
+
+INSERT INTO game_progress (category_id, student_session, score, total_questions, completed_at)
+SELECT 1 + (g %% %(categories)s), 'session-' || (g %% %(sessions)s), g %% 6, 5, NOW() - g * INTERVAL '1 second'
+FROM generate_series(1, %(progress)s) g;
+"""
+
+ROLLUP_SQL = """
+INSERT INTO progress_category_stats (category_id, attempts, score_total, questions_total, last_played)
+SELECT category_id, COUNT(*), SUM(score), SUM(total_questions), MAX(completed_at)
+FROM game_progress GROUP BY category_id;
+
+INSERT INTO progress_session_stats (student_session, category_id, attempts, score_total, questions_total, last_played)
+SELECT student_session, category_id, COUNT(*), SUM(score), SUM(total_questions), MAX(completed_at)
+FROM game_progress GROUP BY student_session, category_id;
+"""
+
+RECENT_ACTIVITIES_SQL = "SELECT id, name, description, icon_url, color FROM categories ORDER BY created_at DESC LIMIT 5"
+
+
+def route_queries(categories: int) -> list:
+    """(label, sql, params) for each query a route runs, with representative arguments."""
+    middle = categories // 2
+    return [
+        ("GET /categories (first page)", q.CATEGORY_PAGE_SQL, (0, 51)),
+        ("GET /categories (deep page)", q.CATEGORY_PAGE_SQL, (middle, 51)),
+        ("GET /categories/<id>/questions", q.QUESTION_PAGE_SQL, (middle, 0, 51)),
+        ("GET /categories/<id>/bundle", q.CATEGORY_BUNDLE_SQL, (201, middle)),
+        ("GET /activities/recent", RECENT_ACTIVITIES_SQL, ()),
+        ("GET /progress/stats (deep page)", q.CATEGORY_STATS_PAGE_SQL, (middle, 51)),
+        ("GET /progress/stats/sessions/<s>", q.SESSION_STATS_SQL, ("session-7",)),
+    ]
+
+
+def seq_scans(plan: dict) -> list:
+    """Relations read with a Seq Scan anywhere in a JSON plan tree."""
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan.get("Relation Name"))
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+def scan_nodes(plan: dict) -> list:
+    nodes = [plan["Node Type"]] if "Scan" in plan["Node Type"] else []
+    for child in plan.get("Plans", []):
+        nodes.extend(scan_nodes(child))
+    return nodes
+
+
+def scratch_dsn(name: str) -> str:
+    return psycopg2.extensions.make_dsn(Config.DATABASE_URL, dbname=name)
+
+
+def admin_execute(dsn: str, sql: str):
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute(sql)
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", default="mochi_plan_check", help="scratch database name")
+    parser.add_argument("--categories", type=int, default=4000)
+    parser.add_argument("--questions", type=int, default=50, help="questions per category")
+    parser.add_argument("--progress", type=int, default=300000, help="game_progress rows")
+    parser.add_argument("--sessions", type=int, default=5000, help="distinct student sessions")
+    parser.add_argument("--keep", action="store_true", help="don't drop the scratch database")
+    args = parser.parse_args()
+
+    admin_dsn = Config.DATABASE_URL
+    admin_execute(admin_dsn, f"DROP DATABASE IF EXISTS {args.database}")
+    admin_execute(admin_dsn, f"CREATE DATABASE {args.database}")
+    Config.DATABASE_URL = scratch_dsn(args.database)
+
+    failures = []
+    try:
+        started = time.perf_counter()
+        applied = migrate()
+        assert applied == [m.version for m in MIGRATIONS], f"fresh database applied {applied}"
+        assert migrate() == [], "second migrate() was not a no-op"
+        print(f"migrations {applied} applied in {time.perf_counter() - started:.2f}s, re-run is a no-op")
+
+        conn = psycopg2.connect(Config.DATABASE_URL)
+        try:
+            with conn.cursor() as cur:
+                started = time.perf_counter()
+                cur.execute(SEED_SQL, vars(args))
+                cur.execute(ROLLUP_SQL)
+                conn.commit()
+                conn.autocommit = True
+                cur.execute("ANALYZE")
+                print(f"seeded {args.categories} categories, {args.categories * args.questions} questions, "
+                      f"{args.categories * args.questions * 3} options, {args.progress} progress rows "
+                      f"in {time.perf_counter() - started:.1f}s")
+                print()
+
+                print(f"{'query':<34} {'ms':>8}  scans")
+                for label, sql, params in route_queries(args.categories):
+                    cur.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + sql, params)
+                    explained = cur.fetchone()[0]
+                    if isinstance(explained, str):
+                        explained = json.loads(explained)
+                    plan = explained[0]["Plan"]
+                    scans = seq_scans(plan)
+                    if scans:
+                        failures.append((label, scans))
+                    print(f"{label:<34} {explained[0]['Execution Time']:>8.2f}  "
+                          f"{', '.join(scan_nodes(plan))}{'  <-- SEQ SCAN' if scans else ''}")
+        finally:
+            conn.close()
+    finally:
+        if not args.keep:
+            admin_execute(admin_dsn, f"DROP DATABASE IF EXISTS {args.database}")
+
+    print()
+    if failures:
+        for label, scans in failures:
+            print(f"FAIL {label}: sequential scan on {', '.join(scans)}")
+        sys.exit(1)
+    print("OK: no sequential scans on route queries.")
+
+
+if __name__ == "__main__":
+    main()
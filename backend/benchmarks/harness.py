@@ -0,0 +1,113 @@
+"""
+Shared helpers for the benchmark scripts: offline environment setup,
+concurrent load driving and latency summaries.
+"""
+
+import os
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+
+
+def use_offline_env(**overrides):
+    """
+    Point the app at the fake model backend and throwaway storage. Must run
+    before `config` / `app` are imported, since Config reads the environment once.
+    """
+    scratch = tempfile.mkdtemp(prefix="mochi-bench-")
+    env = {
+        "MODEL_BACKEND": "fake",
+        "DB_ENABLED": "0",
+        "IMAGE_CACHE_DIR": os.path.join(scratch, "image_cache"),
+        "IMAGE_STORE_DIR": os.path.join(scratch, "images"),
+        "FEEDBACK_BANK_PATH": os.path.join(scratch, "feedback_bank.json"),
+    }
+    env.update({k: str(v) for k, v in overrides.items() if v is not None})
+    os.environ.update(env)
+    return scratch
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def run_concurrently(workers: int, fn):
+    """Call fn(worker_index) on `workers` threads at once; return wall seconds."""
+    barrier = threading.Barrier(workers)
+    errors = []
+
+    def run(i):
+        barrier.wait()
+        try:
+            fn(i)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(workers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if errors:
+        raise errors[0]
+    return time.perf_counter() - start
+
+
+class Phase:
+    """Collects per-request latencies and status codes for one load phase."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies = []
+        self.statuses = {}
+        self.wall = 0.0
+        self.peak_mb = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, status: int):
+        with self._lock:
+            self.latencies.append(seconds)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def run(self, workers: int, fn):
+        """Drive fn(worker_index, phase) concurrently, tracking peak traced memory."""
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        self.wall = run_concurrently(workers, lambda i: fn(i, self))
+        self.peak_mb = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        if started_tracing:
+            tracemalloc.stop()
+        return self
+
+    def summary(self) -> dict:
+        ms = [v * 1000 for v in self.latencies]
+        return {
+            "endpoint": self.name,
+            "requests": len(ms),
+            "statuses": self.statuses,
+            "p50_ms": round(percentile(ms, 50), 1),
+            "p95_ms": round(percentile(ms, 95), 1),
+            "p99_ms": round(percentile(ms, 99), 1),
+            "mean_ms": round(statistics.fmean(ms), 1) if ms else 0.0,
+            "throughput_rps": round(len(ms) / self.wall, 2) if self.wall else 0.0,
+            "peak_mem_mb": round(self.peak_mb, 1),
+        }
+
+
+def print_table(rows):
+    columns = ["endpoint", "requests", "p50_ms", "p95_ms", "p99_ms", "throughput_rps", "peak_mem_mb", "statuses"]
+    widths = {c: max(len(c), *(len(str(r[c])) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for r in rows:
+        print("  ".join(str(r[c]).ljust(widths[c]) for c in columns))
@@ -3,6 +3,8 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
 
 class Config:
     # PostgreSQL connection parameters
@@ -18,10 +20,169 @@ class Config:
         f"host={DB_HOST} port={DB_PORT} dbname={DB_NAME} user={DB_USER} password={DB_PASSWORD}",
     )
 
+    # Set to 1 once Postgres is available; until then the data routes return mocks
+    DB_ENABLED = os.getenv("DB_ENABLED", "0") == "1"
+
+    # Connection pool (per process)
+    DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+    DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+    DB_POOL_PING_IDLE_SECONDS = float(os.getenv("DB_POOL_PING_IDLE_SECONDS", "30"))
+
+    # Cursor pagination for list endpoints
+    PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "50"))
+    PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "200"))
+    # Questions included in /api/categories/<id>/bundle (the rest are paged)
+    BUNDLE_MAX_QUESTIONS = int(os.getenv("BUNDLE_MAX_QUESTIONS", "200"))
+
     SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key")
 
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 
+    # Model backend: "gemini" (real API) or "fake" (offline, deterministic)
+    MODEL_BACKEND = os.getenv("MODEL_BACKEND", "gemini")
+    # Build the model client when a gunicorn worker boots (gunicorn.conf.py)
+    # instead of on its first generation request
+    MODEL_WARMUP = os.getenv("MODEL_WARMUP", "1") == "1"
+    # Fake backend tuning. Latency specs are in ms: "fixed:200",
+    # "uniform:100,400" or "lognormal:<median>,<sigma>"
+    FAKE_TEXT_LATENCY = os.getenv("FAKE_TEXT_LATENCY", "lognormal:800,0.3")
+    FAKE_IMAGE_LATENCY = os.getenv("FAKE_IMAGE_LATENCY", "lognormal:4000,0.4")
+    FAKE_ERROR_RATE = float(os.getenv("FAKE_ERROR_RATE", "0"))
+    FAKE_IMAGE_BYTES = int(os.getenv("FAKE_IMAGE_BYTES", "150000"))
+    FAKE_SEED = int(os.getenv("FAKE_SEED", "0"))
+    # Injected errors carry this HTTP status and optional retry-after (seconds)
+    FAKE_ERROR_STATUS = int(os.getenv("FAKE_ERROR_STATUS", "503"))
+    FAKE_RETRY_AFTER = float(os.getenv("FAKE_RETRY_AFTER")) if os.getenv("FAKE_RETRY_AFTER") else None
+
+    # Model call governor, per model: rate limit (calls/s and burst),
+    # concurrent calls, retries with exponential backoff, and the circuit
+    # breaker (consecutive failures to open, seconds before a trial call)
+    MODEL_LIMITS = {
+        "text": {
+            "rps": float(os.getenv("MODEL_TEXT_RPS", "10")),
+            "burst": int(os.getenv("MODEL_TEXT_BURST", "20")),
+            "concurrency": int(os.getenv("MODEL_TEXT_CONCURRENCY", "16")),
+        },
+        "image": {
+            "rps": float(os.getenv("MODEL_IMAGE_RPS", "2")),
+            "burst": int(os.getenv("MODEL_IMAGE_BURST", "6")),
+            "concurrency": int(os.getenv("MODEL_IMAGE_CONCURRENCY", "8")),
+        },
+    }
+    MODEL_RETRY_MAX = int(os.getenv("MODEL_RETRY_MAX", "3"))
+    MODEL_RETRY_BASE_DELAY = float(os.getenv("MODEL_RETRY_BASE_DELAY", "0.5"))
+    MODEL_RETRY_MAX_DELAY = float(os.getenv("MODEL_RETRY_MAX_DELAY", "8"))
+    MODEL_BREAKER_THRESHOLD = int(os.getenv("MODEL_BREAKER_THRESHOLD", "5"))
+    MODEL_BREAKER_RESET_SECONDS = float(os.getenv("MODEL_BREAKER_RESET_SECONDS", "30"))
+    MODEL_ACQUIRE_TIMEOUT = float(os.getenv("MODEL_ACQUIRE_TIMEOUT", "30"))
+
+    # Safety blocklist file (one term per line); defaults to the bundled list
+    SAFETY_BLOCKLIST_PATH = os.getenv("SAFETY_BLOCKLIST_PATH", "")
+
+    # AI image generation: max option images rendered in parallel per request,
+    # and the per-image timeout in seconds
+    IMAGE_GEN_MAX_WORKERS = int(os.getenv("IMAGE_GEN_MAX_WORKERS", "6"))
+    IMAGE_GEN_TIMEOUT = float(os.getenv("IMAGE_GEN_TIMEOUT", "60"))
+
+    # Generated image cache (on disk, keyed by prompt + model + config)
+    IMAGE_CACHE_ENABLED = os.getenv("IMAGE_CACHE_ENABLED", "1") == "1"
+    IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", os.path.join(BASE_DIR, "instance", "image_cache"))
+    IMAGE_CACHE_MAX_MB = int(os.getenv("IMAGE_CACHE_MAX_MB", "512"))
+    IMAGE_CACHE_TTL_HOURS = float(os.getenv("IMAGE_CACHE_TTL_HOURS", "720"))
+
+    # Generated images are stored as assets and returned as short URLs
+    # ("url"), or inlined into the JSON as base64 ("data_uri")
+    IMAGE_DELIVERY = os.getenv("IMAGE_DELIVERY", "url")
+    IMAGE_STORE_DIR = os.getenv("IMAGE_STORE_DIR", os.path.join(BASE_DIR, "instance", "images"))
+    # Prefix for asset URLs. The frontend is served from another origin, so
+    # this is the API's own public address (an empty value gives relative URLs)
+    PUBLIC_API_URL = os.getenv("PUBLIC_API_URL", "http://localhost:5000").rstrip("/")
+
+    # Resized, recompressed variants of each stored image (needs Pillow).
+    # Formats are listed in order of preference; URLs handed to the frontend
+    # ask for IMAGE_DEFAULT_WIDTH px (0 = the original)
+    IMAGE_VARIANTS_ENABLED = os.getenv("IMAGE_VARIANTS_ENABLED", "1") == "1"
+    IMAGE_VARIANT_SIZES = [int(w) for w in os.getenv("IMAGE_VARIANT_SIZES", "256,512").split(",") if w.strip()]
+    IMAGE_VARIANT_FORMATS = [f.strip() for f in os.getenv("IMAGE_VARIANT_FORMATS", "avif,webp").split(",") if f.strip()]
+    IMAGE_VARIANT_QUALITY = int(os.getenv("IMAGE_VARIANT_QUALITY", "70"))
+    IMAGE_DEFAULT_WIDTH = int(os.getenv("IMAGE_DEFAULT_WIDTH", "512"))
+    IMAGE_VARIANT_WORKERS = int(os.getenv("IMAGE_VARIANT_WORKERS", "2"))
+
+    # Feedback: LRU cache of live answers, precomputed bank, and how long a
+    # child waits for Gemini (seconds) before getting a template answer
+    FEEDBACK_CACHE_SIZE = int(os.getenv("FEEDBACK_CACHE_SIZE", "5000"))
+    FEEDBACK_CACHE_TTL_SECONDS = int(os.getenv("FEEDBACK_CACHE_TTL_SECONDS", "86400"))
+    FEEDBACK_LATENCY_BUDGET = float(os.getenv("FEEDBACK_LATENCY_BUDGET", "1.5"))
+    FEEDBACK_BANK_PATH = os.getenv("FEEDBACK_BANK_PATH", os.path.join(BASE_DIR, "instance", "feedback_bank.json"))
+    FEEDBACK_PRECOMPUTE = os.getenv("FEEDBACK_PRECOMPUTE", "1") == "1"
+    FEEDBACK_MAX_WORKERS = int(os.getenv("FEEDBACK_MAX_WORKERS", "4"))
+    # Bank precompute runs on its own small pool and yields to live calls;
+    # POST /api/feedback/bank accepts at most this many questions / options each
+    FEEDBACK_PRECOMPUTE_WORKERS = int(os.getenv("FEEDBACK_PRECOMPUTE_WORKERS", "1"))
+    FEEDBACK_BANK_MAX_QUESTIONS = int(os.getenv("FEEDBACK_BANK_MAX_QUESTIONS", "50"))
+    FEEDBACK_BANK_MAX_OPTIONS = int(os.getenv("FEEDBACK_BANK_MAX_OPTIONS", "6"))
+
+    # Game progress is buffered and written in batches of PROGRESS_FLUSH_ROWS
+    # or every PROGRESS_FLUSH_SECONDS; rows that can't be written at shutdown
+    # are spilled to disk and picked up on the next start
+    PROGRESS_BUFFER_ENABLED = os.getenv("PROGRESS_BUFFER_ENABLED", "1") == "1"
+    PROGRESS_FLUSH_ROWS = int(os.getenv("PROGRESS_FLUSH_ROWS", "200"))
+    PROGRESS_FLUSH_SECONDS = float(os.getenv("PROGRESS_FLUSH_SECONDS", "2"))
+    PROGRESS_BUFFER_MAX_ROWS = int(os.getenv("PROGRESS_BUFFER_MAX_ROWS", "20000"))
+    PROGRESS_SPILL_PATH = os.getenv("PROGRESS_SPILL_PATH", os.path.join(BASE_DIR, "instance", "progress_spill.jsonl"))
+
+    # In-process cache of read endpoint responses (categories, question pages,
+    # recent activities) with ETag/304 support. Writes touch stamp files in
+    # RESPONSE_CACHE_STAMP_DIR so every worker on the host invalidates;
+    # RESPONSE_CACHE_MAX_AGE > 0 also lets clients reuse a response unchecked
+    RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") == "1"
+    RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2000"))
+    RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+    RESPONSE_CACHE_MAX_AGE = int(os.getenv("RESPONSE_CACHE_MAX_AGE", "0"))
+    RESPONSE_CACHE_STAMP_DIR = os.getenv("RESPONSE_CACHE_STAMP_DIR", os.path.join(BASE_DIR, "instance", "response_cache"))
+
+    # JSON encoding: "orjson" (used when installed) or "stdlib"
+    JSON_PROVIDER = os.getenv("JSON_PROVIDER", "orjson")
+    # Compress JSON/text responses of at least COMPRESSION_MIN_BYTES with
+    # brotli (when installed) or gzip, per Accept-Encoding; streams are left alone
+    COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "1") == "1"
+    COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+
+    # Identical generation requests / image prompts in flight at the same
+    # time share one model call. SINGLEFLIGHT_DB=1 coalesces across processes
+    # through Postgres (needs DB_ENABLED); finished results are shared with
+    # late duplicates for SINGLEFLIGHT_DB_TTL_SECONDS. The process generating
+    # renews its lease every third of SINGLEFLIGHT_LEASE_SECONDS; if it dies,
+    # another takes over once the lease runs out
+    SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "1") == "1"
+    SINGLEFLIGHT_DB = os.getenv("SINGLEFLIGHT_DB", "0") == "1"
+    SINGLEFLIGHT_DB_TTL_SECONDS = float(os.getenv("SINGLEFLIGHT_DB_TTL_SECONDS", "60"))
+    SINGLEFLIGHT_WAIT_TIMEOUT = float(os.getenv("SINGLEFLIGHT_WAIT_TIMEOUT", "180"))
+    SINGLEFLIGHT_POLL_INTERVAL = float(os.getenv("SINGLEFLIGHT_POLL_INTERVAL", "0.25"))
+    SINGLEFLIGHT_LEASE_SECONDS = float(os.getenv("SINGLEFLIGHT_LEASE_SECONDS", "30"))
+
+    # Game bank: past generations served again for similar requests that opt in
+    # with "reuse": true (cosine similarity of hashed n-gram vectors)
+    GAME_BANK_ENABLED = os.getenv("GAME_BANK_ENABLED", "1") == "1"
+    GAME_BANK_PATH = os.getenv("GAME_BANK_PATH", os.path.join(BASE_DIR, "instance", "game_bank.jsonl"))
+    GAME_BANK_DIMS = int(os.getenv("GAME_BANK_DIMS", "256"))
+    GAME_BANK_THRESHOLD = float(os.getenv("GAME_BANK_THRESHOLD", "0.85"))
+
+    # Async serving (asgi.py): threads running the Flask app for every route
+    # that has no coroutine version, per worker process
+    ASGI_WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", "16"))
+
+    # Background generation jobs: "inprocess" thread pool or "local_broker" stand-in.
+    # Job records go to JOB_STORE: "file" (shared by every worker on the host)
+    # or "memory" (single-process servers only)
+    JOB_BACKEND = os.getenv("JOB_BACKEND", "inprocess")
+    JOB_STORE = os.getenv("JOB_STORE", "file")
+    JOB_STORE_DIR = os.getenv("JOB_STORE_DIR", os.path.join(BASE_DIR, "instance", "generation_jobs"))
+    JOB_MAX_WORKERS = int(os.getenv("JOB_MAX_WORKERS", "2"))
+    JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "50"))
+    JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", "3600"))
+
     UNSPLASH_ACCESS_KEY = os.getenv("UNSPLASH_ACCESS_KEY", "")
 
     FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173")
@@ -0,0 +1,62 @@
+"""
+Gunicorn config for the async serving mode (asgi.py).
+
+Uvicorn workers run one event loop each: a worker waiting on Gemini holds
+no thread, so a few workers (about one per core) handle hundreds of
+concurrent generations. Model concurrency per worker is bounded by
+MODEL_TEXT_CONCURRENCY / MODEL_IMAGE_CONCURRENCY, not by the worker count.
+
+The model client, DB pool and progress buffer are built per process after
+the fork, so GUNICORN_PRELOAD=1 (import the app once in the master and
+share it copy-on-write) is safe. With MODEL_WARMUP on, each worker builds
+its model client as it boots rather than on its first generation request.
+On the way out, a worker flushes its buffered progress and then closes its
+pooled connections. Generation job records must be shared between workers,
+so startup fails with JOB_STORE=memory and more than one worker.
+
+Run from backend/:  gunicorn -c gunicorn.conf.py
+"""
+
+import multiprocessing
+import os
+
+wsgi_app = "asgi:app"
+worker_class = "uvicorn_worker.UvicornWorker"
+bind = os.getenv("BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(4, multiprocessing.cpu_count()))))
+preload_app = os.getenv("GUNICORN_PRELOAD", "0") == "1"
+
+# Uvicorn workers heartbeat from the event loop, so `timeout` only catches a
+# wedged loop, not a long generation stream
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Recycle workers now and then to bound memory growth
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "1000"))
+
+accesslog = "-"
+errorlog = "-"
+
+
+def on_starting(server):
+    from config import Config
+    if Config.JOB_STORE == "memory" and server.cfg.workers > 1:
+        # A job poll or cancel reaching another worker would never find the job
+        raise RuntimeError("JOB_STORE=memory needs a single worker (WEB_CONCURRENCY=1); use JOB_STORE=file.")
+
+
+def post_worker_init(worker):
+    from config import Config
+    if Config.MODEL_WARMUP:
+        from revisionGamesBackend.gemini_services import warm_up
+        warm_up()
+
+
+def worker_exit(server, worker):
+    # Buffered progress is written through the pool, so flush it first
+    from revisionGamesBackend.progress_buffer import close_progress_buffer
+    from revisionGamesBackend.revision_config import close_pool
+    close_progress_buffer()
+    close_pool()
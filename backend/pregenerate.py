@@ -0,0 +1,257 @@
+"""
+Batch pre-generation — fill the catalog with generated question packs offline.
+Usage: python pregenerate.py manifest.json
+       python pregenerate.py manifest.json --concurrency 16 --batch 4 --pack generated.json --feedback
+       MODEL_BACKEND=fake python pregenerate.py manifest.json --no-db --pack generated.json
+
+Manifests look like:
+    {"categories": [{"name": "Counting Apples", "topic": "Apples", "subject": "Counting",
+                     "description": "Count from 1 to 9 apples", "questions": 12,
+                     "icon_url": "Sparkles", "color": "bg-red-100"}]}
+
+Each category is generated in jobs of --batch questions, at most
+--concurrency jobs at a time, through the same pipeline (and call governors)
+as POST /api/generate. Images go to the image store; the options keep their
+URLs. Finished jobs also go into the game bank (when GAME_BANK_ENABLED), so
+running servers can reuse them for similar requests straight away. Every
+finished job is appended to the checkpoint file (default
+<manifest>.checkpoint.jsonl), so an interrupted run picks up where it left
+off: finished jobs are not generated again and categories already written
+to the database are not written twice. Jobs that fail are retried on the
+next run.
+
+Once every job has finished, the categories are written in one transaction
+with insert_categories (and optionally saved as a seed.py --pack file).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from config import Config
+from revisionGamesBackend.gemini_services import agenerate_questions, precompute_feedback
+from revisionGamesBackend.revision_config import db_connection, init_db
+from revisionGamesBackend.revision_queries import insert_categories
+from revisionGamesBackend.response_cache import invalidate
+from revisionGamesBackend.game_bank import remember_game
+
+
+def load_manifest(path: str) -> list:
+    """Read and validate a manifest into a list of category dicts."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    categories = data["categories"] if isinstance(data, dict) else data
+
+    names = set()
+    for i, cat in enumerate(categories):
+        missing = [field for field in ("name", "topic", "subject") if not cat.get(field)]
+        if missing:
+            raise ValueError(f"Manifest category {i} is missing {', '.join(missing)}.")
+        if cat["name"] in names:
+            raise ValueError(f"Manifest category {cat['name']!r} appears twice.")
+        names.add(cat["name"])
+        cat["questions"] = int(cat.get("questions", 3))
+    return categories
+
+
+def plan_jobs(categories: list, batch: int) -> list:
+    """One job per --batch questions of each category; ids are stable across runs of the same manifest."""
+    jobs = []
+    for cat in categories:
+        n_jobs = -(-cat["questions"] // batch)
+        for k in range(n_jobs):
+            count = min(batch, cat["questions"] - k * batch)
+            # The set number keeps every prompt distinct, so jobs aren't
+            # coalesced into one generation and the model varies its questions
+            scenario = f"{count} questions, set {k + 1} of {n_jobs}. {cat.get('description', '')}".strip()
+            jobs.append({"id": f"{cat['name']}#{k + 1}", "category": cat["name"], "topic": cat["topic"],
+                         "subject": cat["subject"], "description": scenario,
+                         "category_description": cat.get("description", "")})
+    return jobs
+
+
+# ──────────────────────────────────────
+# CHECKPOINT
+# ──────────────────────────────────────
+
+class Checkpoint:
+    """Append-only JSON lines log of finished jobs and categories written to the database."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done = {}        # job id -> questions
+        self.inserted = set() # category names
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut short by the interrupted run
+                    if "job" in record:
+                        self.done[record["job"]] = record["questions"]
+                    else:
+                        self.inserted.update(record.get("inserted", []))
+
+    def _append(self, record: dict):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def job_done(self, job: dict, questions: list):
+        self.done[job["id"]] = questions
+        self._append({"job": job["id"], "category": job["category"], "questions": questions})
+
+    def categories_inserted(self, names: list):
+        self.inserted.update(names)
+        self._append({"inserted": names})
+
+
+# ──────────────────────────────────────
+# GENERATION
+# ──────────────────────────────────────
+
+def _complete(q: dict) -> bool:
+    """Every option has its image (or was blocked by the safety screen)."""
+    return bool(q.get("options")) and all(opt.get("image") or opt.get("imageBlocked") for opt in q["options"])
+
+
+async def _run_job(job: dict, slots: asyncio.Semaphore, feedback: bool) -> tuple:
+    """(job, its complete questions)."""
+    async with slots:
+        questions = await agenerate_questions(job["topic"], job["subject"], job["description"])
+        questions = [q for q in questions if _complete(q)]
+        if questions and feedback:
+            await asyncio.to_thread(precompute_feedback, questions)
+        # Banked as a live request for this category would be phrased
+        await asyncio.to_thread(remember_game, job["topic"], job["subject"], job["category_description"], questions)
+        return job, questions
+
+
+async def generate_all(jobs: list, checkpoint: Checkpoint, concurrency: int, feedback: bool) -> int:
+    """Run the unfinished jobs, checkpointing each as it finishes. Returns how many failed."""
+    pending = [job for job in jobs if job["id"] not in checkpoint.done]
+    print(f"🧺 {len(jobs) - len(pending)} of {len(jobs)} jobs already done; generating {len(pending)}.")
+    slots = asyncio.Semaphore(concurrency)
+    tasks = [_run_job(job, slots, feedback) for job in pending]
+
+    failed = 0
+    started = time.perf_counter()
+    for n, task in enumerate(asyncio.as_completed(tasks), 1):
+        job, questions = await task
+        if questions:
+            checkpoint.job_done(job, questions)
+            print(f"✅ [{n}/{len(pending)}] {job['id']}: {len(questions)} questions "
+                  f"({time.perf_counter() - started:.1f}s)")
+        else:
+            failed += 1
+            print(f"❌ [{n}/{len(pending)}] {job['id']}: no complete questions; will retry next run")
+    return failed
+
+
+# ──────────────────────────────────────
+# OUTPUT
+# ──────────────────────────────────────
+
+def build_pack(categories: list, checkpoint: Checkpoint, jobs: list) -> list:
+    """Finished questions in the seed.py pack format, grouped by category (duplicates dropped)."""
+    by_category = {cat["name"]: [] for cat in categories}
+    for job in jobs:
+        by_category[job["category"]].extend(checkpoint.done.get(job["id"], []))
+
+    pack = []
+    for cat in categories:
+        seen = set()
+        questions = []
+        for q in by_category[cat["name"]]:
+            key = (q.get("questionText", ""), q.get("correct_answer", ""))
+            if key in seen:
+                continue
+            seen.add(key)
+            questions.append({
+                "target_item": q.get("questionText", "Look!"),
+                "correct_answer": q.get("correct_answer", ""),
+                "options": [{"label": opt["label"], "image_url": opt.get("image") or ""} for opt in q["options"]],
+            })
+        pack.append({
+            "name": cat["name"],
+            "description": cat.get("description", ""),
+            "icon_url": cat.get("icon_url", "Sparkles"),
+            "color": cat.get("color", "bg-cyan-100"),
+            "questions": questions[:cat["questions"]],
+        })
+    return pack
+
+
+def write_categories(pack: list, checkpoint: Checkpoint) -> list:
+    """Bulk-insert the categories not written yet, in one transaction. Returns their ids."""
+    pending = [cat for cat in pack if cat["name"] not in checkpoint.inserted and cat["questions"]]
+    if not pending:
+        return []
+
+    init_db()
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cat_ids = insert_categories(cur, pending)
+    # Recorded after the commit: a crash in between means the next run
+    # writes these categories again rather than losing them
+    checkpoint.categories_inserted([cat["name"] for cat in pending])
+    invalidate("categories", *(f"category-{cat_id}" for cat_id in cat_ids))
+    return cat_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate question packs into the Mochi database.")
+    parser.add_argument("manifest", help="JSON manifest of categories to generate")
+    parser.add_argument("--concurrency", type=int, default=8, help="generation jobs in flight at once")
+    parser.add_argument("--batch", type=int, default=4, help="questions per generation job")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: <manifest>.checkpoint.jsonl)")
+    parser.add_argument("--pack", help="also write the finished categories to this JSON pack file")
+    parser.add_argument("--feedback", action="store_true", help="precompute feedback for every option too")
+    parser.add_argument("--no-db", action="store_true", help="don't write to the database (use with --pack)")
+    args = parser.parse_args()
+
+    try:
+        categories = load_manifest(args.manifest)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        sys.exit(f"Invalid manifest: {e}")
+
+    # Options must reference stored assets, never inline data URIs, and
+    # feedback is only precomputed when asked for (and then waited on)
+    Config.IMAGE_DELIVERY = "url"
+    Config.FEEDBACK_PRECOMPUTE = False
+
+    checkpoint = Checkpoint(args.checkpoint or f"{os.path.splitext(args.manifest)[0]}.checkpoint.jsonl")
+    jobs = plan_jobs(categories, max(1, args.batch))
+
+    started = time.perf_counter()
+    try:
+        failed = asyncio.run(generate_all(jobs, checkpoint, max(1, args.concurrency), args.feedback))
+    except KeyboardInterrupt:
+        sys.exit(f"\n⏸️ Interrupted with {len(checkpoint.done)} of {len(jobs)} jobs done; run again to resume.")
+    elapsed = time.perf_counter() - started
+
+    pack = build_pack(categories, checkpoint, jobs)
+    n_questions = sum(len(cat["questions"]) for cat in pack)
+    print(f"🧺 {n_questions} questions across {len(pack)} categories ({elapsed:.1f}s generating)")
+    if failed:
+        print(f"⚠️ {failed} jobs failed. Run again to retry them before anything is written.")
+        sys.exit(1)
+
+    if args.pack:
+        with open(args.pack, "w", encoding="utf-8") as f:
+            json.dump({"categories": pack}, f, ensure_ascii=False, indent=2)
+        print(f"📦 Pack written to {args.pack}")
+
+    if not args.no_db:
+        if not Config.DB_ENABLED:
+            sys.exit("DB_ENABLED is off; pass --no-db to only write the pack.")
+        cat_ids = write_categories(pack, checkpoint)
+        print(f"✅ {len(cat_ids)} categories written to the database.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Async Routes
+=============
+Coroutine versions of the endpoints that spend their time waiting on the
+model, POST /api/generate and POST /api/feedback. Under the ASGI app
+(asgi.py) these are served straight from the event loop, so a request
+waiting on Gemini holds no thread; every other endpoint is still served by
+the Flask views in routes.py.
+
+Bodies, status codes, headers and stream formats match the Flask views,
+including the 400 for a missing, invalid or incomplete JSON body.
+"""
+
+import asyncio
+import logging
+from urllib.parse import parse_qsl
+from werkzeug.datastructures import Accept, Headers, MIMEAccept, MultiDict
+from werkzeug.http import parse_accept_header
+from .gemini_services import agenerate_questions, aiter_game_events, agenerate_feedback
+from .game_bank import find_similar_game, remember_game
+from .routes import encode_event, STREAM_HEADERS
+from .metrics import stage_timer, CACHE_EVENTS
+from .json_provider import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+# Request bodies larger than this are refused with 413
+MAX_BODY_BYTES = 1024 * 1024
+
+
+class AsyncRequest:
+    """The parts of an ASGI HTTP request the async views use."""
+
+    def __init__(self, scope: dict, body: bytes):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.args = MultiDict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+        self.headers = Headers([(k.decode("latin-1"), v.decode("latin-1")) for k, v in scope.get("headers", [])])
+        self.body = body
+
+    @property
+    def json(self):
+        """The parsed JSON body. Raises ValueError when it isn't valid JSON."""
+        return loads(self.body or b"null")
+
+    @property
+    def accept_mimetypes(self) -> MIMEAccept:
+        return parse_accept_header(self.headers.get("Accept"), MIMEAccept)
+
+    @property
+    def accept_encodings(self) -> Accept:
+        return parse_accept_header(self.headers.get("Accept-Encoding"))
+
+
+class AsyncResponse:
+    """Status, headers and either a body or an async iterator of str/bytes chunks."""
+
+    def __init__(self, body=b"", status: int = 200, headers: dict = None, mimetype: str = "application/json",
+                 stream=None):
+        self.status = status
+        self.headers = {"Content-Type": mimetype, **(headers or {})}
+        self.body = body.encode("utf-8") if isinstance(body, str) else body
+        self.stream = stream
+
+
+def json_response(data, status: int = 200, headers: dict = None) -> AsyncResponse:
+    # Same encoder as the Flask app's jsonify
+    return AsyncResponse(dumps(data) + b"\n", status, headers)
+
+
+def stream_events(events, sse: bool, headers: dict = None) -> AsyncResponse:
+    """Async version of routes._stream_events."""
+    async def body():
+        try:
+            async for event in events:
+                yield encode_event(event, sse)
+        except Exception as e:
+            logger.error(f"Stream Error: {e}")
+            yield encode_event({"type": "error", "error": str(e)}, sse)
+        finally:
+            await events.aclose()
+
+    return AsyncResponse(
+        mimetype="text/event-stream" if sse else "application/x-ndjson",
+        headers={**STREAM_HEADERS, **(headers or {})},
+        stream=body(),
+    )
+
+
+async def _events_of(events: list):
+    for event in events:
+        yield event
+
+
+async def generate(request: AsyncRequest) -> AsyncResponse:
+    """POST /api/generate (see routes.ai_generate_questions)."""
+    try:
+        data = request.json
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return json_response({"error": "The JSON body must be an object."}, 400)
+    game_topic = data.get("gameTopic", "General Knowledge")
+    subject = data.get("subject", "General")
+    description = data.get("description", "")
+    stream = request.args.get("stream", "")
+    streaming = bool(stream) and stream != "0"
+    sse = stream == "sse" or request.accept_mimetypes.best == "text/event-stream"
+
+    logger.info(f"Mochi AI Request: {game_topic} | {subject}")
+
+    if data.get("reuse"):
+        match = await asyncio.to_thread(find_similar_game, game_topic, subject, description,
+                                        bool(data.get("shuffleOptions")))
+        CACHE_EVENTS.inc("game_bank", "hit" if match else "miss")
+        if match:
+            similarity, questions = match
+            headers = {"X-Mochi-Reused": f"{similarity:.3f}"}
+            if streaming:
+                events = [{"type": "question", "index": i, "question": q} for i, q in enumerate(questions)]
+                events.append({"type": "done", "questions": len(questions)})
+                return stream_events(_events_of(events), sse, headers)
+            return json_response(questions, 200, headers)
+
+    if streaming:
+        generation = aiter_game_events(game_topic, subject, description)
+        first = await anext(generation)
+        if first["type"] == "done":
+            return json_response({"error": "Failed to generate content."}, 500)
+
+        async def events():
+            questions = []
+            yield first
+            if first["type"] == "question":
+                questions.append(first["question"])
+            try:
+                async for event in generation:
+                    if event["type"] == "question":
+                        questions.append(event["question"])
+                    yield event
+            finally:
+                await generation.aclose()
+            await asyncio.to_thread(remember_game, game_topic, subject, description, questions)
+
+        return stream_events(events(), sse)
+
+    try:
+        with stage_timer("generate_pipeline"):
+            generated_data = await agenerate_questions(game_topic, subject, description)
+
+        if not generated_data:
+            return json_response({"error": "Failed to generate content."}, 500)
+
+        await asyncio.to_thread(remember_game, game_topic, subject, description, generated_data)
+
+        with stage_timer("generate_serialize"):
+            return json_response(generated_data)
+
+    except Exception as e:
+        logger.error(f"Route Error: {e}")
+        return json_response({"error": str(e)}, 500)
+
+
+async def feedback(request: AsyncRequest) -> AsyncResponse:
+    """POST /api/feedback (see routes.get_feedback)."""
+    try:
+        data = request.json
+        args = (data["user_answer"], data["correct_answer"], data["target_item"])
+    except (ValueError, KeyError, TypeError):
+        return json_response({"error": "user_answer, correct_answer and target_item are required."}, 400)
+
+    with stage_timer("feedback_pipeline"):
+        result = await agenerate_feedback(*args)
+    return json_response(result)
+
+
+# (method, path) -> coroutine view served in place of the Flask one
+ASYNC_ROUTES = {
+    ("POST", "/api/generate"): generate,
+    ("POST", "/api/feedback"): feedback,
+}
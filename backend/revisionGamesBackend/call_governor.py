@@ -0,0 +1,389 @@
+"""
+Call Governor
+==============
+Every model call goes through a per-model governor, shared by the whole
+process, which:
+
+- rate limits call attempts with a token bucket (sustained rate + burst)
+- caps concurrent calls with a semaphore
+- retries transient failures (429, 5xx, timeouts) with exponential backoff
+  and full jitter, waiting at least as long as the upstream's retry-after
+- trips a circuit breaker after repeated failures, so callers fail fast
+  with CircuitOpenError until a trial call succeeds again
+
+Non-transient errors (bad request, safety refusals) are raised straight away
+and don't count against the breaker. `acall` / `astream` are the coroutine
+versions for the async serving path; they share the same limits, waiting
+with asyncio.sleep instead of blocking the event loop.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from config import Config
+from .model_backends import ModelBackendError
+from .metrics import register_collector, MODEL_CALLS
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(ModelBackendError):
+    """Raised without calling the model while its circuit breaker is open."""
+
+
+class GovernorTimeoutError(ModelBackendError):
+    """Raised when no rate-limit token or concurrency slot freed up in time."""
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (CircuitOpenError, GovernorTimeoutError)):
+        return False
+    if isinstance(error, ModelBackendError):
+        return error.status is None or error.status in RETRYABLE_STATUSES
+    return isinstance(error, (TimeoutError, ConnectionError))
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, up to `burst` banked."""
+
+    def __init__(self, rate: float, burst: int, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+
+    def _take(self):
+        """Take a token if one is banked: (0, now), else (seconds until one is, now)."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0, now
+            return (1 - self._tokens) / self.rate, now
+
+    def acquire(self, timeout: float = None) -> bool:
+        """Take one token, waiting up to `timeout` seconds. Returns False on timeout."""
+        if self.rate <= 0:
+            return True
+        deadline = None if timeout is None else self._clock() + timeout
+        while True:
+            wait, now = self._take()
+            if not wait:
+                return True
+            if deadline is not None and now + wait > deadline:
+                return False
+            self._sleep(wait)
+
+    async def aacquire(self, timeout: float = None) -> bool:
+        """acquire() for coroutines."""
+        if self.rate <= 0:
+            return True
+        deadline = None if timeout is None else self._clock() + timeout
+        while True:
+            wait, now = self._take()
+            if not wait:
+                return True
+            if deadline is not None and now + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failure_threshold` consecutive failures; open ->
+    half-open after `reset_timeout` seconds, when a single trial call is let
+    through. A success closes the breaker, a failure re-opens it.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_running = False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def release_trial(self):
+        """Give back a half-open trial that never reached the upstream."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = self._clock()
+                self._trial_running = False
+
+    def retry_in(self) -> float:
+        """Seconds until the breaker lets a trial call through."""
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (self._clock() - self._opened_at))
+
+
+# How often a coroutine waiting for a concurrency slot checks again
+SLOT_POLL_SECONDS = 0.01
+
+
+class CallGovernor:
+    """Rate limit, concurrency cap, retries and circuit breaker for one model."""
+
+    def __init__(self, name: str, rate: float, burst: int, max_concurrency: int,
+                 max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 8.0,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0, acquire_timeout: float = 30.0,
+                 clock=time.monotonic, sleep=time.sleep, rng=None):
+        self.name = name
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.acquire_timeout = acquire_timeout
+        self.bucket = TokenBucket(rate, burst, clock=clock, sleep=sleep)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout, clock=clock)
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrency))
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._sleep = sleep
+        self._rng = rng or random.Random()
+
+    def backoff(self, attempt: int, retry_after: float = None) -> float:
+        """Full-jitter exponential delay for retry `attempt` (0-based), at least retry_after."""
+        delay = self._rng.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        return max(delay, retry_after or 0.0)
+
+    def _admit(self):
+        if not self.breaker.allow():
+            MODEL_CALLS.inc(self.name, "rejected")
+            raise CircuitOpenError(f"{self.name} circuit open", status=503, retry_after=self.breaker.retry_in())
+
+    def _throttled(self, what: str):
+        self.breaker.release_trial()
+        MODEL_CALLS.inc(self.name, "throttled")
+        return GovernorTimeoutError(f"{self.name} {what} wait exceeded", status=429)
+
+    def _enter(self):
+        """Pass the breaker, take a rate-limit token and a concurrency slot."""
+        self._admit()
+        if not self.bucket.acquire(self.acquire_timeout):
+            raise self._throttled("rate limit")
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise self._throttled("concurrency")
+        with self._lock:
+            self._in_flight += 1
+
+    async def _aenter(self):
+        """_enter() for coroutines; the slot is polled so the event loop never blocks."""
+        self._admit()
+        if not await self.bucket.aacquire(self.acquire_timeout):
+            raise self._throttled("rate limit")
+        deadline = time.monotonic() + self.acquire_timeout
+        while not self._slots.acquire(blocking=False):
+            if time.monotonic() > deadline:
+                raise self._throttled("concurrency")
+            await asyncio.sleep(SLOT_POLL_SECONDS)
+        with self._lock:
+            self._in_flight += 1
+
+    def _exit(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def _after_failure(self, error: Exception, attempt: int) -> float:
+        """Record a failed attempt; re-raise it, or return the delay before the next one."""
+        if not is_retryable(error):
+            # The upstream answered; it's the request that was refused
+            self.breaker.record_success()
+            MODEL_CALLS.inc(self.name, "error")
+            raise error
+        self.breaker.record_failure()
+        if attempt >= self.max_retries or self.breaker.state == CircuitBreaker.OPEN:
+            MODEL_CALLS.inc(self.name, "error")
+            raise error
+        MODEL_CALLS.inc(self.name, "retry")
+        delay = self.backoff(attempt, getattr(error, "retry_after", None))
+        logger.warning(f"🔁 {self.name} call failed ({error}); retry {attempt + 1} in {delay:.2f}s")
+        return delay
+
+    def _after_success(self):
+        self.breaker.record_success()
+        MODEL_CALLS.inc(self.name, "ok")
+
+    def call(self, fn, *args, **kwargs):
+        """Call fn(*args, **kwargs) under this governor."""
+        attempt = 0
+        while True:
+            self._enter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                failure = e
+            else:
+                self._after_success()
+                return result
+            finally:
+                self._exit()
+
+            self._sleep(self._after_failure(failure, attempt))
+            attempt += 1
+
+    async def acall(self, fn, *args, **kwargs):
+        """Await fn(*args, **kwargs) (a coroutine function) under this governor."""
+        attempt = 0
+        while True:
+            await self._aenter()
+            try:
+                result = await fn(*args, **kwargs)
+            except asyncio.CancelledError:
+                self.breaker.release_trial()
+                raise
+            except Exception as e:
+                failure = e
+            else:
+                self._after_success()
+                return result
+            finally:
+                self._exit()
+
+            await asyncio.sleep(self._after_failure(failure, attempt))
+            attempt += 1
+
+    def stream(self, fn, *args, **kwargs):
+        """
+        Iterate a streaming call under this governor. Failures before the first
+        chunk are retried; once output has started, errors are raised as is.
+        The concurrency slot is held until the stream ends.
+        """
+        attempt = 0
+        while True:
+            self._enter()
+            started = False
+            try:
+                for chunk in fn(*args, **kwargs):
+                    started = True
+                    yield chunk
+            except GeneratorExit:
+                # The consumer stopped early; that says nothing about the upstream
+                self.breaker.release_trial()
+                raise
+            except Exception as e:
+                if started:
+                    self.breaker.record_failure()
+                    MODEL_CALLS.inc(self.name, "error")
+                    raise
+                failure = e
+            else:
+                self._after_success()
+                return
+            finally:
+                self._exit()
+
+            self._sleep(self._after_failure(failure, attempt))
+            attempt += 1
+
+    async def astream(self, fn, *args, **kwargs):
+        """stream() for an async generator function."""
+        attempt = 0
+        while True:
+            await self._aenter()
+            started = False
+            try:
+                async for chunk in fn(*args, **kwargs):
+                    started = True
+                    yield chunk
+            except (GeneratorExit, asyncio.CancelledError):
+                self.breaker.release_trial()
+                raise
+            except Exception as e:
+                if started:
+                    self.breaker.record_failure()
+                    MODEL_CALLS.inc(self.name, "error")
+                    raise
+                failure = e
+            else:
+                self._after_success()
+                return
+            finally:
+                self._exit()
+
+            await asyncio.sleep(self._after_failure(failure, attempt))
+            attempt += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            in_flight = self._in_flight
+        return {"state": self.breaker.state, "in_flight": in_flight}
+
+
+# ──────────────────────────────────────
+# PROCESS-WIDE GOVERNORS
+# ──────────────────────────────────────
+
+_governors = {}
+_governors_lock = threading.Lock()
+
+def get_governor(model: str, kind: str) -> CallGovernor:
+    """The process-wide governor for `model`; `kind` ("text" or "image") picks its limits."""
+    with _governors_lock:
+        governor = _governors.get(model)
+        if governor is None:
+            limits = Config.MODEL_LIMITS[kind]
+            governor = _governors[model] = CallGovernor(
+                model,
+                rate=limits["rps"],
+                burst=limits["burst"],
+                max_concurrency=limits["concurrency"],
+                max_retries=Config.MODEL_RETRY_MAX,
+                base_delay=Config.MODEL_RETRY_BASE_DELAY,
+                max_delay=Config.MODEL_RETRY_MAX_DELAY,
+                failure_threshold=Config.MODEL_BREAKER_THRESHOLD,
+                reset_timeout=Config.MODEL_BREAKER_RESET_SECONDS,
+                acquire_timeout=Config.MODEL_ACQUIRE_TIMEOUT,
+            )
+        return governor
+
+
+@register_collector
+def _governor_gauges():
+    with _governors_lock:
+        governors = list(_governors.values())
+    stats = [(governor.name, governor.stats()) for governor in governors]
+    for name, stat in stats:
+        yield (f'mochi_model_in_flight{{model="{name}"}}', "gauge",
+               "Model calls in flight.", stat["in_flight"])
+    for name, stat in stats:
+        yield (f'mochi_model_breaker_open{{model="{name}"}}', "gauge",
+               "1 while the model's circuit breaker is open.", int(stat["state"] == CircuitBreaker.OPEN))
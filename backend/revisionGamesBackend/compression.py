@@ -0,0 +1,85 @@
+"""
+Response Compression
+=====================
+JSON and text bodies of at least COMPRESSION_MIN_BYTES are compressed
+with the best encoding the client's Accept-Encoding allows: brotli when the
+`brotli` package is installed, otherwise gzip. Streamed responses (the
+NDJSON / SSE generation streams, files) are never touched, so events still
+reach the client as soon as they are produced.
+
+- `compress_response`: the Flask after_request hook (see create_app)
+- `negotiate` / `compress`: the same steps for the ASGI async routes and
+  the response cache, which keeps each encoding once per cached entry
+"""
+
+import gzip
+from flask import request
+from config import Config
+from .metrics import stage_timer
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is used without it
+    brotli = None
+
+GZIP_LEVEL = 6
+# Brotli's sweet spot for responses compressed on the fly
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_TYPES = {"application/json", "application/javascript", "application/xml", "image/svg+xml"}
+# Streamed line by line; compressing them would hold events back
+STREAMING_TYPES = {"text/event-stream", "application/x-ndjson"}
+
+
+def encodings() -> list:
+    """Encodings this server can produce, most preferred first."""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def compressible(mimetype: str, size: int) -> bool:
+    """Whether a body of this type and size is worth compressing."""
+    if not Config.COMPRESSION_ENABLED or size < Config.COMPRESSION_MIN_BYTES:
+        return False
+    mimetype = (mimetype or "").split(";")[0].strip().lower()
+    if mimetype in STREAMING_TYPES:
+        return False
+    return mimetype.startswith("text/") or mimetype in COMPRESSIBLE_TYPES or mimetype.endswith("+json")
+
+
+def negotiate(accept) -> str:
+    """Best encoding allowed by a parsed Accept-Encoding header (werkzeug Accept), or None."""
+    best, best_quality = None, 0
+    for encoding in encodings():
+        quality = accept[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    with stage_timer("response_compress"):
+        if encoding == "br":
+            return brotli.compress(body, quality=BROTLI_QUALITY)
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def compress_response(response):
+    """after_request hook: compress eligible buffered responses for this client."""
+    if (response.direct_passthrough or response.is_streamed or "Content-Encoding" in response.headers
+            or response.status_code < 200 or response.status_code in (204, 206, 304)):
+        return response
+    body = response.get_data()
+    if not compressible(response.mimetype, len(body)):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate(request.accept_encodings)
+    if encoding is None:
+        return response
+    response.set_data(compress(body, encoding))
+    response.headers["Content-Encoding"] = encoding
+    # Each encoding is a different representation, so it gets its own ETag
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak)
+    return response
@@ -0,0 +1,126 @@
+"""
+Feedback Cache & Bank
+======================
+Feedback only depends on (user_answer, correct_answer, target_item), and a
+classroom taps the same few combinations over and over. Two layers sit in
+front of the live Gemini call:
+
+- TTLCache:     in-memory LRU of recent Gemini answers, with expiry
+- FeedbackBank: feedback generated ahead of time per question, persisted to a
+                JSON file, plus instant template messages for anything missing
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def feedback_key(user_answer: str, correct_answer: str, target_item: str) -> tuple:
+    """Normalised cache key so 'Apple ' and 'apple' share an entry."""
+    return tuple(" ".join(str(v).split()).casefold() for v in (user_answer, correct_answer, target_item))
+
+
+class TTLCache:
+    """Thread-safe LRU cache with a maximum size and per-entry expiry."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()      # key -> (stored_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or (self.ttl_seconds and time.monotonic() - entry[0] > self.ttl_seconds):
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._data)}
+
+
+def template_feedback(user_answer: str, correct_answer: str) -> dict:
+    """Instant, no-LLM feedback used when nothing better is ready in time."""
+    if feedback_key(user_answer, "", "")[0] == feedback_key(correct_answer, "", "")[0]:
+        return {"message": f"Yay! You found {correct_answer}! 🌟", "encouragement": "You're a superstar!"}
+    return {"message": f"Good try! That one is {user_answer}.", "encouragement": f"Let's look for {correct_answer} together!"}
+
+
+class FeedbackBank:
+    """Feedback precomputed per question and option, stored in a JSON file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._entries = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _encode(key: tuple) -> str:
+        return "\x1f".join(key)
+
+    def _load(self):
+        self._entries = {}
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"🏦 Could not read feedback bank: {e}")
+
+    def get(self, key: tuple):
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            return self._entries.get(self._encode(key))
+
+    def has(self, key: tuple) -> bool:
+        return self.get(key) is not None
+
+    def update(self, items: dict):
+        """Add {key: feedback} entries and persist the bank."""
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            for key, feedback in items.items():
+                self._entries[self._encode(key)] = feedback
+            if not self.path:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(self._entries, f, ensure_ascii=False)
+                os.replace(tmp, self.path)
+            except OSError as e:
+                logger.error(f"🏦 Could not save feedback bank: {e}")
+
+    def __len__(self):
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            return len(self._entries)
@@ -0,0 +1,227 @@
+"""
+Game Bank
+==========
+Remembers previously generated games so near-identical requests ("count
+apples", "counting red apples") can be served without running the model
+pipeline again.
+
+Each game is indexed by a hashed n-gram vector of its (gameTopic, subject,
+description): character 3-5-grams plus words, hashed with alternating signs
+into a fixed number of dimensions, sublinear term weights, L2-normalised.
+A lookup is one matrix-vector product over the whole bank (cosine
+similarity). Games are persisted as JSON lines, appended by every worker
+and by pregenerate.py; each lookup first indexes whatever was appended
+since the last one, so games banked by another process are found without a
+restart. numpy is imported on first use, so workers that never touch the
+bank don't pay for it at startup.
+"""
+
+import copy
+import json
+import logging
+import math
+import os
+import random
+import threading
+import uuid
+import zlib
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+NGRAM_SIZES = (3, 4, 5)
+
+
+def game_text(game_topic: str, subject: str, description: str) -> str:
+    """Text that identifies a request; the topic counts twice."""
+    return " | ".join([game_topic, game_topic, subject, description])
+
+
+def vectorize(text: str, dims: int) -> "np.ndarray":
+    """Signed, hashed n-gram vector, L2-normalised (float32)."""
+    import numpy as np
+    normalized = " ".join(text.casefold().split())
+    counts = {}
+    padded = f" {normalized} "
+    for n in NGRAM_SIZES:
+        for i in range(len(padded) - n + 1):
+            gram = padded[i:i + n]
+            counts[gram] = counts.get(gram, 0) + 1
+    for word in normalized.split():
+        key = "w:" + word
+        counts[key] = counts.get(key, 0) + 1
+
+    vector = np.zeros(dims, dtype=np.float32)
+    for gram, count in counts.items():
+        h = zlib.crc32(gram.encode("utf-8"))
+        sign = 1.0 if h & 0x80000000 else -1.0
+        vector[h % dims] += sign * (1.0 + math.log(count))
+
+    norm = float(np.linalg.norm(vector))
+    if norm:
+        vector /= norm
+    return vector
+
+
+class GameBank:
+    """Append-only store of generated games with a cosine-similarity index."""
+
+    def __init__(self, path: str = None, dims: int = 256):
+        self.path = path
+        self.dims = dims
+        self._games = []
+        self._matrix = None  # allocated with the first vector
+        self._size = 0
+        self._offset = 0     # bytes of the file indexed so far
+        self._lock = threading.Lock()
+
+    def _append_vector(self, vector: "np.ndarray"):
+        import numpy as np
+        capacity = 0 if self._matrix is None else len(self._matrix)
+        if self._size == capacity:
+            grown = np.zeros((max(1024, capacity * 2), self.dims), dtype=np.float32)
+            if self._size:
+                grown[:self._size] = self._matrix[:self._size]
+            self._matrix = grown
+        self._matrix[self._size] = vector
+        self._size += 1
+
+    def _catch_up(self):
+        """Index lines appended to the file since the last call, by any process. Caller holds the lock."""
+        if not self.path:
+            return
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        if size < self._offset:
+            # Replaced or truncated: index it again from the start
+            self._games, self._matrix, self._size, self._offset = [], None, 0, 0
+        if size == self._offset:
+            return
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                chunk = f.read(size - self._offset)
+        except OSError as e:
+            logger.error(f"🏦 Could not read game bank: {e}")
+            return
+
+        # A line another process is still writing is left for the next call
+        end = chunk.rfind(b"\n") + 1
+        for line in chunk[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                self._index(json.loads(line))
+            except (ValueError, KeyError) as e:
+                logger.error(f"🏦 Skipping unreadable game bank line: {e}")
+        self._offset += end
+
+    def _index(self, game: dict):
+        self._games.append(game)
+        self._append_vector(vectorize(game["text"], self.dims))
+
+    def add(self, game_topic: str, subject: str, description: str, questions: list):
+        """Store a finished game."""
+        game = {
+            "text": game_text(game_topic, subject, description),
+            "params": {"gameTopic": game_topic, "subject": subject, "description": description},
+            "questions": questions,
+        }
+        with self._lock:
+            if not self.path:
+                self._index(game)
+                return
+            line = (json.dumps(game, ensure_ascii=False) + "\n").encode("utf-8")
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                # One O_APPEND write, so lines from different processes never interleave
+                fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, line)
+                finally:
+                    os.close(fd)
+            except OSError as e:
+                logger.error(f"🏦 Could not save game to bank: {e}")
+                self._index(game)  # still reusable by this process
+                return
+            # Picks up this game along with anything other processes appended
+            self._catch_up()
+
+    def add_many(self, games):
+        """Index (game_topic, subject, description, questions) tuples in memory only."""
+        with self._lock:
+            self._catch_up()
+            for game_topic, subject, description, questions in games:
+                self._index({
+                    "text": game_text(game_topic, subject, description),
+                    "params": {"gameTopic": game_topic, "subject": subject, "description": description},
+                    "questions": questions,
+                })
+
+    def find(self, game_topic: str, subject: str, description: str, threshold: float):
+        """
+        Best stored game whose similarity is at least `threshold`, as
+        (similarity, game), or None.
+        """
+        import numpy as np
+        query = vectorize(game_text(game_topic, subject, description), self.dims)
+        with self._lock:
+            self._catch_up()
+            if self._size == 0:
+                return None
+            scores = self._matrix[:self._size] @ query
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+            game = self._games[best]
+
+        if similarity < threshold:
+            return None
+        return similarity, game
+
+    def __len__(self):
+        with self._lock:
+            self._catch_up()
+            return self._size
+
+
+def reuse_questions(game: dict, shuffle_options: bool = False) -> list:
+    """Fresh copy of a stored game's questions with new ids (options optionally shuffled)."""
+    questions = copy.deepcopy(game["questions"])
+    for q in questions:
+        q["id"] = str(uuid.uuid4())
+        if shuffle_options:
+            random.shuffle(q["options"])
+    return questions
+
+
+_bank = None
+_bank_lock = threading.Lock()
+
+def get_game_bank() -> GameBank:
+    global _bank
+    with _bank_lock:
+        if _bank is None:
+            _bank = GameBank(Config.GAME_BANK_PATH, dims=Config.GAME_BANK_DIMS)
+        return _bank
+
+
+def remember_game(game_topic: str, subject: str, description: str, questions: list):
+    """Add a finished game to the bank, if enabled and every image made it."""
+    if not Config.GAME_BANK_ENABLED or not questions:
+        return
+    complete = all(opt.get("image") or opt.get("imageBlocked") for q in questions for opt in q.get("options", []))
+    if complete:
+        get_game_bank().add(game_topic, subject, description, copy.deepcopy(questions))
+
+
+def find_similar_game(game_topic: str, subject: str, description: str, shuffle_options: bool = False):
+    """Questions from a stored game similar enough to this request, as (similarity, questions), or None."""
+    if not Config.GAME_BANK_ENABLED:
+        return None
+    match = get_game_bank().find(game_topic, subject, description, Config.GAME_BANK_THRESHOLD)
+    if match is None:
+        return None
+    similarity, game = match
+    return similarity, reuse_questions(game, shuffle_options)
@@ -0,0 +1,120 @@
+"""
+Game Bundles
+=============
+Everything a child's device needs to play a category, in one response for
+`GET /api/categories/<id>/bundle`:
+
+- the category, its questions and their options
+- each option's image URL with its size (and a `srcset` of the resized
+  variants), so the game can lay out tiles before the pictures arrive
+- feedback for every option, so a tap needs no /api/feedback round trip
+- a prefetch manifest of the images and audio to fetch before play starts
+
+After that, the only call a game makes is POST /api/progress at the end.
+
+Feedback comes from the feedback cache or bank, falling back to the
+template. Questions with template feedback are queued for precompute (when
+FEEDBACK_PRECOMPUTE is on), so bundles built later carry model-written
+feedback instead.
+"""
+
+import re
+from urllib.parse import urlsplit, parse_qs
+from config import Config
+from .image_store import image_store, asset_url
+from .image_variants import supported_formats
+from .gemini_services import stored_feedback, prime_feedback_bank
+from .feedback_cache import feedback_key
+
+ASSET_URL_RE = re.compile(r"/api/images/([0-9a-f]{32})")
+
+
+def _fitted(size: tuple, width: int) -> tuple:
+    """Size of a variant resized to fit `width` px (never upscaled), as image_variants renders it."""
+    w, h = size
+    scale = min(1.0, width / max(w, h))
+    return max(1, round(w * scale)), max(1, round(h * scale))
+
+
+def image_info(url: str) -> tuple:
+    """
+    (url, size) for an option image. Stored assets get the URL of the default
+    variant and {"width", "height", "srcset"}; other URLs keep their own and a
+    size only if their query string states one (?w=&h=, as Unsplash links do).
+    """
+    match = ASSET_URL_RE.search(url or "")
+    if not match:
+        query = parse_qs(urlsplit(url or "").query)
+        try:
+            return url or "", {"width": int(query["w"][0]), "height": int(query["h"][0])}
+        except (KeyError, ValueError):
+            return url or "", None
+
+    asset_id = match.group(1)
+    original = image_store.dimensions(asset_id)
+    if original is None:
+        return asset_url(asset_id), None
+
+    # Without a variant encoder every ?w= is answered with the original
+    resized = bool(supported_formats())
+    default_width = Config.IMAGE_DEFAULT_WIDTH if resized else 0
+    width, height = _fitted(original, default_width) if default_width else original
+    size = {"width": width, "height": height}
+    if resized and Config.IMAGE_VARIANT_SIZES:
+        candidates = {}
+        for w in sorted(Config.IMAGE_VARIANT_SIZES):
+            candidates.setdefault(_fitted(original, w)[0], asset_url(asset_id, w))
+        size["srcset"] = ", ".join(f"{u} {w}w" for w, u in candidates.items())
+    return asset_url(asset_id), size
+
+
+def _is_url(value: str) -> bool:
+    return bool(value) and (value.startswith("/") or "://" in value)
+
+
+def build_bundle(category: dict, truncated: bool) -> dict:
+    """Bundle body for a row from fetch_category_bundle."""
+    images, audio = [], []
+    needs_feedback = []
+    questions = []
+    for q in category["questions"]:
+        options = []
+        templated = False
+        for opt in q["options"]:
+            url, size = image_info(opt.get("image_url"))
+            feedback, source = stored_feedback(opt["label"], q["correct_answer"], q["target_item"])
+            templated = templated or source == "template"
+            option = {
+                "id": opt["id"],
+                "label": opt["label"],
+                "image_url": url,
+                "correct": feedback_key(opt["label"], "", "") == feedback_key(q["correct_answer"], "", ""),
+                "feedback": feedback,
+            }
+            if size:
+                option["image"] = size
+            options.append(option)
+            if _is_url(url) and url not in images:
+                images.append(url)
+        if q.get("audio_url"):
+            audio.append(q["audio_url"])
+        if templated:
+            needs_feedback.append(q)
+        questions.append({
+            "id": q["id"],
+            "target_item": q["target_item"],
+            "correct_answer": q["correct_answer"],
+            "audio_url": q.get("audio_url"),
+            "options": options,
+        })
+
+    prime_feedback_bank(needs_feedback)
+
+    if _is_url(category.get("icon_url", "")):
+        images.insert(0, category["icon_url"])
+    return {
+        "category": {k: category[k] for k in ("id", "name", "description", "icon_url", "color")},
+        "questions": questions,
+        "truncated": truncated,
+        "prefetch": {"images": images, "audio": audio},
+    }
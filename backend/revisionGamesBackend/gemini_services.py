@@ -4,107 +4,290 @@ Gemini AI Service + Native Gemini 3 Image Generation
 Project MOCHI: A preschool educational assistant.
 Handles text generation via Gemini 2.0 Flash and 
 image generation via Gemini 3 Pro Image Preview.
+Model calls go through `model_backends`, so MODEL_BACKEND=fake runs offline.
+The ASYNC SERVING section holds coroutine versions of the request-path
+entry points for the ASGI app (asgi.py).
 """
 
-from google.genai import Client, types
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
 import json
 import logging
+import math
+import queue
+import threading
+import time
 import uuid
 import base64
+import copy
 from config import Config
+from .image_cache import ImageCache, make_key
+from .image_store import image_store, asset_url
+from .image_variants import schedule_variants, supported_formats
+from .model_backends import get_backend
+from .call_governor import get_governor
+from .singleflight import SingleFlight, AsyncSingleFlight, DatabaseFlight, flight_key
+from .safety import build_matcher
+from .json_stream import JsonArrayStream, parse_json_array, item_key
+from .metrics import stage_timer, register_collector, STAGE_SECONDS, CACHE_EVENTS, SAFETY_BLOCKS
+from .feedback_cache import TTLCache, FeedbackBank, feedback_key, template_feedback
 
 # Initialize Logging
 logger = logging.getLogger(__name__)
 
-# Initialize Gemini Client
-client = Client(api_key=Config.GEMINI_API_KEY)
+TEXT_MODEL = "gemini-2.0-flash"
+
+# Shared rate limits, retries and circuit breakers for every model call
+text_governor = get_governor(TEXT_MODEL, "text")
 
 # ──────────────────────────────────────
 # SAFETY & CONTENT CONTROL
 # ──────────────────────────────────────
 
-SAFETY_BLOCKLIST = [
-    'gun', 'weapon', 'knife', 'sword', 'blood', 'gore', 'violence', 
-    'kill', 'death', 'war', 'bomb', 'scary', 'fight', 'monster', '18+'
-]
+safety_matcher = build_matcher(Config.SAFETY_BLOCKLIST_PATH)
+SAFETY_BLOCKLIST = safety_matcher.terms
 
 def is_safe(query: str) -> bool:
     """Verifies that the prompt is appropriate for kids aged 2-6."""
-    normalized = query.lower().strip()
-    return not any(word in normalized for word in SAFETY_BLOCKLIST)
+    return safety_matcher.is_safe(query)
+
+def screen_image_prompts(questions: list) -> None:
+    """
+    Checks every option's imageGenerationPrompt in one pass. Unsafe prompts are
+    never sent to the image model; the option is flagged `imageBlocked` instead.
+    """
+    options = [opt for q in questions for opt in q['options']]
+    verdicts = safety_matcher.check_batch(opt.get('imageGenerationPrompt', opt['label']) for opt in options)
+    for opt, term in zip(options, verdicts):
+        if term:
+            logger.warning(f"🛡️ Blocked image prompt for '{opt['label']}' (matched '{term}').")
+            SAFETY_BLOCKS.inc("image_prompt")
+            opt['imageBlocked'] = True
 
 # ──────────────────────────────────────
 # IMAGE GENERATION (GEMINI 3 PRO)
 # ──────────────────────────────────────
 
-def generate_ai_image(prompt_text: str) -> str:
-    """
-    Generates a custom image using Nano Banana Pro (Gemini 3 Pro Image).
-    Returns a Base64 data URI string.
-    """
-    if not Config.GEMINI_API_KEY:
-        logger.error("❌ GEMINI_API_KEY is missing!")
-        return None
+IMAGE_MODEL = 'gemini-3-pro-image-preview'
+IMAGE_SYSTEM_INSTRUCTION = "You are Mochi, a professional AI photography assistant for kids. Generate high-fidelity, clean, and joyful images on plain backgrounds."
+IMAGE_PROMPT_TEMPLATE = "A clean, simple, photorealistic photo for a kids educational game showing: {prompt}. Easy to see and count."
+IMAGE_ASPECT_RATIO = "1:1"
+IMAGE_TEMPERATURE = 0.4
 
-    try:
-        config = types.GenerateContentConfig(
-            system_instruction="You are Mochi, a professional AI photography assistant for kids. Generate high-fidelity, clean, and joyful images on plain backgrounds.",
-            safety_settings=[
-                types.SafetySetting(category='HARM_CATEGORY_DANGEROUS_CONTENT', threshold='BLOCK_LOW_AND_ABOVE'),
-            ],
-            response_modalities=["TEXT", "IMAGE"],
-            image_config=types.ImageConfig(aspect_ratio="1:1"),
-            temperature=0.4 
-        )
+image_governor = get_governor(IMAGE_MODEL, "image")
 
-        # Force specific cleanliness based on the prompt
-        final_prompt = f"A clean, simple, photorealistic photo for a kids educational game showing: {prompt_text}. Easy to see and count."
+# Identical prompts rendering at the same moment share one model call
+image_flights = SingleFlight() if Config.SINGLEFLIGHT_ENABLED else None
 
-        response = client.models.generate_content(
-            model='gemini-3-pro-image-preview',
-            contents=final_prompt,
-            config=config
-        )
+# Anything that changes the rendered picture must be part of the cache key
+IMAGE_CONFIG_FINGERPRINT = json.dumps({
+    "system_instruction": IMAGE_SYSTEM_INSTRUCTION,
+    "prompt_template": IMAGE_PROMPT_TEMPLATE,
+    "aspect_ratio": IMAGE_ASPECT_RATIO,
+    "temperature": IMAGE_TEMPERATURE,
+}, sort_keys=True)
 
-        if not response.candidates or response.candidates[0].finish_reason == "SAFETY":
-            logger.warning("🛡️ Gemini API Safety Block triggered.")
-            return None
+image_cache = ImageCache(
+    Config.IMAGE_CACHE_DIR,
+    max_bytes=Config.IMAGE_CACHE_MAX_MB * 1024 * 1024,
+    ttl_seconds=Config.IMAGE_CACHE_TTL_HOURS * 3600,
+) if Config.IMAGE_CACHE_ENABLED else None
 
-        for part in response.candidates[0].content.parts:
-            # Skip the 'Thinking' process of the model
-            if hasattr(part, 'thought') and part.thought:
-                continue
-            if part.inline_data:
-                base64_data = base64.b64encode(part.inline_data.data).decode('utf-8')
-                return f"data:image/png;base64,{base64_data}"
+@register_collector
+def _cache_gauges():
+    if image_cache is not None:
+        stats = image_cache.stats()
+        yield "mochi_image_cache_bytes", "gauge", "Bytes held by the generated image cache.", stats["bytes"]
+        yield "mochi_image_cache_entries", "gauge", "Entries in the generated image cache.", stats["entries"]
+    yield "mochi_feedback_cache_entries", "gauge", "Entries in the feedback cache.", feedback_cache.stats()["entries"]
 
+def _render_image(prompt_text: str) -> bytes:
+    """Calls the image model and returns the raw image bytes (or None)."""
+    # Force specific cleanliness based on the prompt
+    final_prompt = IMAGE_PROMPT_TEMPLATE.format(prompt=prompt_text)
+
+    with stage_timer("image_model_call"):
+        data = image_governor.call(
+            get_backend().generate_image,
+            IMAGE_MODEL,
+            final_prompt,
+            system_instruction=IMAGE_SYSTEM_INSTRUCTION,
+            aspect_ratio=IMAGE_ASPECT_RATIO,
+            temperature=IMAGE_TEMPERATURE,
+            # Per-image timeout so one slow render can't hold the whole game hostage
+            timeout=Config.IMAGE_GEN_TIMEOUT,
+        )
+    if data is None:
+        logger.warning("🛡️ Gemini API Safety Block triggered.")
+        SAFETY_BLOCKS.inc("image_model")
+    return data
+
+def generate_image_bytes(prompt_text: str) -> bytes:
+    """
+    Returns PNG bytes for a prompt, served from the image cache when this
+    prompt has been rendered before with the same model and config.
+    """
+    if not get_backend().is_configured():
+        logger.error("❌ GEMINI_API_KEY is missing!")
         return None
 
+    key = make_key(prompt_text, f"{get_backend().name}:{IMAGE_MODEL}", IMAGE_CONFIG_FINGERPRINT)
+    if image_cache is not None:
+        with stage_timer("image_cache_lookup"):
+            cached = image_cache.get(key)
+        if cached is not None:
+            logger.info(f"🗄️ Image cache hit for: '{prompt_text}'")
+            CACHE_EVENTS.inc("image", "hit")
+            return cached
+        CACHE_EVENTS.inc("image", "miss")
+
+    try:
+        if image_flights is None:
+            return _render_and_cache(prompt_text, key)
+        data, shared = image_flights.do(key, lambda: _render_and_cache(prompt_text, key))
+        if shared:
+            CACHE_EVENTS.inc("image", "coalesced")
+        return data
     except Exception as e:
         logger.error(f"📸 Image Generation Error: {e}")
         return None
 
-# ──────────────────────────────────────
-# QUESTION GENERATION
-# ──────────────────────────────────────
+def _render_and_cache(prompt_text: str, key: str) -> bytes:
+    data = _render_image(prompt_text)
+    if data and image_cache is not None:
+        with stage_timer("image_cache_store"):
+            image_cache.put(key, data)
+    return data
 
-def generate_questions(game_topic: str, subject: str, description: str) -> list:
+def generate_ai_image(prompt_text: str) -> str:
     """
-    Main entry point: Generates text with Flash and generates custom photos with Pro Image.
+    Generates a custom image using Nano Banana Pro (Gemini 3 Pro Image).
+    Returns the URL of the stored image asset (resized variants are made
+    alongside it in the background), or a Base64 data URI string when IMAGE_DELIVERY is "data_uri".
     """
-    if not Config.GEMINI_API_KEY:
-        logger.error("❌ GEMINI_API_KEY is missing!")
-        return []
+    data = generate_image_bytes(prompt_text)
+    if not data:
+        return None
+    return _deliver_image(data)
 
-    # 1. Preschool Safety Guard
-    if not is_safe(game_topic) or not is_safe(description):
-        logger.warning("🛡️ Safety trigger! Defaulting to Puppies.")
-        game_topic = "Happy Puppies"
-        description = "Learn about friendly puppies playing in a garden."
+def _deliver_image(data: bytes) -> str:
+    """Stores image bytes and returns their URL, or a data URI (see generate_ai_image)."""
+    if Config.IMAGE_DELIVERY == "url":
+        try:
+            with stage_timer("image_store_save"):
+                asset_id = image_store.save(data)
+        except OSError as e:
+            logger.error(f"🗄️ Image store write failed, inlining image instead: {e}")
+        else:
+            schedule_variants(asset_id, data)
+            return asset_url(asset_id)
+
+    with stage_timer("image_base64_encode"):
+        base64_data = base64.b64encode(data).decode('utf-8')
+    return f"data:image/png;base64,{base64_data}"
 
+def _timed_ai_image(prompt_text: str) -> str:
+    with stage_timer("image_total"):
+        return generate_ai_image(prompt_text)
+
+_TEXT_DONE = "text_done"
+
+def _produce_questions(source, events: queue.Queue, stop: threading.Event):
+    """Feeds questions from a (possibly still streaming) source into the event queue."""
     try:
-        # 2. Generate the Lesson Plan (Text)
-        prompt = f"""
+        for q in source:
+            if stop.is_set():
+                break
+            events.put(("question", q))
+    except Exception as e:
+        logger.error(f"🧠 Gemini/Process Error: {e}")
+    finally:
+        if hasattr(source, "close"):
+            source.close()
+        events.put((_TEXT_DONE,))
+
+def iter_pipeline(question_source):
+    """
+    Runs image generation alongside question generation. `question_source` is
+    a list of questions or an iterator still producing them (e.g. parsing a
+    streamed text response). Yields, in the order things happen:
+    - ("question", q) as each question arrives; its option images start
+      rendering straight away (bounded by IMAGE_GEN_MAX_WORKERS)
+    - ("text_done",) once the source is exhausted
+    - ("image", q, option_index, image) as each image finishes
+    Options that time out, or whose prompt was blocked by
+    screen_image_prompts, yield an image of None.
+    """
+    events = queue.Queue()
+    stop = threading.Event()
+    if isinstance(question_source, list):
+        for q in question_source:
+            events.put(("question", q))
+        events.put((_TEXT_DONE,))
+    else:
+        threading.Thread(
+            target=_produce_questions, args=(question_source, events, stop),
+            name="mochi-text", daemon=True,
+        ).start()
+
+    workers = max(1, Config.IMAGE_GEN_MAX_WORKERS)
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mochi-image")
+    pending = {}
+    text_done = False
+    deadline = None
+    try:
+        while not text_done or pending:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                event = events.get(timeout=timeout)
+            except queue.Empty:
+                for future, (q, i, opt) in list(pending.items()):
+                    future.cancel()
+                    logger.warning(f"⏱️ Image generation timed out for: '{opt['label']}'")
+                    yield "image", q, i, None
+                pending.clear()
+                deadline = None
+                continue
+
+            kind = event[0]
+            if kind == _TEXT_DONE:
+                text_done = True
+                yield (_TEXT_DONE,)
+
+            elif kind == "question":
+                q = event[1]
+                yield "question", q
+                for i, opt in enumerate(q['options']):
+                    if opt.get('imageBlocked'):
+                        yield "image", q, i, None
+                        continue
+                    search_term = opt.get('imageGenerationPrompt', opt['label'])
+                    logger.info(f"🎨 Mochi is generating a custom image for: '{search_term}'")
+                    future = executor.submit(_timed_ai_image, search_term)
+                    pending[future] = (q, i, opt)
+                    future.add_done_callback(lambda f: events.put(("image", f)))
+                if pending:
+                    # Each call is bounded by its own HTTP timeout; this is the backstop
+                    # for what is queued, allowing for queueing when options exceed workers.
+                    deadline = time.monotonic() + Config.IMAGE_GEN_TIMEOUT * math.ceil(len(pending) / workers)
+
+            else:
+                future = event[1]
+                job = pending.pop(future, None)
+                if job is None or future.cancelled():
+                    continue  # already reported as timed out
+                q, i, _ = job
+                yield "image", q, i, future.result()
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+# ──────────────────────────────────────
+# QUESTION GENERATION
+# ──────────────────────────────────────
+
+def _question_prompt(game_topic: str, subject: str, description: str) -> str:
+    return f"""
         Act as Mochi, a preschool teacher. Create a fun, multiple-choice educational game.
         
         Here is your core data:
@@ -138,51 +321,516 @@ def generate_questions(game_topic: str, subject: str, description: str) -> list:
         ]
         """
 
-        response = client.models.generate_content(
-            model="gemini-2.0-flash", 
-            contents=prompt
-        )
-        
-        # Clean JSON parsing
-        text = response.text.strip()
-        if "```json" in text:
-            text = text.split("```json")[1].split("```")[0].strip()
-        elif "```" in text:
-            text = text.split("```")[1].split("```")[0].strip()
-            
-        questions = json.loads(text)
-
-        # 3. Enrich with AI Generated Photos
-        for q in questions:
-            q["id"] = str(uuid.uuid4())
-            for opt in q['options']:
-                search_term = opt.get('imageGenerationPrompt', opt['label'])
-                
-                logger.info(f"🎨 Mochi is generating a custom image for: '{search_term}'")
-                generated_image = generate_ai_image(search_term)
-                opt['image'] = generated_image
-
-        return questions
+def _prepare_question(item) -> dict:
+    """Gives a parsed question its `id` and empty image slots; None if it is unusable."""
+    options = item.get('options') if isinstance(item, dict) else None
+    if not isinstance(options, list) or not all(isinstance(o, dict) and 'label' in o for o in options):
+        logger.warning("🧠 Skipping a malformed question from the model.")
+        return None
+    item["id"] = str(uuid.uuid4())
+    for opt in options:
+        opt['image'] = None
+    screen_image_prompts([item])
+    return item
+
+def iter_question_text(game_topic: str, subject: str, description: str):
+    """
+    Streams the questions, labels and answers from Flash, yielding each
+    question as soon as its JSON object is complete. If the streamed JSON
+    can't be trusted (fenced oddly, truncated, malformed), the full response
+    is parsed once more at the end and any questions not yet yielded follow.
+    Raises on model errors.
+    """
+    if not get_backend().is_configured():
+        logger.error("❌ GEMINI_API_KEY is missing!")
+        return
+
+    # 1. Preschool Safety Guard
+    game_topic, description = _screen_topic(game_topic, description)
+
+    # 2. Generate the Lesson Plan (Text), streamed
+    prompt = _question_prompt(game_topic, subject, description)
+    parser = JsonArrayStream()
+    started = time.perf_counter()
+    first_seen = False
+    with stage_timer("question_text_call"):
+        for chunk in text_governor.stream(get_backend().stream_text, TEXT_MODEL, prompt):
+            for item in parser.feed(chunk):
+                q = _prepare_question(item)
+                if q is None:
+                    continue
+                if not first_seen:
+                    first_seen = True
+                    STAGE_SECONDS.observe(time.perf_counter() - started, "question_text_first")
+                yield q
+
+    # 3. Recovery: parse the complete response
+    yield from _recovered_questions(parser)
+
+def _screen_topic(game_topic: str, description: str) -> tuple:
+    """Swaps an unsafe topic for a friendly default."""
+    if any(safety_matcher.check_batch([game_topic, description])):
+        logger.warning("🛡️ Safety trigger! Defaulting to Puppies.")
+        SAFETY_BLOCKS.inc("topic")
+        return "Happy Puppies", "Learn about friendly puppies playing in a garden."
+    return game_topic, description
+
+def _recovered_questions(parser: JsonArrayStream) -> list:
+    """
+    Questions the stream parser missed, re-parsed from the full text when it
+    can't be trusted. Items already streamed are matched by content, not by
+    position, since a malformed item shifts the positions.
+    """
+    if parser.trustworthy:
+        return []
+    logger.warning("🧠 Streamed JSON was incomplete or malformed; re-parsing the full response.")
+    with stage_timer("question_json_parse"):
+        items = parse_json_array(parser.text)
+    missed = []
+    for item in items:
+        if not isinstance(item, dict) or item_key(item) in parser.keys:
+            continue
+        parser.keys.add(item_key(item))
+        missed.append(item)
+    return [q for q in map(_prepare_question, missed) if q is not None]
+
+def iter_game_events(game_topic: str, subject: str, description: str):
+    """
+    Generates a whole game as a stream of events, overlapping text and image
+    generation: a `question` event as each question is parsed from the
+    streamed text (its option images start rendering at once), an `image`
+    event per option as each image is ready, then `done`. The feedback bank
+    is primed once all the questions are known.
+    """
+    questions = []
+    for event in iter_pipeline(iter_question_text(game_topic, subject, description)):
+        if event[0] == "question":
+            questions.append(event[1])
+            yield {"type": "question", "index": len(questions) - 1, "question": event[1]}
+        elif event[0] == _TEXT_DONE:
+            prime_feedback_bank(questions)
+        else:
+            yield _image_event(*event[1:])
+
+    yield {"type": "done", "questions": len(questions)}
+
+def _image_event(q: dict, i: int, image: str) -> dict:
+    q['options'][i]['image'] = image
+    return {"type": "image", "questionId": q["id"], "optionIndex": i, "image": image}
+
+# Identical game requests in flight at the same moment share one generation,
+# optionally across processes through Postgres
+game_flights = SingleFlight(
+    DatabaseFlight(
+        ttl_seconds=Config.SINGLEFLIGHT_DB_TTL_SECONDS,
+        wait_timeout=Config.SINGLEFLIGHT_WAIT_TIMEOUT,
+        poll_interval=Config.SINGLEFLIGHT_POLL_INTERVAL,
+        lease_seconds=Config.SINGLEFLIGHT_LEASE_SECONDS,
+    ) if Config.SINGLEFLIGHT_DB and Config.DB_ENABLED else None
+) if Config.SINGLEFLIGHT_ENABLED else None
+
+def generate_questions(game_topic: str, subject: str, description: str) -> list:
+    """
+    Main entry point: Generates text with Flash and generates custom photos with Pro Image.
+    Image generation for each question starts as soon as its text has streamed in.
+    Concurrent identical requests are coalesced into one generation.
+    """
+    if game_flights is None:
+        return _generate_questions(game_topic, subject, description)
 
+    key = flight_key("game", get_backend().name, TEXT_MODEL, game_topic, subject, description)
+    questions, shared = game_flights.do(key, lambda: _generate_questions(game_topic, subject, description))
+    if shared:
+        CACHE_EVENTS.inc("game", "coalesced")
+        return copy.deepcopy(questions)
+    return questions
+
+def _generate_questions(game_topic: str, subject: str, description: str) -> list:
+    questions = []
+    try:
+        for event in iter_game_events(game_topic, subject, description):
+            if event["type"] == "question":
+                questions.append(event["question"])
     except Exception as e:
         logger.error(f"🧠 Gemini/Process Error: {e}")
         return []
 
+    return questions
+
 # ──────────────────────────────────────
 # FEEDBACK GENERATION
 # ──────────────────────────────────────
 
+feedback_cache = TTLCache(Config.FEEDBACK_CACHE_SIZE, Config.FEEDBACK_CACHE_TTL_SECONDS)
+feedback_bank = FeedbackBank(Config.FEEDBACK_BANK_PATH)
+
+# Live feedback calls run here so the request thread can stop waiting at the
+# latency budget while the call finishes (and fills the cache) in the background.
+_feedback_executor = ThreadPoolExecutor(max_workers=Config.FEEDBACK_MAX_WORKERS, thread_name_prefix="mochi-feedback")
+# Bank precompute gets its own small pool, so it never queues ahead of a child
+# waiting for feedback, and it holds back while live calls are in flight.
+_precompute_executor = ThreadPoolExecutor(max_workers=max(1, Config.FEEDBACK_PRECOMPUTE_WORKERS),
+                                          thread_name_prefix="mochi-feedback-precompute")
+PRECOMPUTE_MAX_DEFER_SECONDS = 5.0
+
+_live_feedback = 0
+_live_feedback_lock = threading.Lock()
+
+def _live_feedback_started():
+    global _live_feedback
+    with _live_feedback_lock:
+        _live_feedback += 1
+
+def _live_feedback_finished(_done=None):
+    global _live_feedback
+    with _live_feedback_lock:
+        _live_feedback -= 1
+
+def _defer_to_live_feedback():
+    """Precompute waits (up to PRECOMPUTE_MAX_DEFER_SECONDS) while live feedback calls are pending."""
+    deadline = time.monotonic() + PRECOMPUTE_MAX_DEFER_SECONDS
+    while _live_feedback > 0 and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+def _generate_feedback_llm(user_answer: str, correct_answer: str, target_item: str) -> dict:
+    """Live Gemini Flash call for feedback. Raises on any failure."""
+    with stage_timer("feedback_text_call"):
+        text = text_governor.call(get_backend().generate_text, TEXT_MODEL, _feedback_prompt(user_answer, correct_answer, target_item))
+    return _parse_feedback(text)
+
+def _feedback_prompt(user_answer: str, correct_answer: str, target_item: str) -> str:
+    return f"Mochi says: Child picked '{user_answer}', correct was '{correct_answer}'. Topic: '{target_item}'. Give happy feedback (max 12 words) and encouragement in JSON: {{'message': 'string', 'encouragement': 'string'}}"
+
+def _parse_feedback(text: str) -> dict:
+    text = text.strip()
+    if "```" in text: text = text.split("```")[1].split("```")[0].strip()
+    if text.startswith("json"): text = text[4:].strip()
+
+    return json.loads(text)
+
+def _remember_feedback(key: tuple, future):
+    if not future.cancelled() and future.exception() is None:
+        feedback_cache.set(key, future.result())
+
 def generate_feedback(user_answer: str, correct_answer: str, target_item: str) -> dict:
-    """Generates encouraging, Mochi-themed feedback for the child."""
+    """
+    Generates encouraging, Mochi-themed feedback for the child.
+    Answers come from the cache or the precomputed bank when possible. Otherwise
+    Gemini gets FEEDBACK_LATENCY_BUDGET seconds before a template answer is
+    used; a late Gemini answer still lands in the cache for the next child.
+    """
+    key = feedback_key(user_answer, correct_answer, target_item)
+    known = _known_feedback(key)
+    if known:
+        return known
+
+    _live_feedback_started()
+    future = _feedback_executor.submit(_generate_feedback_llm, user_answer, correct_answer, target_item)
+    future.add_done_callback(_live_feedback_finished)
+    future.add_done_callback(lambda f: _remember_feedback(key, f))
     try:
-        prompt = f"Mochi says: Child picked '{user_answer}', correct was '{correct_answer}'. Topic: '{target_item}'. Give happy feedback (max 12 words) and encouragement in JSON: {{'message': 'string', 'encouragement': 'string'}}"
-        
-        response = client.models.generate_content(model="gemini-2.0-flash", contents=prompt)
-        text = response.text.strip()
-        if "```" in text: text = text.split("```")[1].split("```")[0].strip()
-        if text.startswith("json"): text = text[4:].strip()
-        
-        return json.loads(text)
+        return dict(future.result(timeout=Config.FEEDBACK_LATENCY_BUDGET))
+    except FuturesTimeout:
+        logger.warning("⏱️ Feedback over latency budget, answering from template.")
+        CACHE_EVENTS.inc("feedback", "budget_exceeded")
+    except Exception as e:
+        logger.error(f"🧠 Feedback Generation Error: {e}")
+    return template_feedback(user_answer, correct_answer)
+
+def _known_feedback(key: tuple) -> dict:
+    """Feedback from the cache or the bank, or None (counted as a miss)."""
+    cached = feedback_cache.get(key)
+    if cached:
+        CACHE_EVENTS.inc("feedback", "hit")
+        return dict(cached)
+    banked = feedback_bank.get(key)
+    if banked:
+        CACHE_EVENTS.inc("feedback_bank", "hit")
+        return dict(banked)
+    CACHE_EVENTS.inc("feedback", "miss")
+    return None
+
+def stored_feedback(user_answer: str, correct_answer: str, target_item: str) -> tuple:
+    """
+    (feedback, source) without calling the model: from the cache or bank
+    ("bank") when there is an entry, otherwise the template ("template").
+    """
+    key = feedback_key(user_answer, correct_answer, target_item)
+    known = feedback_cache.get(key) or feedback_bank.get(key)
+    if known:
+        return dict(known), "bank"
+    return template_feedback(user_answer, correct_answer), "template"
+
+def precompute_feedback(questions: list) -> int:
+    """
+    Fills the feedback bank for every option of every question (blocking).
+    Accepts generated questions (`questionText`) or stored ones (`target_item`).
+    Returns how many new entries were added.
+    """
+    items = {}
+    for q in questions:
+        target_item = q.get("questionText") or q.get("target_item", "")
+        correct_answer = q.get("correct_answer", "")
+        for opt in q.get("options", []):
+            key = feedback_key(opt["label"], correct_answer, target_item)
+            if key in items or feedback_bank.has(key):
+                continue
+            _defer_to_live_feedback()
+            try:
+                items[key] = _generate_feedback_llm(opt["label"], correct_answer, target_item)
+            except Exception as e:
+                logger.error(f"🏦 Feedback precompute failed for '{opt['label']}': {e}")
+
+    if items:
+        feedback_bank.update(items)
+    return len(items)
+
+def prime_feedback_bank(questions: list) -> None:
+    """Queues precompute_feedback in the background when FEEDBACK_PRECOMPUTE is on."""
+    if not Config.FEEDBACK_PRECOMPUTE or not questions:
+        return
+    snapshot = [
+        {"questionText": q.get("questionText") or q.get("target_item", ""),
+         "correct_answer": q.get("correct_answer", ""),
+         "options": [{"label": o["label"]} for o in q.get("options", [])]}
+        for q in questions
+    ]
+    _precompute_executor.submit(precompute_feedback, snapshot)
+
+# ──────────────────────────────────────
+# WORKER WARM-UP
+# ──────────────────────────────────────
+
+def warm_up():
+    """
+    Pays this process's one-off costs now rather than on its first generation
+    request: the model client (and the SDK import behind it), Pillow and the
+    game bank index. gunicorn.conf.py calls it after each worker boots when
+    MODEL_WARMUP is on; otherwise all of these are built on first use.
+    """
+    from .game_bank import get_game_bank
+
+    started = time.perf_counter()
+    with stage_timer("warm_up"):
+        model_backend = get_backend()
+        supported_formats()
+        if Config.GAME_BANK_ENABLED:
+            len(get_game_bank())
+    logger.info(f"🔥 Warmed up the {model_backend.name} backend in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+# ──────────────────────────────────────
+# ASYNC SERVING
+# ──────────────────────────────────────
+# Coroutine versions of generate_questions / iter_game_events /
+# generate_feedback. Model calls await the backend's async client under the
+# same governors, so one event loop can keep hundreds of calls in flight;
+# the little blocking work left (image cache, image store) runs on threads.
+# Identical requests are coalesced within the event loop (not across
+# processes: DatabaseFlight is a blocking design).
+
+async_image_flights = AsyncSingleFlight() if Config.SINGLEFLIGHT_ENABLED else None
+async_game_flights = AsyncSingleFlight() if Config.SINGLEFLIGHT_ENABLED else None
+# Strong references to background tasks, which asyncio only holds weakly
+_background_tasks = set()
+
+def _keep(task: asyncio.Task) -> asyncio.Task:
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+async def _arender_image(prompt_text: str) -> bytes:
+    final_prompt = IMAGE_PROMPT_TEMPLATE.format(prompt=prompt_text)
+
+    with stage_timer("image_model_call"):
+        data = await image_governor.acall(
+            get_backend().agenerate_image,
+            IMAGE_MODEL,
+            final_prompt,
+            system_instruction=IMAGE_SYSTEM_INSTRUCTION,
+            aspect_ratio=IMAGE_ASPECT_RATIO,
+            temperature=IMAGE_TEMPERATURE,
+            timeout=Config.IMAGE_GEN_TIMEOUT,
+        )
+    if data is None:
+        logger.warning("🛡️ Gemini API Safety Block triggered.")
+        SAFETY_BLOCKS.inc("image_model")
+    return data
+
+async def _arender_and_cache(prompt_text: str, key: str) -> bytes:
+    data = await _arender_image(prompt_text)
+    if data and image_cache is not None:
+        with stage_timer("image_cache_store"):
+            await asyncio.to_thread(image_cache.put, key, data)
+    return data
+
+async def agenerate_image_bytes(prompt_text: str) -> bytes:
+    """generate_image_bytes() for coroutines."""
+    if not get_backend().is_configured():
+        logger.error("❌ GEMINI_API_KEY is missing!")
+        return None
+
+    key = make_key(prompt_text, f"{get_backend().name}:{IMAGE_MODEL}", IMAGE_CONFIG_FINGERPRINT)
+    if image_cache is not None:
+        with stage_timer("image_cache_lookup"):
+            cached = await asyncio.to_thread(image_cache.get, key)
+        if cached is not None:
+            logger.info(f"🗄️ Image cache hit for: '{prompt_text}'")
+            CACHE_EVENTS.inc("image", "hit")
+            return cached
+        CACHE_EVENTS.inc("image", "miss")
+
+    try:
+        if async_image_flights is None:
+            return await _arender_and_cache(prompt_text, key)
+        data, shared = await async_image_flights.do(key, lambda: _arender_and_cache(prompt_text, key))
+        if shared:
+            CACHE_EVENTS.inc("image", "coalesced")
+        return data
+    except Exception as e:
+        logger.error(f"📸 Image Generation Error: {e}")
+        return None
+
+async def agenerate_ai_image(prompt_text: str) -> str:
+    """generate_ai_image() for coroutines."""
+    with stage_timer("image_total"):
+        data = await agenerate_image_bytes(prompt_text)
+        if not data:
+            return None
+        return await asyncio.to_thread(_deliver_image, data)
+
+async def aiter_question_text(game_topic: str, subject: str, description: str):
+    """iter_question_text() for coroutines."""
+    if not get_backend().is_configured():
+        logger.error("❌ GEMINI_API_KEY is missing!")
+        return
+
+    game_topic, description = _screen_topic(game_topic, description)
+    prompt = _question_prompt(game_topic, subject, description)
+    parser = JsonArrayStream()
+    started = time.perf_counter()
+    first_seen = False
+    with stage_timer("question_text_call"):
+        async for chunk in text_governor.astream(get_backend().astream_text, TEXT_MODEL, prompt):
+            for item in parser.feed(chunk):
+                q = _prepare_question(item)
+                if q is None:
+                    continue
+                if not first_seen:
+                    first_seen = True
+                    STAGE_SECONDS.observe(time.perf_counter() - started, "question_text_first")
+                yield q
+
+    for q in _recovered_questions(parser):
+        yield q
+
+async def aiter_game_events(game_topic: str, subject: str, description: str):
+    """
+    iter_game_events() for coroutines: the same question / image / done
+    events, with each option image rendered by its own task (at most
+    IMAGE_GEN_MAX_WORKERS at once per game, IMAGE_GEN_TIMEOUT each).
+    """
+    events = asyncio.Queue()
+    slots = asyncio.Semaphore(max(1, Config.IMAGE_GEN_MAX_WORKERS))
+    tasks = set()
+
+    async def produce():
+        try:
+            async for q in aiter_question_text(game_topic, subject, description):
+                await events.put(("question", q))
+        except Exception as e:
+            logger.error(f"🧠 Gemini/Process Error: {e}")
+        finally:
+            await events.put((_TEXT_DONE,))
+
+    async def render(q: dict, i: int, prompt: str):
+        image = None
+        try:
+            async with slots:
+                image = await asyncio.wait_for(agenerate_ai_image(prompt), Config.IMAGE_GEN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"⏱️ Image generation timed out for: '{q['options'][i]['label']}'")
+        except Exception as e:
+            logger.error(f"📸 Image Generation Error: {e}")
+        finally:
+            # Every render reports back, even a failed one, or the game never finishes
+            events.put_nowait(("image", q, i, image))
+
+    questions = []
+    pending = 0
+    text_done = False
+    tasks.add(asyncio.ensure_future(produce()))
+    try:
+        while not text_done or pending:
+            event = await events.get()
+            if event[0] == "question":
+                q = event[1]
+                questions.append(q)
+                yield {"type": "question", "index": len(questions) - 1, "question": q}
+                for i, opt in enumerate(q['options']):
+                    if opt.get('imageBlocked'):
+                        yield _image_event(q, i, None)
+                        continue
+                    search_term = opt.get('imageGenerationPrompt', opt['label'])
+                    logger.info(f"🎨 Mochi is generating a custom image for: '{search_term}'")
+                    tasks.add(asyncio.ensure_future(render(q, i, search_term)))
+                    pending += 1
+            elif event[0] == _TEXT_DONE:
+                text_done = True
+                prime_feedback_bank(questions)
+            else:
+                pending -= 1
+                yield _image_event(*event[1:])
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    yield {"type": "done", "questions": len(questions)}
+
+async def agenerate_questions(game_topic: str, subject: str, description: str) -> list:
+    """generate_questions() for coroutines."""
+    if async_game_flights is None:
+        return await _agenerate_questions(game_topic, subject, description)
+
+    key = flight_key("game", get_backend().name, TEXT_MODEL, game_topic, subject, description)
+    questions, shared = await async_game_flights.do(key, lambda: _agenerate_questions(game_topic, subject, description))
+    if shared:
+        CACHE_EVENTS.inc("game", "coalesced")
+        return copy.deepcopy(questions)
+    return questions
+
+async def _agenerate_questions(game_topic: str, subject: str, description: str) -> list:
+    questions = []
+    try:
+        async for event in aiter_game_events(game_topic, subject, description):
+            if event["type"] == "question":
+                questions.append(event["question"])
+    except Exception as e:
+        logger.error(f"🧠 Gemini/Process Error: {e}")
+        return []
+
+    return questions
+
+async def _agenerate_feedback_llm(user_answer: str, correct_answer: str, target_item: str) -> dict:
+    with stage_timer("feedback_text_call"):
+        text = await text_governor.acall(get_backend().agenerate_text, TEXT_MODEL, _feedback_prompt(user_answer, correct_answer, target_item))
+    return _parse_feedback(text)
+
+async def agenerate_feedback(user_answer: str, correct_answer: str, target_item: str) -> dict:
+    """generate_feedback() for coroutines, with the same latency budget and late cache fill."""
+    key = feedback_key(user_answer, correct_answer, target_item)
+    known = _known_feedback(key)
+    if known:
+        return known
+
+    _live_feedback_started()
+    task = _keep(asyncio.ensure_future(_agenerate_feedback_llm(user_answer, correct_answer, target_item)))
+    task.add_done_callback(_live_feedback_finished)
+    task.add_done_callback(lambda t: _remember_feedback(key, t))
+    try:
+        return dict(await asyncio.wait_for(asyncio.shield(task), Config.FEEDBACK_LATENCY_BUDGET))
+    except asyncio.TimeoutError:
+        logger.warning("⏱️ Feedback over latency budget, answering from template.")
+        CACHE_EVENTS.inc("feedback", "budget_exceeded")
     except Exception as e:
         logger.error(f"🧠 Feedback Generation Error: {e}")
-        return {"message": "Great try! 🌟", "encouragement": "Let's try one more!"}
\ No newline at end of file
+    return template_feedback(user_answer, correct_answer)
@@ -0,0 +1,454 @@
+"""
+Generation Jobs
+================
+Runs AI game generation in the background so `/api/generate/jobs` can return a
+job id immediately instead of holding a web worker for the whole pipeline.
+
+Jobs are executed by a bounded queue. Two implementations are provided and
+picked with JOB_BACKEND:
+- "inprocess":    a thread pool inside the web process (default)
+- "local_broker": a stand-in for an external broker (Redis/Celery style); jobs
+                  are published as serialised messages onto a bounded queue and
+                  picked up by consumer threads, so the hand-off path can be
+                  exercised offline
+
+The job runs in the process that accepted it, but its record lives in a job
+store picked with JOB_STORE:
+- "file":   one JSON file per job under JOB_STORE_DIR (default), so a status
+            poll or cancel reaching any worker on the host finds the job
+- "memory": this process only; gunicorn refuses to start with it and more
+            than one worker
+"""
+
+import copy
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from config import Config
+from .gemini_services import iter_game_events
+from .game_bank import remember_game
+
+try:
+    import fcntl
+except ImportError:  # Windows: threads of one process are still serialised
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+EXPIRED = "expired"
+
+FINISHED_STATES = {SUCCEEDED, FAILED, CANCELLED, EXPIRED}
+
+JOB_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue can't accept more work."""
+
+
+# ──────────────────────────────────────
+# QUEUES
+# ──────────────────────────────────────
+
+class InProcessJobQueue:
+    """Runs tasks on a bounded thread pool in this process."""
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mochi-job")
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+
+    def submit(self, handler, job_id: str):
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError("Too many generation jobs queued.")
+
+        def run():
+            try:
+                handler(job_id)
+            finally:
+                self._slots.release()
+
+        self._executor.submit(run)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class LocalBrokerJobQueue:
+    """
+    Broker stand-in: tasks cross a serialisation boundary as JSON messages on a
+    bounded queue, and consumer threads look the handler up by task name, the
+    same way a worker process would consume from a real broker.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self._messages = queue.Queue(maxsize=max_pending)
+        self._handlers = {}
+        self._lock = threading.Lock()
+        self._consumers = [
+            threading.Thread(target=self._consume, name=f"mochi-broker-{n}", daemon=True)
+            for n in range(max_workers)
+        ]
+        for consumer in self._consumers:
+            consumer.start()
+
+    def submit(self, handler, job_id: str):
+        task = handler.__name__
+        with self._lock:
+            self._handlers[task] = handler
+        try:
+            self._messages.put_nowait(json.dumps({"task": task, "job_id": job_id}))
+        except queue.Full:
+            raise QueueFullError("Too many generation jobs queued.")
+
+    def _consume(self):
+        while True:
+            message = self._messages.get()
+            if message is None:
+                return
+            body = json.loads(message)
+            with self._lock:
+                handler = self._handlers.get(body["task"])
+            try:
+                if handler:
+                    handler(body["job_id"])
+                else:
+                    logger.error(f"📨 No handler registered for task '{body['task']}'")
+            except Exception as e:
+                logger.error(f"📨 Broker task failed: {e}")
+            finally:
+                self._messages.task_done()
+
+    def shutdown(self):
+        for _ in self._consumers:
+            try:
+                self._messages.put_nowait(None)
+            except queue.Full:
+                break
+
+
+JOB_QUEUES = {
+    "inprocess": InProcessJobQueue,
+    "local_broker": LocalBrokerJobQueue,
+}
+
+# ──────────────────────────────────────
+# JOB STORES
+# ──────────────────────────────────────
+
+class JobStore:
+    """
+    Job records, keyed by id. Updates are conditional: once a job has
+    finished (or been cancelled or expired) it keeps that verdict, and the
+    worker running it learns from update() returning False that it should
+    stop. Jobs past the TTL expire as they are read.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+
+    # Storage primitives, implemented by subclasses
+    def _read(self, job_id: str):
+        raise NotImplementedError
+
+    def _write(self, job: dict):
+        raise NotImplementedError
+
+    def _remove(self, job_id: str):
+        raise NotImplementedError
+
+    def _ids(self) -> list:
+        raise NotImplementedError
+
+    def _locked(self, job_id: str):
+        """Context manager serialising read-modify-write of one job."""
+        raise NotImplementedError
+
+    def _stale(self, job: dict) -> bool:
+        return time.time() - job["created_at"] > self.ttl_seconds
+
+    def _modify(self, job_id: str, change):
+        """
+        Apply `change(job)` under the job's lock and store the result.
+        `change` returns False to leave the job untouched. Returns the job,
+        or None when it doesn't exist (or has expired and been dropped).
+        """
+        if self._read(job_id) is None:
+            return None
+        with self._locked(job_id):
+            job = self._read(job_id)
+            if job is None:
+                return None
+            if self._stale(job):
+                if job["status"] in FINISHED_STATES:
+                    self._remove(job_id)
+                    return None
+                # Whoever is running it stops at its next update
+                job["status"] = EXPIRED
+                job["updated_at"] = time.time()
+                self._write(job)
+            if change(job) is not False:
+                job["updated_at"] = time.time()
+                self._write(job)
+            return job
+
+    def create(self, job: dict):
+        with self._locked(job["id"]):
+            self._write(job)
+
+    def delete(self, job_id: str):
+        with self._locked(job_id):
+            self._remove(job_id)
+
+    def get(self, job_id: str):
+        job = self._read(job_id)
+        if job is None or not self._stale(job):
+            return job
+        return self._modify(job_id, lambda job: False)
+
+    def update(self, job_id: str, **changes) -> bool:
+        """Apply `changes` if the job is still queued or running; False otherwise."""
+        applied = []
+
+        def change(job):
+            if job["status"] in FINISHED_STATES:
+                return False
+            job.update(changes)
+            applied.append(True)
+
+        self._modify(job_id, change)
+        return bool(applied)
+
+    def cancel(self, job_id: str):
+        """Cancel an unfinished job. Returns the job, or None if there is none."""
+        def change(job):
+            if job["status"] in FINISHED_STATES:
+                return False
+            job["status"] = CANCELLED
+
+        return self._modify(job_id, change)
+
+    def sweep(self):
+        """Expire or drop every job past the TTL."""
+        for job_id in self._ids():
+            self.get(job_id)
+
+
+class MemoryJobStore(JobStore):
+    """Jobs in this process's memory: only for a single-process server."""
+
+    def __init__(self, ttl_seconds: float):
+        super().__init__(ttl_seconds)
+        self._jobs = {}
+        self._lock = threading.RLock()
+
+    def _read(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return copy.deepcopy(job) if job is not None else None
+
+    def _write(self, job: dict):
+        with self._lock:
+            self._jobs[job["id"]] = copy.deepcopy(job)
+
+    def _remove(self, job_id: str):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def _ids(self) -> list:
+        with self._lock:
+            return list(self._jobs)
+
+    def _locked(self, job_id: str):
+        return self._lock
+
+
+class FileJobStore(JobStore):
+    """
+    One JSON file per job in a directory every worker on the host shares, so
+    any worker can report on or cancel a job another one is running. Files
+    are replaced atomically, so reads need no lock; read-modify-write holds
+    an flock on the job's lock file.
+    """
+
+    def __init__(self, directory: str, ttl_seconds: float):
+        super().__init__(ttl_seconds)
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def _path(self, job_id: str, suffix: str = "json") -> str:
+        return os.path.join(self.directory, f"{job_id}.{suffix}")
+
+    def _read(self, job_id: str):
+        if not JOB_ID_RE.match(job_id):
+            return None
+        try:
+            with open(self._path(job_id), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.error(f"🧠 Could not read generation job {job_id}: {e}")
+            return None
+
+    def _write(self, job: dict):
+        path = self._path(job["id"])
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _remove(self, job_id: str):
+        for suffix in ("json", "lock"):
+            try:
+                os.remove(self._path(job_id, suffix))
+            except FileNotFoundError:
+                pass
+
+    def _ids(self) -> list:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return [name[:-5] for name in names if name.endswith(".json")]
+
+    @contextmanager
+    def _locked(self, job_id: str):
+        if not JOB_ID_RE.match(job_id):
+            raise KeyError(job_id)
+        os.makedirs(self.directory, exist_ok=True)
+        # Threads of this process take the lock first, so flock only arbitrates between processes
+        with self._lock:
+            with open(self._path(job_id, "lock"), "a") as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                yield
+
+
+JOB_STORES = {
+    "memory": lambda: MemoryJobStore(Config.JOB_TTL_SECONDS),
+    "file": lambda: FileJobStore(Config.JOB_STORE_DIR, Config.JOB_TTL_SECONDS),
+}
+
+# ──────────────────────────────────────
+# JOB MANAGER
+# ──────────────────────────────────────
+
+class JobManager:
+    """Records generation jobs in a job store and feeds them to a job queue."""
+
+    def __init__(self, job_queue, store: JobStore):
+        self.queue = job_queue
+        self.store = store
+
+    def submit(self, game_topic: str, subject: str, description: str) -> dict:
+        self.store.sweep()
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": QUEUED,
+            "params": {"gameTopic": game_topic, "subject": subject, "description": description},
+            "questions": [],
+            "images_done": 0,
+            "images_total": 0,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        self.store.create(job)
+
+        try:
+            self.queue.submit(self.run_job, job["id"])
+        except QueueFullError:
+            self.store.delete(job["id"])
+            raise
+
+        return self.get(job["id"])
+
+    @staticmethod
+    def _snapshot(job: dict) -> dict:
+        return {
+            "id": job["id"],
+            "status": job["status"],
+            "params": dict(job["params"]),
+            "questions": job["questions"],
+            "progress": {"imagesDone": job["images_done"], "imagesTotal": job["images_total"]},
+            "error": job["error"],
+            "createdAt": job["created_at"],
+            "updatedAt": job["updated_at"],
+        }
+
+    def get(self, job_id: str):
+        """Snapshot of a job's status and partial results, or None."""
+        job = self.store.get(job_id)
+        return self._snapshot(job) if job is not None else None
+
+    def cancel(self, job_id: str):
+        job = self.store.cancel(job_id)
+        return self._snapshot(job) if job is not None else None
+
+    def run_job(self, job_id: str):
+        """Worker body: runs the generation pipeline and records partial results."""
+        job = self.store.get(job_id)
+        if job is None or job["status"] != QUEUED or not self.store.update(job_id, status=RUNNING):
+            return
+        params = job["params"]
+
+        try:
+            questions = []
+            images_done = images_total = 0
+            events = iter_game_events(params["gameTopic"], params["subject"], params["description"])
+            try:
+                for event in events:
+                    # A job cancelled or expired (by any worker) refuses the update: stop
+                    if event["type"] == "question":
+                        questions.append(event["question"])
+                        images_total += len(event["question"]["options"])
+                        if not self.store.update(job_id, questions=questions, images_total=images_total):
+                            return
+                    elif event["type"] == "image":
+                        images_done += 1
+                        if not self.store.update(job_id, questions=questions, images_done=images_done):
+                            return
+            finally:
+                # Closing the generator cancels any images still queued
+                events.close()
+
+            if not questions:
+                self.store.update(job_id, status=FAILED, error="Failed to generate content.")
+                return
+
+            remember_game(params["gameTopic"], params["subject"], params["description"], questions)
+            self.store.update(job_id, status=SUCCEEDED)
+
+        except Exception as e:
+            logger.error(f"🧠 Generation job {job_id} failed: {e}")
+            self.store.update(job_id, status=FAILED, error=str(e))
+
+
+_manager = None
+_manager_pid = None
+_manager_lock = threading.Lock()
+
+def get_job_manager() -> JobManager:
+    """Process-wide job manager, created on first use (after any fork)."""
+    global _manager, _manager_pid
+    with _manager_lock:
+        if _manager is None or _manager_pid != os.getpid():
+            queue_cls = JOB_QUEUES.get(Config.JOB_BACKEND, InProcessJobQueue)
+            job_queue = queue_cls(max_workers=Config.JOB_MAX_WORKERS, max_pending=Config.JOB_MAX_PENDING)
+            store = JOB_STORES.get(Config.JOB_STORE, JOB_STORES["file"])()
+            _manager = JobManager(job_queue, store)
+            _manager_pid = os.getpid()
+        return _manager
@@ -0,0 +1,171 @@
+"""
+Generated Image Cache
+======================
+Content-addressed, on-disk cache for AI generated images.
+
+Entries are keyed by a SHA-256 of the normalised prompt plus the model name and
+a fingerprint of the generation config, so the same picture is never paid for
+twice. The cache is bounded by total size (least recently used entries go
+first) and by age (entries older than the TTL are treated as misses).
+
+The directory is shared by every gunicorn worker and the pregenerate CLI, so
+the disk is the source of truth: lookups read the entry's file directly, a
+file's mtime is when it was written and its atime when it was last used, and
+every write rescans the directory so the size cap counts all processes'
+entries. Writes only follow a paid image generation, so the scan (a few ms
+for a full 512 MB cache) is noise next to it.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace and case so trivially different prompts share an entry."""
+    return " ".join(prompt.split()).casefold()
+
+
+def make_key(prompt: str, model: str, fingerprint: str = "") -> str:
+    """Return the cache key for a prompt rendered by `model` with a given config."""
+    raw = "\x1f".join([model, fingerprint, normalize_prompt(prompt)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ImageCache:
+    """Thread- and process-safe LRU + TTL image cache stored as one file per entry."""
+
+    def __init__(self, directory: str, max_bytes: int, ttl_seconds: float):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._index = None          # OrderedDict: key -> (size, written_at), least recently used first
+        self._total_bytes = 0
+
+    # ── helpers ──
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.bin")
+
+    def _scan(self) -> OrderedDict:
+        """Stat every entry on disk, ordered by last use (atime)."""
+        entries = []
+        if os.path.isdir(self.directory):
+            for root, _dirs, files in os.walk(self.directory):
+                for name in files:
+                    if not name.endswith(".bin"):
+                        continue
+                    try:
+                        st = os.stat(os.path.join(root, name))
+                    except OSError:
+                        continue
+                    entries.append((st.st_atime, name[:-4], st.st_size, st.st_mtime))
+
+        entries.sort()
+        return OrderedDict((key, (size, mtime)) for _atime, key, size, mtime in entries)
+
+    def _refresh(self):
+        """Rebuild the index from disk; the scan runs outside the lock."""
+        index = self._scan()
+        with self._lock:
+            self._index = index
+            self._total_bytes = sum(size for size, _ in index.values())
+
+    def _forget(self, key: str):
+        """Drop `key` from the index (caller holds the lock)."""
+        if self._index is not None and key in self._index:
+            self._total_bytes -= self._index.pop(key)[0]
+
+    def _remove(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass  # already gone, e.g. evicted by another process
+
+    def _evict(self):
+        """Remove least recently used entries until the cache is back under the cap."""
+        victims = []
+        with self._lock:
+            while self._total_bytes > self.max_bytes and self._index:
+                victims.append(next(iter(self._index)))
+                self._forget(victims[-1])
+            self.evictions += len(victims)
+        for key in victims:
+            self._remove(key)
+
+    # ── public API ──
+
+    def get(self, key: str):
+        """Return cached image bytes, or None on a miss or expired entry."""
+        path = self._path(key)
+        try:
+            # The file is the entry, whichever process wrote it
+            st = os.stat(path)
+            if self.ttl_seconds and time.time() - st.st_mtime > self.ttl_seconds:
+                self._remove(key)
+                with self._lock:
+                    self._forget(key)
+                    self.evictions += 1
+                    self.misses += 1
+                return None
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            with self._lock:
+                self._forget(key)
+                self.misses += 1
+            return None
+
+        try:
+            # Recency lives in the atime, so other processes evict by it too
+            os.utime(path, (time.time(), st.st_mtime))
+        except OSError:
+            pass
+        with self._lock:
+            if self._index is not None and key in self._index:
+                self._index.move_to_end(key)
+            self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes):
+        """Store image bytes under `key`, evicting old entries past the size cap."""
+        if len(data) > self.max_bytes:
+            return
+
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write-then-rename so readers never see a half written image
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.error(f"🗄️ Image cache write failed: {e}")
+            return
+
+        # The new file is the most recently used entry in the scan
+        self._refresh()
+        self._evict()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._index) if self._index is not None else 0,
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,118 @@
+"""
+Image Asset Store
+==================
+Content-addressed storage for generated images, served by `GET /api/images/<id>`.
+
+An asset id is derived from the image bytes, so an id always refers to the same
+picture: clients and proxies can cache it forever and the id doubles as ETag.
+Resized variants (see `image_variants`) sit next to the original as
+`<id>_<width>.<ext>`.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import struct
+import threading
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+ASSET_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+MIME_EXTENSIONS = {
+    "image/png": "png",
+    "image/jpeg": "jpg",
+    "image/webp": "webp",
+    "image/avif": "avif",
+}
+EXTENSION_MIMES = {ext: mime for mime, ext in MIME_EXTENSIONS.items()}
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+class ImageStore:
+    """Writes image assets to disk and looks them up by id."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._dimensions = {}  # asset id -> (width, height); assets never change
+
+    def _dir(self, asset_id: str) -> str:
+        return os.path.join(self.directory, asset_id[:2])
+
+    def save(self, data: bytes, mime: str = "image/png") -> str:
+        """Store image bytes and return their asset id (idempotent)."""
+        asset_id = hashlib.sha256(data).hexdigest()[:32]
+        path = os.path.join(self._dir(asset_id), f"{asset_id}.{MIME_EXTENSIONS.get(mime, 'png')}")
+        if os.path.exists(path):
+            return asset_id
+
+        self._write(path, data)
+        return asset_id
+
+    @staticmethod
+    def _write(path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _variant_path(self, asset_id: str, width: int, mime: str) -> str:
+        return os.path.join(self._dir(asset_id), f"{asset_id}_{width}.{MIME_EXTENSIONS[mime]}")
+
+    def save_variant(self, asset_id: str, width: int, data: bytes, mime: str):
+        """Store a resized variant of an existing asset."""
+        self._write(self._variant_path(asset_id, width, mime), data)
+
+    def find_variant(self, asset_id: str, width: int, mime: str):
+        """Return the path of a stored variant, or None."""
+        if not ASSET_ID_RE.match(asset_id) or mime not in MIME_EXTENSIONS:
+            return None
+        path = self._variant_path(asset_id, width, mime)
+        return path if os.path.exists(path) else None
+
+    def find(self, asset_id: str):
+        """Return (path, mime) for an asset, or None if it doesn't exist."""
+        if not ASSET_ID_RE.match(asset_id):
+            return None
+
+        directory = self._dir(asset_id)
+        for ext, mime in EXTENSION_MIMES.items():
+            path = os.path.join(directory, f"{asset_id}.{ext}")
+            if os.path.exists(path):
+                return path, mime
+        return None
+
+    def dimensions(self, asset_id: str):
+        """(width, height) of an original PNG asset, read from its header; None if unknown."""
+        if asset_id in self._dimensions:
+            return self._dimensions[asset_id]
+        found = self.find(asset_id)
+        if not found or found[1] != "image/png":
+            return None
+        try:
+            with open(found[0], "rb") as f:
+                header = f.read(24)
+        except OSError:
+            return None
+        if header[:8] != PNG_SIGNATURE or header[12:16] != b"IHDR":
+            return None
+        self._dimensions[asset_id] = struct.unpack(">II", header[16:24])
+        return self._dimensions[asset_id]
+
+
+def asset_url(asset_id: str, width: int = None) -> str:
+    """
+    Public URL for an asset, as handed to the frontend. Unless a width is
+    given, it asks for the IMAGE_DEFAULT_WIDTH variant (0 = the original).
+    """
+    if width is None:
+        width = Config.IMAGE_DEFAULT_WIDTH if Config.IMAGE_VARIANTS_ENABLED else 0
+    url = f"{Config.PUBLIC_API_URL}/api/images/{asset_id}"
+    return f"{url}?w={width}" if width else url
+
+
+image_store = ImageStore(Config.IMAGE_STORE_DIR)
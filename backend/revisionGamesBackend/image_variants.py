@@ -0,0 +1,143 @@
+"""
+Image Variants
+===============
+Post-processing for generated images. The model returns large PNGs, but the
+game only shows them as small square tiles, so each stored asset also gets
+fixed-size, recompressed variants (IMAGE_VARIANT_SIZES px, in the
+IMAGE_VARIANT_FORMATS the installed Pillow can encode).
+
+Variants are rendered on a small background pool after the original is
+stored, keeping encode time off the generation path. `GET
+/api/images/<id>?w=256` serves the smallest variant at least that wide, in
+the first format the client's Accept header allows; variants not on disk yet
+are rendered on first request. Without Pillow the original is served.
+Pillow is imported on first use rather than at startup.
+"""
+
+import functools
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from .image_store import image_store
+from .metrics import stage_timer, CACHE_EVENTS
+
+logger = logging.getLogger(__name__)
+
+# format name -> (mime, Pillow codec, Pillow feature, encoder options)
+FORMATS = {
+    "avif": ("image/avif", "AVIF", "avif", {"speed": 8}),
+    "webp": ("image/webp", "WEBP", "webp", {"method": 4}),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _pillow():
+    """(Image, features) from Pillow, or (None, None) when it isn't installed."""
+    try:
+        from PIL import Image, features
+    except ImportError:  # Pillow is optional; variants are skipped without it
+        return None, None
+    return Image, features
+
+
+def supported_formats() -> list:
+    """Configured variant formats this Pillow can write, in order of preference."""
+    if not Config.IMAGE_VARIANTS_ENABLED:
+        return []
+    Image, features = _pillow()
+    if Image is None:
+        return []
+    return [fmt for fmt in Config.IMAGE_VARIANT_FORMATS if fmt in FORMATS and features.check(FORMATS[fmt][2])]
+
+
+def variant_width(requested: int) -> int:
+    """Smallest configured size that covers `requested` px (the largest if none do)."""
+    sizes = sorted(Config.IMAGE_VARIANT_SIZES)
+    for size in sizes:
+        if size >= requested:
+            return size
+    return sizes[-1]
+
+
+def render_variant(data: bytes, width: int, fmt: str) -> bytes:
+    """Resize image bytes to fit `width` px (never upscaling) and encode as `fmt`."""
+    _, codec, _, options = FORMATS[fmt]
+    Image, _ = _pillow()
+    with Image.open(io.BytesIO(data)) as img:
+        img.load()
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "transparency" in img.info or "A" in img.getbands() else "RGB")
+        img.thumbnail((width, width), Image.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, codec, quality=Config.IMAGE_VARIANT_QUALITY, **options)
+    return out.getvalue()
+
+
+def create_variants(asset_id: str, data: bytes) -> int:
+    """Render and store every configured variant of an asset. Returns how many were written."""
+    written = 0
+    for fmt in supported_formats():
+        mime = FORMATS[fmt][0]
+        for width in Config.IMAGE_VARIANT_SIZES:
+            if image_store.find_variant(asset_id, width, mime):
+                continue
+            try:
+                image_store.save_variant(asset_id, width, render_variant(data, width, fmt), mime)
+                written += 1
+            except (OSError, ValueError) as e:
+                logger.error(f"🖼️ Could not create {width}px {fmt} variant of {asset_id}: {e}")
+    return written
+
+
+_variant_executor = ThreadPoolExecutor(max_workers=Config.IMAGE_VARIANT_WORKERS, thread_name_prefix="mochi-variants")
+
+def schedule_variants(asset_id: str, data: bytes):
+    """Queue create_variants in the background (no-op without Pillow)."""
+    if supported_formats():
+        _variant_executor.submit(_timed_variants, asset_id, data)
+
+def _timed_variants(asset_id: str, data: bytes):
+    with stage_timer("image_variants"):
+        create_variants(asset_id, data)
+
+
+def _accepts(accept, mime: str) -> bool:
+    """True when the Accept header names `mime` explicitly (wildcards don't count)."""
+    return any(value == mime and quality > 0 for value, quality in accept)
+
+
+def best_variant(asset_id: str, requested_width: int, accept):
+    """
+    (path, mime, width) of the variant to serve for a `?w=` request, rendering
+    it from the original if it isn't on disk yet, or None to serve the original.
+    """
+    if requested_width <= 0 or not Config.IMAGE_VARIANT_SIZES:
+        return None
+    width = variant_width(requested_width)
+
+    for fmt in supported_formats():
+        mime = FORMATS[fmt][0]
+        if not _accepts(accept, mime):
+            continue
+
+        path = image_store.find_variant(asset_id, width, mime)
+        if path:
+            CACHE_EVENTS.inc("image_variant", "hit")
+            return path, mime, width
+
+        CACHE_EVENTS.inc("image_variant", "miss")
+        original = image_store.find(asset_id)
+        if not original:
+            return None
+        try:
+            with open(original[0], "rb") as f:
+                data = f.read()
+            with stage_timer("image_variant_render"):
+                image_store.save_variant(asset_id, width, render_variant(data, width, fmt), mime)
+        except (OSError, ValueError) as e:
+            logger.error(f"🖼️ Could not render {width}px {fmt} variant of {asset_id}: {e}")
+            return None
+        return image_store.find_variant(asset_id, width, mime), mime, width
+
+    return None
@@ -0,0 +1,89 @@
+"""
+JSON Provider
+==============
+Most responses are JSON, and generated games are large. When orjson is
+installed and JSON_PROVIDER is "orjson", create_app() swaps Flask's
+stdlib-based provider for OrjsonProvider, which encodes several times
+faster. Output is what jsonify produces (compact, keys sorted, dates as
+HTTP dates, Decimal and UUID as strings), except that non-ASCII text is
+written as UTF-8 instead of \\u escapes. Anything orjson refuses (integers
+over 64 bits, for one) falls back to the stdlib encoder.
+
+`dumps()` / `loads()` are the same codec for code outside a Flask app, such
+as the async routes.
+"""
+
+import dataclasses
+import decimal
+import json
+import uuid
+from datetime import date
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+from config import Config
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder is used without it
+    orjson = None
+
+ORJSON_OPTIONS = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+
+def _default(o):
+    """Types the encoders don't know, handled as Flask's provider does."""
+    if isinstance(o, date):
+        return http_date(o)
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o):
+        return dataclasses.asdict(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def use_orjson() -> bool:
+    return orjson is not None and Config.JSON_PROVIDER == "orjson"
+
+
+def dumps(obj) -> bytes:
+    """Compact, key-sorted JSON as UTF-8 bytes."""
+    if use_orjson():
+        try:
+            return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS)
+        except TypeError:  # orjson.JSONEncodeError; the stdlib may still manage
+            pass
+    return json.dumps(obj, default=_default, separators=(",", ":"), sort_keys=True).encode("utf-8")
+
+
+def loads(s):
+    """Parse JSON from str or bytes. Raises ValueError when it isn't valid JSON."""
+    if use_orjson():
+        return orjson.loads(s)
+    return json.loads(s)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson; pretty output (debug mode) stays on the stdlib."""
+
+    def dumps(self, obj, **kwargs) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj) + b"\n", mimetype=self.mimetype)
+
+
+def make_json_provider(app) -> DefaultJSONProvider:
+    """The provider create_app() installs: orjson when enabled and installed, else Flask's default."""
+    return OrjsonProvider(app) if use_orjson() else DefaultJSONProvider(app)
@@ -0,0 +1,152 @@
+"""
+Streaming JSON
+===============
+Pulls the objects out of a JSON array while the model is still writing it.
+
+`JsonArrayStream` is fed text chunks as they arrive and returns each
+top-level object of the array as soon as its closing brace is seen. The
+array starts at the first `[` whose next non-blank character is `{` (or
+`]`), so a ```json fence or a line of preamble, even one with brackets in
+it ("Here are [3] questions:"), is skipped. When the streamed parse can't
+be trusted, `parse_json_array` recovers the array from the complete text
+instead, and `item_key` tells which recovered objects were already streamed.
+"""
+
+import json
+
+
+def item_key(item) -> str:
+    """Canonical text of a parsed object, for matching streamed and recovered items."""
+    return json.dumps(item, sort_keys=True, ensure_ascii=False)
+
+
+def _array_start(text: str, index: int):
+    """
+    For a `[` at `index`: True if it opens an array of objects, False if it
+    doesn't, None if the text ends before that can be told.
+    """
+    for i in range(index + 1, len(text)):
+        if not text[i].isspace():
+            return text[i] in "{]"
+    return None
+
+
+class JsonArrayStream:
+    """Incremental parser for a JSON array of objects."""
+
+    def __init__(self):
+        self.text = ""
+        self.started = False     # saw the opening '['
+        self.complete = False    # saw the matching ']'
+        self.malformed = False   # an object failed to parse
+        self.count = 0           # objects returned so far
+        self.keys = set()        # item_key() of every object returned
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._item_start = None
+
+    def feed(self, chunk: str) -> list:
+        """Add a chunk of text; returns the objects completed by it."""
+        self.text += chunk
+        text = self.text
+        items = []
+
+        index = self._pos
+        while index < len(text) and not self.complete:
+            ch = text[index]
+            index += 1
+
+            if not self.started:
+                if ch == "[":
+                    opens = _array_start(text, index - 1)
+                    if opens is None:
+                        index -= 1  # look at this '[' again with the next chunk
+                        break
+                    if opens:
+                        self.started = True
+                        self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if ch == "{" and self._depth == 1:
+                    self._item_start = index - 1
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 1 and ch == "}" and self._item_start is not None:
+                    raw = text[self._item_start:index]
+                    self._item_start = None
+                    try:
+                        item = json.loads(raw)
+                    except ValueError:
+                        self.malformed = True
+                    else:
+                        items.append(item)
+                        self.keys.add(item_key(item))
+                        self.count += 1
+                elif self._depth == 0:
+                    self.complete = True
+
+        self._pos = index
+        return items
+
+    @property
+    def trustworthy(self) -> bool:
+        """True when the whole array was parsed cleanly from the stream."""
+        return self.complete and not self.malformed and self.count > 0
+
+
+def parse_json_array(text: str) -> list:
+    """
+    Parse a complete model response into a list, tolerating markdown fences
+    and text around the JSON. A lone object is returned as a one-item list.
+    Raises ValueError when no JSON can be recovered.
+    """
+    text = text.strip()
+    if "```json" in text:
+        text = text.split("```json")[1].split("```")[0].strip()
+    elif "```" in text:
+        text = text.split("```")[1].split("```")[0].strip()
+
+    try:
+        value = json.loads(text)
+    except ValueError:
+        value = None
+    if isinstance(value, dict):
+        return [value]
+    if isinstance(value, list):
+        return value
+
+    # Whichever comes first of the array of objects and a lone object,
+    # ignoring whatever follows the JSON
+    decoder = json.JSONDecoder()
+    array_start = next((i for i, ch in enumerate(text) if ch == "[" and _array_start(text, i)), -1)
+    object_start = text.find("{")
+    for start in sorted(i for i in (array_start, object_start) if i != -1):
+        try:
+            value, _end = decoder.raw_decode(text, start)
+        except ValueError:
+            if start == array_start:
+                # Broken or cut short: the objects in it that are whole on their own
+                salvaged = JsonArrayStream().feed(text[start:])
+                if salvaged:
+                    return salvaged
+            continue
+        if isinstance(value, dict):
+            return [value]
+        if isinstance(value, list):
+            return value
+    raise ValueError("No JSON array found in model response")
@@ -0,0 +1,152 @@
+"""
+Metrics
+========
+Minimal in-process counters and histograms, exposed in the Prometheus text
+format at `/api/metrics`.
+
+Pipeline code wraps each stage in `stage_timer("name")`, which records its
+duration and whether it failed. Counters cover the events that explain those
+timings: cache hits and misses, safety blocks and HTTP requests.
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_registry = []
+_collectors = []
+
+
+def _format_labels(labelnames, values) -> str:
+    if not labelnames:
+        return ""
+    pairs = []
+    for name, value in zip(labelnames, values):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}       # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, seconds: float, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[i] += 1
+            series[-2] += seconds
+            series[-1] += 1
+
+    def render(self):
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        names = self.labelnames + ("le",)
+        for labels, series in items:
+            for bound, count in zip(self.buckets, series):
+                le = "+Inf" if bound == math.inf else repr(float(bound))
+                yield f"{self.name}_bucket{_format_labels(names, labels + (le,))} {count}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-2]}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {series[-1]}"
+
+
+def register_collector(fn):
+    """
+    Register fn() -> iterable of (name, kind, help, value) for point-in-time
+    gauges. A name may carry labels (`name{model="x"}`); samples of one metric
+    must be yielded together.
+    """
+    _collectors.append(fn)
+    return fn
+
+
+def render_prometheus() -> str:
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    for collector in _collectors:
+        try:
+            samples = list(collector())
+        except Exception:
+            continue
+        described = set()
+        for name, kind, documentation, value in samples:
+            base = name.split("{", 1)[0]
+            if base not in described:
+                described.add(base)
+                lines.append(f"# HELP {base} {documentation}")
+                lines.append(f"# TYPE {base} {kind}")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+# ──────────────────────────────────────
+# MOCHI METRICS
+# ──────────────────────────────────────
+
+STAGE_SECONDS = Histogram("mochi_stage_duration_seconds", "Time spent in each pipeline stage.", ["stage"])
+STAGE_FAILURES = Counter("mochi_stage_failures_total", "Pipeline stages that raised.", ["stage"])
+CACHE_EVENTS = Counter("mochi_cache_events_total", "Cache lookups by cache and result.", ["cache", "result"])
+SAFETY_BLOCKS = Counter("mochi_safety_blocks_total", "Content blocked by the safety checks.", ["source"])
+HTTP_REQUESTS = Counter("mochi_http_requests_total", "HTTP requests served.", ["method", "endpoint", "status"])
+MODEL_CALLS = Counter("mochi_model_calls_total", "Model call attempts by model and outcome.", ["model", "outcome"])
+HTTP_SECONDS = Histogram("mochi_http_request_duration_seconds", "HTTP request latency.", ["method", "endpoint"])
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Time a pipeline stage; failures are counted and re-raised."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_FAILURES.inc(stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage)
@@ -0,0 +1,171 @@
+"""
+Schema Migrations
+==================
+Versioned, forward-only changes to the Revision Games schema. Applied
+versions are recorded in `schema_migrations`; `migrate()` (run by init_db)
+applies whatever is missing, in order, so existing databases pick up new
+indexes and backfills as well as fresh ones.
+
+- Every process may call migrate() at startup: one holds a Postgres
+  advisory lock while applying, the others poll for it rather than block
+  (a blocked session would hold a snapshot that CREATE INDEX CONCURRENTLY
+  has to wait for) and find nothing left to do.
+- SQL migrations run in one transaction together with their version row.
+- Index migrations use CREATE INDEX CONCURRENTLY, outside a transaction, so
+  reads and writes carry on while a large table is indexed. An index left
+  INVALID by an interrupted build is dropped and rebuilt.
+
+Add a migration by appending to MIGRATIONS with the next version number;
+never edit one that has shipped.
+
+Run on its own:  python -m revisionGamesBackend.migrations
+"""
+
+import logging
+import time
+from .revision_config import get_connection, SCHEMA_SQL, ROLLUP_BACKFILL_SQL, FLIGHT_LEASES_SQL
+
+logger = logging.getLogger(__name__)
+
+# pg_advisory_lock key for the migration runner ("mochimig")
+MIGRATION_LOCK_ID = 0x6D6F6368696D6967
+LOCK_POLL_SECONDS = 0.5
+LOCK_WAIT_TIMEOUT = 600
+
+MIGRATIONS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name VARCHAR(200) NOT NULL,
+    applied_at TIMESTAMP DEFAULT NOW()
+)
+"""
+
+
+class Migration:
+    """One schema version: either a SQL script or a set of concurrent index builds."""
+
+    def __init__(self, version: int, name: str, sql: str = None, indexes: tuple = ()):
+        self.version = version
+        self.name = name
+        self.sql = sql
+        # (index name, table, column list) built with CREATE INDEX CONCURRENTLY
+        self.indexes = indexes
+
+
+MIGRATIONS = [
+    Migration(1, "base tables", sql=SCHEMA_SQL),
+    Migration(2, "backfill progress rollups", sql=ROLLUP_BACKFILL_SQL),
+    Migration(3, "hot-path indexes", indexes=(
+        # Keyset page of a category's questions: WHERE category_id = %s AND id > %s ORDER BY id
+        ("idx_questions_category_id", "questions", "category_id, id"),
+        # Options of a page of questions, and ON DELETE CASCADE from questions
+        ("idx_question_options_question_id", "question_options", "question_id"),
+        # A student's history in a category, and FK checks when deleting categories
+        ("idx_game_progress_category_session", "game_progress", "category_id, student_session"),
+        # /activities/recent: ORDER BY created_at DESC LIMIT 5
+        ("idx_categories_created_at", "categories", "created_at"),
+    )),
+    Migration(4, "single flight leases", sql=FLIGHT_LEASES_SQL),
+]
+
+# ──────────────────────────────────────
+# RUNNER
+# ──────────────────────────────────────
+
+def applied_versions(cur) -> set:
+    cur.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cur.fetchall()}
+
+
+def pending_migrations(cur) -> list:
+    """Migrations not yet recorded in schema_migrations, in version order."""
+    done = applied_versions(cur)
+    return [m for m in sorted(MIGRATIONS, key=lambda m: m.version) if m.version not in done]
+
+
+def _acquire_lock(cur):
+    deadline = time.monotonic() + LOCK_WAIT_TIMEOUT
+    while True:
+        cur.execute("SELECT pg_try_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+        if cur.fetchone()[0]:
+            return
+        if time.monotonic() > deadline:
+            raise TimeoutError("Timed out waiting for another process to finish migrating.")
+        time.sleep(LOCK_POLL_SECONDS)
+
+
+def _create_index(cur, name: str, table: str, columns: str):
+    """CREATE INDEX CONCURRENTLY, replacing an INVALID leftover from an interrupted build."""
+    cur.execute(
+        "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid"
+        " WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+        (name,),
+    )
+    row = cur.fetchone()
+    if row is not None and row[0]:
+        return
+    if row is not None:
+        logger.warning(f"🗂️ Rebuilding invalid index {name}")
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    cur.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})")
+
+
+def _apply(conn, migration: Migration):
+    if migration.indexes:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            for name, table, columns in migration.indexes:
+                _create_index(cur, name, table, columns)
+            cur.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                (migration.version, migration.name),
+            )
+        return
+
+    conn.autocommit = False
+    try:
+        with conn.cursor() as cur:
+            cur.execute(migration.sql)
+            cur.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                (migration.version, migration.name),
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.autocommit = True
+
+
+def migrate() -> list:
+    """Apply every pending migration. Returns the versions applied by this call."""
+    conn = get_connection()
+    conn.autocommit = True
+    applied = []
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+            if cur.fetchone()[0] and not pending_migrations(cur):
+                return applied
+
+            _acquire_lock(cur)
+            try:
+                cur.execute(MIGRATIONS_TABLE_SQL)
+                for migration in pending_migrations(cur):
+                    started = time.perf_counter()
+                    _apply(conn, migration)
+                    applied.append(migration.version)
+                    logger.info(f"🗂️ Applied migration {migration.version} ({migration.name}) "
+                                f"in {time.perf_counter() - started:.2f}s")
+            finally:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+    finally:
+        conn.close()
+    return applied
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    versions = migrate()
+    print(f"✅ Applied migrations: {versions}" if versions else "✅ Schema is up to date.")
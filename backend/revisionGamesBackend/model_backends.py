@@ -0,0 +1,391 @@
+"""
+Model Backends
+===============
+The models behind `gemini_services`, behind one small interface:
+
+- GeminiBackend: the real Google Gemini API (google.genai)
+- FakeBackend:   a deterministic, offline stand-in with configurable latency,
+                 error rate and image size, for benchmarks and local runs
+
+Pick one with MODEL_BACKEND ("gemini" or "fake"); `get_backend()` builds it
+lazily, once per process. Each call also has an `a`-prefixed coroutine
+version for the async serving path, which waits on the network without
+holding a thread.
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import struct
+import threading
+import time
+import zlib
+from config import Config
+
+
+class ModelBackendError(Exception):
+    """A model call failed. `status` mirrors the HTTP status when known."""
+
+    def __init__(self, message: str, status: int = None, retry_after: float = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class ModelBackend:
+    """Interface every backend implements."""
+
+    name = "base"
+
+    def is_configured(self) -> bool:
+        """True when the backend has what it needs (API key etc.) to make calls."""
+        return True
+
+    def generate_text(self, model: str, prompt: str) -> str:
+        """Return the model's text response for `prompt`."""
+        raise NotImplementedError
+
+    def stream_text(self, model: str, prompt: str):
+        """Yield the model's text response for `prompt` in chunks as it is produced."""
+        yield self.generate_text(model, prompt)
+
+    def generate_image(self, model: str, prompt: str, system_instruction: str = "",
+                       aspect_ratio: str = "1:1", temperature: float = None, timeout: float = None):
+        """Return image bytes for `prompt`, or None when the model refused (safety)."""
+        raise NotImplementedError
+
+    # Async versions. These defaults run the sync call on a worker thread;
+    # backends with a native async client override them.
+
+    async def agenerate_text(self, model: str, prompt: str) -> str:
+        return await asyncio.to_thread(self.generate_text, model, prompt)
+
+    async def astream_text(self, model: str, prompt: str):
+        yield await self.agenerate_text(model, prompt)
+
+    async def agenerate_image(self, model: str, prompt: str, system_instruction: str = "",
+                              aspect_ratio: str = "1:1", temperature: float = None, timeout: float = None):
+        return await asyncio.to_thread(self.generate_image, model, prompt, system_instruction,
+                                       aspect_ratio, temperature, timeout)
+
+# ──────────────────────────────────────
+# GEMINI
+# ──────────────────────────────────────
+
+class GeminiBackend(ModelBackend):
+    """Google Gemini via the google.genai SDK."""
+
+    name = "gemini"
+
+    def __init__(self, api_key: str):
+        import httpx
+        from google.genai import Client, errors, types
+        self._types = types
+        self._api_error = errors.APIError
+        self._transport_error = httpx.TransportError
+        self.api_key = api_key
+        self.client = Client(api_key=api_key) if api_key else None
+
+    def is_configured(self) -> bool:
+        return bool(self.api_key)
+
+    def _backend_error(self, error: Exception) -> ModelBackendError:
+        """SDK/transport exception -> ModelBackendError with status and retry-after."""
+        if isinstance(error, self._api_error):
+            headers = getattr(getattr(error, "response", None), "headers", None) or {}
+            try:
+                retry_after = float(headers.get("retry-after")) if headers.get("retry-after") else None
+            except ValueError:
+                retry_after = None
+            return ModelBackendError(str(error), status=error.code, retry_after=retry_after)
+        return ModelBackendError(f"{type(error).__name__}: {error}")
+
+    def generate_text(self, model: str, prompt: str) -> str:
+        try:
+            response = self.client.models.generate_content(model=model, contents=prompt)
+        except (self._api_error, self._transport_error) as e:
+            raise self._backend_error(e) from e
+        return response.text
+
+    def stream_text(self, model: str, prompt: str):
+        try:
+            for chunk in self.client.models.generate_content_stream(model=model, contents=prompt):
+                if chunk.text:
+                    yield chunk.text
+        except (self._api_error, self._transport_error) as e:
+            raise self._backend_error(e) from e
+
+    async def agenerate_text(self, model: str, prompt: str) -> str:
+        try:
+            response = await self.client.aio.models.generate_content(model=model, contents=prompt)
+        except (self._api_error, self._transport_error) as e:
+            raise self._backend_error(e) from e
+        return response.text
+
+    async def astream_text(self, model: str, prompt: str):
+        try:
+            async for chunk in await self.client.aio.models.generate_content_stream(model=model, contents=prompt):
+                if chunk.text:
+                    yield chunk.text
+        except (self._api_error, self._transport_error) as e:
+            raise self._backend_error(e) from e
+
+    def _image_config(self, system_instruction: str, aspect_ratio: str, temperature: float, timeout: float):
+        types = self._types
+        return types.GenerateContentConfig(
+            system_instruction=system_instruction or None,
+            safety_settings=[
+                types.SafetySetting(category='HARM_CATEGORY_DANGEROUS_CONTENT', threshold='BLOCK_LOW_AND_ABOVE'),
+            ],
+            response_modalities=["TEXT", "IMAGE"],
+            image_config=types.ImageConfig(aspect_ratio=aspect_ratio),
+            temperature=temperature,
+            http_options=types.HttpOptions(timeout=int(timeout * 1000)) if timeout else None,
+        )
+
+    @staticmethod
+    def _image_data(response):
+        """Image bytes from a response, or None when it was refused or holds no image."""
+        if not response.candidates or response.candidates[0].finish_reason == "SAFETY":
+            return None
+
+        for part in response.candidates[0].content.parts:
+            # Skip the 'Thinking' process of the model
+            if hasattr(part, 'thought') and part.thought:
+                continue
+            if part.inline_data:
+                return part.inline_data.data
+
+        return None
+
+    def generate_image(self, model: str, prompt: str, system_instruction: str = "",
+                       aspect_ratio: str = "1:1", temperature: float = None, timeout: float = None):
+        config = self._image_config(system_instruction, aspect_ratio, temperature, timeout)
+        try:
+            response = self.client.models.generate_content(model=model, contents=prompt, config=config)
+        except (self._api_error, self._transport_error) as e:
+            raise self._backend_error(e) from e
+        return self._image_data(response)
+
+    async def agenerate_image(self, model: str, prompt: str, system_instruction: str = "",
+                              aspect_ratio: str = "1:1", temperature: float = None, timeout: float = None):
+        config = self._image_config(system_instruction, aspect_ratio, temperature, timeout)
+        try:
+            response = await self.client.aio.models.generate_content(model=model, contents=prompt, config=config)
+        except (self._api_error, self._transport_error) as e:
+            raise self._backend_error(e) from e
+        return self._image_data(response)
+
+# ──────────────────────────────────────
+# OFFLINE FAKE
+# ──────────────────────────────────────
+
+def parse_latency(spec: str):
+    """
+    Latency spec -> sampler returning seconds. Supported forms (milliseconds):
+    "fixed:200", "uniform:100,400", "lognormal:800,0.4" (median, sigma).
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v.strip()] if args else []
+    if kind == "fixed":
+        return lambda rng: values[0] / 1000
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1]) / 1000
+    raise ValueError(f"Unknown latency spec: {spec!r}")
+
+
+def make_png(size_bytes: int, seed: int) -> bytes:
+    """A valid RGB PNG of roughly `size_bytes`, filled with seeded noise."""
+    rng = random.Random(seed)
+    side = max(1, int(math.sqrt(max(size_bytes, 3) / 3)))
+    raw = b"".join(b"\x00" + rng.randbytes(side * 3) for _ in range(side))
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", side, side, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, 1)) + chunk(b"IEND", b"")
+
+
+# Characters per chunk when the fake streams text
+STREAM_CHUNK_CHARS = 64
+
+
+class FakeBackend(ModelBackend):
+    """
+    Deterministic offline model. Responses depend only on the prompt; latency
+    and injected errors come from a seeded generator, so a run is repeatable.
+    """
+
+    name = "fake"
+
+    def __init__(self, text_latency: str = "fixed:0", image_latency: str = "fixed:0",
+                 error_rate: float = 0.0, image_bytes: int = 150_000, seed: int = 0,
+                 error_status: int = 503, retry_after: float = None):
+        self.text_latency = parse_latency(text_latency)
+        self.image_latency = parse_latency(image_latency)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.image_bytes = image_bytes
+        self.seed = seed
+        self.calls = {"text": 0, "image": 0, "errors": 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _prompt_seed(self, prompt: str) -> int:
+        return int.from_bytes(hashlib.sha256(f"{self.seed}:{prompt}".encode("utf-8")).digest()[:8], "big")
+
+    def _draw(self, kind: str, sampler):
+        """Count a call and pick its (delay, fail) outcome."""
+        with self._lock:
+            self.calls[kind] += 1
+            delay = sampler(self._rng)
+            fail = self._rng.random() < self.error_rate
+            if fail:
+                self.calls["errors"] += 1
+        return delay, fail
+
+    def _fail(self, kind: str):
+        raise ModelBackendError(f"Injected {kind} failure", status=self.error_status, retry_after=self.retry_after)
+
+    def _simulate(self, kind: str, sampler):
+        delay, fail = self._draw(kind, sampler)
+        time.sleep(delay)
+        if fail:
+            self._fail(kind)
+
+    async def _asimulate(self, kind: str, sampler):
+        delay, fail = self._draw(kind, sampler)
+        await asyncio.sleep(delay)
+        if fail:
+            self._fail(kind)
+
+    @staticmethod
+    def _field(prompt: str, label: str, default: str) -> str:
+        match = re.search(rf"{label}:\s*(.+)", prompt)
+        return match.group(1).strip() if match else default
+
+    def generate_text(self, model: str, prompt: str) -> str:
+        self._simulate("text", self.text_latency)
+        return self._text_response(prompt)
+
+    def stream_text(self, model: str, prompt: str):
+        """Same text as generate_text, with the latency spread over the chunks."""
+        delay, fail = self._draw("text", self.text_latency)
+        if fail:
+            time.sleep(delay)
+            self._fail("text")
+        text = self._text_response(prompt)
+        chunks = [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)] or [""]
+        for chunk in chunks:
+            time.sleep(delay / len(chunks))
+            yield chunk
+
+    async def agenerate_text(self, model: str, prompt: str) -> str:
+        await self._asimulate("text", self.text_latency)
+        return self._text_response(prompt)
+
+    async def astream_text(self, model: str, prompt: str):
+        delay, fail = self._draw("text", self.text_latency)
+        if fail:
+            await asyncio.sleep(delay)
+            self._fail("text")
+        text = self._text_response(prompt)
+        chunks = [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)] or [""]
+        for chunk in chunks:
+            await asyncio.sleep(delay / len(chunks))
+            yield chunk
+
+    def _text_response(self, prompt: str) -> str:
+        if "Child picked" in prompt:
+            picked = re.search(r"Child picked '([^']*)'", prompt)
+            correct = re.search(r"correct was '([^']*)'", prompt)
+            right = picked and correct and picked.group(1).casefold() == correct.group(1).casefold()
+            return json.dumps({
+                "message": "Yay, you got it! 🌟" if right else "Good try, little star!",
+                "encouragement": "Keep going!" if right else "Let's look again together!",
+            })
+
+        theme = self._field(prompt, "Game Theme", "Apples")
+        count = re.search(r"(\d+)\s+questions", self._field(prompt, "Exact Scenario to Test", ""))
+        rng = random.Random(self._prompt_seed(prompt))
+        questions = []
+        for n in range(int(count.group(1)) if count else 1):
+            numbers = rng.sample(range(1, 10), 3)
+            labels = [f"{k} {theme.lower()}" for k in numbers]
+            correct = rng.choice(labels)
+            questions.append({
+                "gameTitle": theme,
+                "questionText": f"Can you find the picture with {correct}?",
+                "options": [
+                    {"label": label, "imageGenerationPrompt": f"Exactly {label} isolated on a plain white background"}
+                    for label in labels
+                ],
+                "correct_answer": correct,
+                "explanation": f"Great job! That picture has {correct}.",
+            })
+        return json.dumps(questions)
+
+    def generate_image(self, model: str, prompt: str, system_instruction: str = "",
+                       aspect_ratio: str = "1:1", temperature: float = None, timeout: float = None):
+        self._simulate("image", self.image_latency)
+        return make_png(self.image_bytes, self._prompt_seed(prompt))
+
+    async def agenerate_image(self, model: str, prompt: str, system_instruction: str = "",
+                              aspect_ratio: str = "1:1", temperature: float = None, timeout: float = None):
+        await self._asimulate("image", self.image_latency)
+        return make_png(self.image_bytes, self._prompt_seed(prompt))
+
+
+def create_backend(name: str = None) -> ModelBackend:
+    """Build the backend selected by MODEL_BACKEND (or `name`)."""
+    name = name or Config.MODEL_BACKEND
+    if name == "fake":
+        return FakeBackend(
+            text_latency=Config.FAKE_TEXT_LATENCY,
+            image_latency=Config.FAKE_IMAGE_LATENCY,
+            error_rate=Config.FAKE_ERROR_RATE,
+            image_bytes=Config.FAKE_IMAGE_BYTES,
+            seed=Config.FAKE_SEED,
+            error_status=Config.FAKE_ERROR_STATUS,
+            retry_after=Config.FAKE_RETRY_AFTER,
+        )
+    if name == "gemini":
+        return GeminiBackend(Config.GEMINI_API_KEY)
+    raise ValueError(f"Unknown MODEL_BACKEND: {name!r}")
+
+
+_backend = None
+_backend_pid = None
+_backend_lock = threading.Lock()
+
+def get_backend() -> ModelBackend:
+    """
+    The backend for this process, built on first use. Building it imports the
+    SDK and opens the client's connection pool, so a forked worker builds its
+    own instead of sharing the parent's.
+    """
+    global _backend, _backend_pid
+    if _backend is not None and _backend_pid == os.getpid():
+        return _backend
+    with _backend_lock:
+        if _backend is None or _backend_pid != os.getpid():
+            _backend = create_backend()
+            _backend_pid = os.getpid()
+        return _backend
+
+
+def _reset_backend_after_fork():
+    global _backend, _backend_pid, _backend_lock
+    _backend, _backend_pid = None, None
+    _backend_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_backend_after_fork)
@@ -0,0 +1,205 @@
+"""
+Progress Buffer
+================
+Write-behind queue for `/api/progress`. Finished games are accepted into
+memory and written by a background flusher as one multi-row INSERT (plus
+the rollup upserts) once PROGRESS_FLUSH_ROWS are waiting or
+PROGRESS_FLUSH_SECONDS have passed, so the end-of-class spike costs a few
+commits instead of hundreds.
+
+Each row keeps the time its game finished, however late it is written.
+On shutdown the buffer is flushed; anything that still can't reach the
+database is spilled to PROGRESS_SPILL_PATH and picked up again by the next
+process to start. Stats reflect buffered games after the next flush.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import psycopg2
+from config import Config
+from .revision_config import db_cursor
+from .revision_queries import record_progress
+from .metrics import register_collector, stage_timer
+
+logger = logging.getLogger(__name__)
+
+
+class BufferFullError(Exception):
+    """Raised when the buffer is at PROGRESS_BUFFER_MAX_ROWS (database unreachable)."""
+
+
+class ProgressBuffer:
+    """Batches progress rows in memory and flushes them on size or time."""
+
+    def __init__(self, flush_rows: int, flush_seconds: float, max_rows: int, spill_path: str = None, writer=None):
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.max_rows = max_rows
+        self.spill_path = spill_path
+        self._writer = writer or _write_rows
+        self._rows = []
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._pid = os.getpid()
+        self.flushed = 0
+        self.failures = 0
+        self._load_spill()
+        self._thread = threading.Thread(target=self._run, name="mochi-progress", daemon=True)
+        self._thread.start()
+
+    def add(self, record: dict):
+        """Queue one finished game (category_id, student_session, score, total_questions)."""
+        row = dict(record, finished_at=time.time())
+        with self._lock:
+            if len(self._rows) >= self.max_rows:
+                raise BufferFullError("Progress buffer is full.")
+            self._rows.append(row)
+            if len(self._rows) >= self.flush_rows:
+                self._wake.notify()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._rows)
+
+    def flush(self) -> int:
+        """Write everything queued so far. Returns rows written; on failure they are re-queued."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+
+            now = time.time()
+            batch = [dict(r, age=max(0.0, now - r["finished_at"])) for r in rows]
+            try:
+                with stage_timer("progress_flush"):
+                    self._writer(batch)
+            except Exception as e:
+                logger.error(f"📝 Progress flush of {len(rows)} rows failed, will retry: {e}")
+                self.failures += 1
+                with self._lock:
+                    self._rows = rows + self._rows
+                return 0
+
+            self.flushed += len(rows)
+            return len(rows)
+
+    def _run(self):
+        backing_off = False
+        while True:
+            with self._lock:
+                if self._closed:
+                    return
+                if backing_off or len(self._rows) < self.flush_rows:
+                    self._wake.wait(timeout=self.flush_seconds)
+                if self._closed:
+                    return
+            failures = self.failures
+            self.flush()
+            # After a failed flush, wait a full interval before trying again
+            backing_off = self.failures > failures
+
+    def close(self):
+        """Stop the flusher, flush what's left and spill anything unwritten to disk."""
+        if os.getpid() != self._pid:
+            return  # a forked child's copy; the rows belong to the parent
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._wake.notify()
+        self._thread.join(timeout=self.flush_seconds + 5)
+        self.flush()
+        self._spill()
+
+    def _spill(self):
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if not rows:
+            return
+        if not self.spill_path:
+            logger.error(f"📝 Dropping {len(rows)} unwritten progress rows (no spill path).")
+            return
+        try:
+            os.makedirs(os.path.dirname(self.spill_path), exist_ok=True)
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row) + "\n")
+            logger.warning(f"📝 Spilled {len(rows)} progress rows to {self.spill_path}")
+        except OSError as e:
+            logger.error(f"📝 Could not spill {len(rows)} progress rows: {e}")
+
+    def _load_spill(self):
+        """Claim rows spilled by an earlier process (rename first, so only one process takes them)."""
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return
+        claimed = f"{self.spill_path}.{os.getpid()}.claimed"
+        try:
+            os.replace(self.spill_path, claimed)
+        except OSError:
+            return
+        try:
+            with open(claimed, encoding="utf-8") as f:
+                rows = [json.loads(line) for line in f if line.strip()]
+            self._rows.extend(rows)
+            os.remove(claimed)
+            logger.info(f"📝 Recovered {len(rows)} spilled progress rows.")
+        except (OSError, ValueError) as e:
+            logger.error(f"📝 Could not recover spilled progress rows from {claimed}: {e}")
+
+
+def _write_rows(batch: list):
+    try:
+        with db_cursor() as cur:
+            record_progress(cur, batch)
+    except (psycopg2.IntegrityError, psycopg2.DataError):
+        # One bad row (e.g. a deleted category) must not block the whole batch
+        for row in batch:
+            try:
+                with db_cursor() as cur:
+                    record_progress(cur, [row])
+            except (psycopg2.IntegrityError, psycopg2.DataError) as e:
+                logger.error(f"📝 Dropping invalid progress row {row}: {e}")
+
+
+_buffer = None
+_buffer_pid = None
+_buffer_lock = threading.Lock()
+
+def get_progress_buffer() -> ProgressBuffer:
+    """Process-wide buffer, created on first use (after any fork) and flushed at exit."""
+    global _buffer, _buffer_pid
+    with _buffer_lock:
+        if _buffer is None or _buffer_pid != os.getpid():
+            _buffer = ProgressBuffer(
+                flush_rows=Config.PROGRESS_FLUSH_ROWS,
+                flush_seconds=Config.PROGRESS_FLUSH_SECONDS,
+                max_rows=Config.PROGRESS_BUFFER_MAX_ROWS,
+                spill_path=Config.PROGRESS_SPILL_PATH,
+            )
+            _buffer_pid = os.getpid()
+            atexit.register(_buffer.close)
+        return _buffer
+
+
+def close_progress_buffer():
+    """Flush and stop this process's buffer, if it has one. Also runs at exit; closing twice is a no-op."""
+    with _buffer_lock:
+        buffer = _buffer if _buffer_pid == os.getpid() else None
+    if buffer is not None:
+        buffer.close()
+
+
+@register_collector
+def _progress_gauges():
+    if _buffer is None or _buffer_pid != os.getpid():
+        return
+    yield "mochi_progress_buffered_rows", "gauge", "Progress rows waiting to be written.", _buffer.pending()
+    yield "mochi_progress_flushed_rows_total", "counter", "Progress rows written by the buffer.", _buffer.flushed
+    yield "mochi_progress_flush_failures_total", "counter", "Progress flushes that failed and were retried.", _buffer.failures
@@ -0,0 +1,150 @@
+"""
+Response Cache
+===============
+Every child's device fetches the same category list and question pages at
+the start of a game, and that data only changes when a teacher saves
+something. Read endpoints decorated with `@cached_response(...)` are kept
+in an in-process LRU (RESPONSE_CACHE_SIZE entries, RESPONSE_CACHE_TTL_SECONDS)
+keyed on path and query string:
+
+- concurrent misses for the same key share one database query (SingleFlight)
+- responses carry an ETag (hash of the body) and Last-Modified, and
+  conditional requests are answered with 304 Not Modified
+- compressible bodies are compressed once per encoding (see compression)
+  and kept with the entry, so hits don't pay for it again
+- each entry belongs to tags ("categories", "category-<id>"); writes call
+  `invalidate(tag, ...)`, which bumps the tag's version in this process and
+  touches a stamp file under RESPONSE_CACHE_STAMP_DIR so other workers on
+  the host drop their copies too
+
+Only 200 responses are cached.
+"""
+
+import functools
+import hashlib
+import logging
+import os
+import threading
+import time
+from email.utils import formatdate
+from flask import Response, current_app, request
+from config import Config
+from .feedback_cache import TTLCache
+from .singleflight import SingleFlight
+from .compression import compressible, negotiate, compress
+from .metrics import register_collector, CACHE_EVENTS
+
+logger = logging.getLogger(__name__)
+
+# Headers of the original response replayed on cache hits
+REPLAYED_HEADERS = ("X-Next-Cursor", "Link")
+
+response_cache = TTLCache(Config.RESPONSE_CACHE_SIZE, Config.RESPONSE_CACHE_TTL_SECONDS)
+_fills = SingleFlight()
+_local_versions = {}
+_versions_lock = threading.Lock()
+
+
+def _stamp_path(tag: str) -> str:
+    return os.path.join(Config.RESPONSE_CACHE_STAMP_DIR, tag)
+
+
+def tag_version(tag: str) -> tuple:
+    """(in-process version, stamp file mtime) — changes whenever the tag is invalidated."""
+    with _versions_lock:
+        local = _local_versions.get(tag, 0)
+    try:
+        stamp = os.stat(_stamp_path(tag)).st_mtime_ns
+    except OSError:
+        stamp = 0
+    return local, stamp
+
+
+def invalidate(*tags: str):
+    """Drop cached responses for these tags, in this process and in the others on this host."""
+    now = time.time_ns()
+    with _versions_lock:
+        for tag in tags:
+            _local_versions[tag] = _local_versions.get(tag, 0) + 1
+    for tag in tags:
+        try:
+            os.makedirs(Config.RESPONSE_CACHE_STAMP_DIR, exist_ok=True)
+            with open(_stamp_path(tag), "a"):
+                pass
+            os.utime(_stamp_path(tag), ns=(now, now))
+        except OSError as e:
+            logger.error(f"🗃️ Could not stamp response cache tag {tag}: {e}")
+
+
+def _render(view, kwargs) -> dict:
+    """Run the view and snapshot its response as a cache entry."""
+    response = current_app.make_response(view(**kwargs))
+    body = response.get_data()
+    return {
+        "status": response.status_code,
+        "body": body,
+        "compressible": response.status_code == 200 and compressible(response.mimetype, len(body)),
+        "encoded": {},  # encoding -> compressed body, filled on first use
+        "mimetype": response.mimetype,
+        "headers": {h: response.headers[h] for h in REPLAYED_HEADERS if h in response.headers},
+        "etag": hashlib.sha1(body).hexdigest()[:20],
+        "last_modified": time.time(),
+    }
+
+
+def _respond(entry: dict) -> Response:
+    encoding = negotiate(request.accept_encodings) if entry["compressible"] else None
+    body = entry["body"]
+    if encoding:
+        if encoding not in entry["encoded"]:
+            entry["encoded"][encoding] = compress(body, encoding)
+        body = entry["encoded"][encoding]
+    response = Response(body, status=entry["status"], mimetype=entry["mimetype"], headers=entry["headers"])
+    if entry["compressible"]:
+        response.vary.add("Accept-Encoding")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    if entry["status"] == 200:
+        # Each encoding is a different representation, so it gets its own ETag
+        response.set_etag(f"{entry['etag']}-{encoding}" if encoding else entry["etag"])
+        response.headers["Last-Modified"] = formatdate(entry["last_modified"], usegmt=True)
+        response.headers["Cache-Control"] = (f"public, max-age={Config.RESPONSE_CACHE_MAX_AGE}"
+                                             if Config.RESPONSE_CACHE_MAX_AGE else "no-cache")
+        response.make_conditional(request)
+    return response
+
+
+def cached_response(*tags: str):
+    """
+    Cache a GET view. Tags may use the view's URL arguments, e.g.
+    `@cached_response("category-{category_id}")`.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(**kwargs):
+            if not Config.RESPONSE_CACHE_ENABLED:
+                return view(**kwargs)
+
+            entry_tags = [tag.format(**kwargs) for tag in tags]
+            # Versions are read before the view runs, so a write that lands
+            # meanwhile leaves this fill under a key nobody asks for again
+            key = (request.path, tuple(sorted(request.args.items(multi=True))),
+                   tuple(tag_version(tag) for tag in entry_tags))
+
+            entry = response_cache.get(key)
+            if entry is not None:
+                CACHE_EVENTS.inc("response", "hit")
+                return _respond(entry)
+
+            entry, shared = _fills.do(key, lambda: _render(view, kwargs))
+            CACHE_EVENTS.inc("response", "coalesced" if shared else "miss")
+            if not shared and entry["status"] == 200:
+                response_cache.set(key, entry)
+            return _respond(entry)
+        return wrapper
+    return decorator
+
+
+@register_collector
+def _response_cache_gauges():
+    yield "mochi_response_cache_entries", "gauge", "Entries in the response cache.", response_cache.stats()["entries"]
@@ -1,12 +1,19 @@
 """
 Revision Games Configuration
 =============================
-Database schema for the Revision Games feature.
+Database connections and schema for the Revision Games feature. The schema
+itself is applied and evolved by the versioned migrations in migrations.py.
 """
 
+import os
+import threading
+import time
+from contextlib import contextmanager
 import psycopg2
 import psycopg2.extras
+import psycopg2.pool
 from config import Config
+from .metrics import register_collector
 
 # ──────────────────────────────────────
 # DATABASE CONNECTION
@@ -16,6 +23,176 @@ def get_connection():
     """Return a new psycopg2 connection using config values."""
     return psycopg2.connect(Config.DATABASE_URL)
 
+# ──────────────────────────────────────
+# CONNECTION POOL
+# ──────────────────────────────────────
+
+class PoolTimeoutError(psycopg2.pool.PoolError):
+    """No pooled connection became free within DB_POOL_TIMEOUT."""
+
+
+_pool = None
+_pool_pid = None
+_pool_slots = None
+_pool_lock = threading.Lock()
+_last_used = {}
+# Pools inherited across a fork: kept referenced so their sockets (shared with
+# the parent) are never closed from the child.
+_inherited_pools = []
+
+_stats_lock = threading.Lock()
+_stats = {
+    "checkouts": 0,
+    "wait_seconds_total": 0.0,
+    "wait_seconds_max": 0.0,
+    "timeouts": 0,
+    "reconnects": 0,
+    "in_use": 0,
+}
+
+
+def _get_pool():
+    """Process-wide pool, rebuilt lazily in each process after a fork."""
+    global _pool, _pool_pid, _pool_slots
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            return _pool, _pool_slots
+
+        if _pool is not None:
+            _inherited_pools.append(_pool)
+        _pool = psycopg2.pool.ThreadedConnectionPool(
+            Config.DB_POOL_MIN, Config.DB_POOL_MAX, Config.DATABASE_URL
+        )
+        _pool_slots = threading.BoundedSemaphore(Config.DB_POOL_MAX)
+        _pool_pid = os.getpid()
+        _last_used.clear()
+        return _pool, _pool_slots
+
+
+def _reset_pool_after_fork():
+    global _pool_pid, _pool_lock, _stats_lock
+    # Another thread may have held these at the fork; the child has no such thread
+    _pool_lock = threading.Lock()
+    _stats_lock = threading.Lock()
+    _pool_pid = None
+    for key in _stats:
+        _stats[key] = type(_stats[key])()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_pool_after_fork)
+
+
+def _is_healthy(conn) -> bool:
+    """Cheap liveness check, with a round trip only for long-idle connections."""
+    if conn.closed:
+        return False
+    last_used = _last_used.get(id(conn))
+    if last_used is None or time.monotonic() - last_used < Config.DB_POOL_PING_IDLE_SECONDS:
+        return True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+@contextmanager
+def db_connection():
+    """
+    Check out a pooled connection for the duration of the block.
+    Commits on success, rolls back on error, and always returns it to the pool.
+    """
+    pool, slots = _get_pool()
+
+    started = time.monotonic()
+    if not slots.acquire(timeout=Config.DB_POOL_TIMEOUT):
+        with _stats_lock:
+            _stats["timeouts"] += 1
+        raise PoolTimeoutError(f"No database connection available after {Config.DB_POOL_TIMEOUT}s")
+    waited = time.monotonic() - started
+    with _stats_lock:
+        _stats["in_use"] += 1
+
+    conn = None
+    broken = False
+    try:
+        conn = pool.getconn()
+        if not _is_healthy(conn):
+            _last_used.pop(id(conn), None)
+            pool.putconn(conn, close=True)
+            # Already handed back: if the replacement fails, there is nothing to return
+            conn = None
+            conn = pool.getconn()
+            with _stats_lock:
+                _stats["reconnects"] += 1
+
+        with _stats_lock:
+            _stats["checkouts"] += 1
+            _stats["wait_seconds_total"] += waited
+            _stats["wait_seconds_max"] = max(_stats["wait_seconds_max"], waited)
+
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+            raise
+    finally:
+        if conn is not None:
+            close = broken or bool(conn.closed)
+            # id() values are reused, so a closed connection's entry must not linger
+            if close:
+                _last_used.pop(id(conn), None)
+            else:
+                _last_used[id(conn)] = time.monotonic()
+            pool.putconn(conn, close=close)
+        with _stats_lock:
+            _stats["in_use"] -= 1
+        slots.release()
+
+
+@contextmanager
+def db_cursor():
+    """Shortcut for a pooled connection plus a RealDictCursor."""
+    with db_connection() as conn:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            yield cur
+
+
+def pool_stats() -> dict:
+    """Checkout and wait-time counters for the current process's pool."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["max_size"] = Config.DB_POOL_MAX
+    return stats
+
+
+@register_collector
+def _pool_gauges():
+    if _pool is None:
+        return
+    stats = pool_stats()
+    yield "mochi_db_pool_in_use", "gauge", "Pooled connections checked out.", stats["in_use"]
+    yield "mochi_db_pool_checkouts_total", "counter", "Connections checked out of the pool.", stats["checkouts"]
+    yield "mochi_db_pool_wait_seconds_total", "counter", "Time spent waiting for a pooled connection.", stats["wait_seconds_total"]
+    yield "mochi_db_pool_timeouts_total", "counter", "Checkouts that gave up waiting.", stats["timeouts"]
+
+
+def close_pool():
+    """Close every pooled connection owned by this process (gunicorn's worker_exit hook)."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.closeall()
+        _last_used.clear()
+        _pool = None
+        _pool_pid = None
+
 # ──────────────────────────────────────
 # SCHEMA
 # ──────────────────────────────────────
@@ -54,15 +231,59 @@ CREATE TABLE IF NOT EXISTS game_progress (
     total_questions INTEGER DEFAULT 0,
     completed_at TIMESTAMP DEFAULT NOW()
 );
+
+CREATE TABLE IF NOT EXISTS progress_category_stats (
+    category_id INTEGER PRIMARY KEY REFERENCES categories(id) ON DELETE CASCADE,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    score_total BIGINT NOT NULL DEFAULT 0,
+    questions_total BIGINT NOT NULL DEFAULT 0,
+    last_played TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS progress_session_stats (
+    student_session VARCHAR(100) NOT NULL,
+    category_id INTEGER NOT NULL REFERENCES categories(id) ON DELETE CASCADE,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    score_total BIGINT NOT NULL DEFAULT 0,
+    questions_total BIGINT NOT NULL DEFAULT 0,
+    last_played TIMESTAMP,
+    PRIMARY KEY (student_session, category_id)
+);
+
+CREATE TABLE IF NOT EXISTS request_flights (
+    key VARCHAR(64) PRIMARY KEY,
+    result JSONB NOT NULL,
+    finished_at TIMESTAMP DEFAULT NOW()
+);
+"""
+
+# Leases for cross-process single flight (migration 4): a row is claimed by
+# `owner` until `leased_until` while its generation runs, then holds the result
+FLIGHT_LEASES_SQL = """
+ALTER TABLE request_flights ALTER COLUMN result DROP NOT NULL;
+ALTER TABLE request_flights ALTER COLUMN finished_at DROP DEFAULT;
+ALTER TABLE request_flights ADD COLUMN IF NOT EXISTS owner VARCHAR(64);
+ALTER TABLE request_flights ADD COLUMN IF NOT EXISTS leased_until TIMESTAMP;
+"""
+
+# Rebuilds rollup rows for anything logged before the rollups existed (migration 2)
+ROLLUP_BACKFILL_SQL = """
+INSERT INTO progress_category_stats (category_id, attempts, score_total, questions_total, last_played)
+SELECT category_id, COUNT(*), COALESCE(SUM(score), 0), COALESCE(SUM(total_questions), 0), MAX(completed_at)
+FROM game_progress GROUP BY category_id
+ON CONFLICT (category_id) DO NOTHING;
+
+INSERT INTO progress_session_stats (student_session, category_id, attempts, score_total, questions_total, last_played)
+SELECT student_session, category_id, COUNT(*), COALESCE(SUM(score), 0), COALESCE(SUM(total_questions), 0), MAX(completed_at)
+FROM game_progress GROUP BY student_session, category_id
+ON CONFLICT (student_session, category_id) DO NOTHING;
 """
 
 def init_db():
-    """Create all tables if they don't exist."""
-    conn = get_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(SCHEMA_SQL)
-        conn.commit()
-        print("✅ Revision Games tables ready.")
-    finally:
-        conn.close()
\ No newline at end of file
+    """Bring the schema up to date by applying any pending migrations."""
+    from .migrations import migrate  # migrations builds on the SQL above
+
+    applied = migrate()
+    if applied:
+        print(f"🗂️ Applied schema migrations {applied}.")
+    print("✅ Revision Games tables ready.")
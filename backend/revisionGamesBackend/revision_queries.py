@@ -0,0 +1,346 @@
+"""
+Revision Games Queries
+=======================
+SQL used by the Revision Games routes and scripts. Reads are set-based and
+keyset paginated: a page costs one round trip however many questions or
+options it holds, and fetching page N is as cheap as fetching page 1. Writes
+go through multi-row INSERTs, a handful of statements per pack. Game progress
+is appended in batches that also bump per-category and per-session rollups,
+so stats are read without aggregating the raw log.
+"""
+
+import base64
+import json
+import psycopg2.extras
+
+CATEGORY_PAGE_SQL = """
+SELECT id, name, description, icon_url, color
+FROM categories
+WHERE id > %s
+ORDER BY id
+LIMIT %s
+"""
+
+# Page the questions first, then aggregate each one's options with an
+# index-friendly lateral lookup, so the whole page is a single statement.
+QUESTION_PAGE_SQL = """
+SELECT q.id, q.category_id, q.target_item, q.correct_answer, q.audio_url,
+       COALESCE(opts.options, '[]'::json) AS options
+FROM (
+    SELECT id, category_id, target_item, correct_answer, audio_url
+    FROM questions
+    WHERE category_id = %s AND id > %s
+    ORDER BY id
+    LIMIT %s
+) q
+LEFT JOIN LATERAL (
+    SELECT json_agg(json_build_object('id', o.id, 'label', o.label, 'image_url', o.image_url)
+                    ORDER BY o.id) AS options
+    FROM question_options o
+    WHERE o.question_id = q.id
+) opts ON TRUE
+ORDER BY q.id
+"""
+
+# A category with all its questions (up to a limit) and their options, as
+# one row: the game bundle in a single round trip.
+CATEGORY_BUNDLE_SQL = """
+SELECT c.id, c.name, c.description, c.icon_url, c.color,
+       COALESCE(qs.questions, '[]'::json) AS questions
+FROM categories c
+LEFT JOIN LATERAL (
+    SELECT json_agg(json_build_object('id', q.id, 'target_item', q.target_item,
+                                      'correct_answer', q.correct_answer, 'audio_url', q.audio_url,
+                                      'options', COALESCE(opts.options, '[]'::json))
+                    ORDER BY q.id) AS questions
+    FROM (
+        SELECT id, target_item, correct_answer, audio_url
+        FROM questions
+        WHERE category_id = c.id
+        ORDER BY id
+        LIMIT %s
+    ) q
+    LEFT JOIN LATERAL (
+        SELECT json_agg(json_build_object('id', o.id, 'label', o.label, 'image_url', o.image_url)
+                        ORDER BY o.id) AS options
+        FROM question_options o
+        WHERE o.question_id = q.id
+    ) opts ON TRUE
+) qs ON TRUE
+WHERE c.id = %s
+"""
+
+# ──────────────────────────────────────
+# CURSORS
+# ──────────────────────────────────────
+
+def encode_cursor(last_id: int) -> str:
+    """Opaque cursor pointing just after `last_id`."""
+    raw = json.dumps({"after": last_id}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """Inverse of encode_cursor. Raises ValueError for anything malformed."""
+    if not cursor:
+        return 0
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        after = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))["after"]
+    except Exception:
+        raise ValueError("Invalid cursor.")
+    if not isinstance(after, int) or after < 0:
+        raise ValueError("Invalid cursor.")
+    return after
+
+# ──────────────────────────────────────
+# READS
+# ──────────────────────────────────────
+
+def _page(cur, sql: str, params: tuple, limit: int):
+    """Run a keyset query (asking for limit + 1 rows); return (rows, next_cursor)."""
+    cur.execute(sql, params)
+    rows = [dict(r) for r in cur.fetchall()]
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1]["id"])
+    return rows, None
+
+
+def fetch_categories_page(cur, after_id: int = 0, limit: int = 50):
+    """One page of categories in id order, plus the cursor for the next page."""
+    return _page(cur, CATEGORY_PAGE_SQL, (after_id, limit + 1), limit)
+
+
+def fetch_questions_page(cur, category_id: int, after_id: int = 0, limit: int = 50):
+    """One page of a category's questions with their options, plus the next cursor."""
+    return _page(cur, QUESTION_PAGE_SQL, (category_id, after_id, limit + 1), limit)
+
+
+def fetch_category_bundle(cur, category_id: int, max_questions: int):
+    """
+    The category with its first `max_questions` questions and their options,
+    plus whether there were more; (None, False) if the category doesn't exist.
+    """
+    cur.execute(CATEGORY_BUNDLE_SQL, (max_questions + 1, category_id))
+    row = cur.fetchone()
+    if row is None:
+        return None, False
+    category = dict(row)
+    truncated = len(category["questions"]) > max_questions
+    category["questions"] = category["questions"][:max_questions]
+    return category, truncated
+
+# ──────────────────────────────────────
+# BULK WRITES
+# ──────────────────────────────────────
+
+# Rows per multi-row INSERT statement
+BULK_PAGE_SIZE = 1000
+
+
+def _reserve_ids(cur, table: str, count: int) -> list:
+    """Draw `count` ids from a table's serial sequence in one round trip."""
+    if count == 0:
+        return []
+    cur.execute(
+        "SELECT nextval(pg_get_serial_sequence(%s, 'id')) AS id FROM generate_series(1, %s)",
+        (table, count),
+    )
+    return [row["id"] if isinstance(row, dict) else row[0] for row in cur.fetchall()]
+
+
+def insert_categories(cur, categories: list) -> list:
+    """
+    Bulk-insert categories together with their questions and options.
+
+    Each category is a dict with `name` and optional `description`, `icon_url`,
+    `color` and `questions`; each question has `target_item`, `correct_answer`,
+    optional `audio_url` and `options` (`label`, optional `image_url`).
+    Ids are reserved up front so parents and children can be written with one
+    multi-row INSERT per table, whatever the size of the pack.
+    Returns the new category ids, in input order.
+    """
+    questions = [q for c in categories for q in c.get("questions", [])]
+    options = [o for q in questions for o in q.get("options", [])]
+
+    cat_ids = _reserve_ids(cur, "categories", len(categories))
+    q_ids = _reserve_ids(cur, "questions", len(questions))
+
+    cat_rows, q_rows, opt_rows = [], [], []
+    q_index = 0
+    for cat_id, cat in zip(cat_ids, categories):
+        cat_rows.append((
+            cat_id, cat["name"], cat.get("description", ""),
+            cat.get("icon_url", ""), cat.get("color", "bg-gray-100"),
+        ))
+        for q in cat.get("questions", []):
+            q_id = q_ids[q_index]
+            q_index += 1
+            q_rows.append((q_id, cat_id, q["target_item"], q["correct_answer"], q.get("audio_url")))
+            for opt in q.get("options", []):
+                opt_rows.append((q_id, opt["label"], opt.get("image_url") or ""))
+
+    psycopg2.extras.execute_values(
+        cur,
+        "INSERT INTO categories (id, name, description, icon_url, color) VALUES %s",
+        cat_rows, page_size=BULK_PAGE_SIZE,
+    )
+    if q_rows:
+        psycopg2.extras.execute_values(
+            cur,
+            "INSERT INTO questions (id, category_id, target_item, correct_answer, audio_url) VALUES %s",
+            q_rows, page_size=BULK_PAGE_SIZE,
+        )
+    if opt_rows:
+        psycopg2.extras.execute_values(
+            cur,
+            "INSERT INTO question_options (question_id, label, image_url) VALUES %s",
+            opt_rows, page_size=BULK_PAGE_SIZE,
+        )
+    return cat_ids
+
+
+def activity_to_category(data: dict) -> dict:
+    """Maps a saved AI activity (as posted by the frontend) onto the pack format."""
+    return {
+        "name": data["category_name"],
+        "description": data.get("description", ""),
+        "icon_url": "Sparkles",
+        "color": "bg-cyan-100",
+        "questions": [
+            {
+                "target_item": qd.get("questionText", "Look!"),
+                "correct_answer": qd.get("correct_answer", "Option 1"),
+                "options": [
+                    {"label": opt["label"], "image_url": opt.get("image_url", "")}
+                    for opt in qd.get("options", [])
+                ],
+            }
+            for qd in data.get("questions", [])
+        ],
+    }
+
+# ──────────────────────────────────────
+# GAME PROGRESS
+# ──────────────────────────────────────
+
+PROGRESS_INSERT_SQL = "INSERT INTO game_progress (category_id, student_session, score, total_questions, completed_at) VALUES %s"
+PROGRESS_TEMPLATE = "(%s, %s, %s, %s, NOW() - %s * INTERVAL '1 second')"
+
+CATEGORY_ROLLUP_SQL = """
+INSERT INTO progress_category_stats (category_id, attempts, score_total, questions_total, last_played)
+VALUES %s
+ON CONFLICT (category_id) DO UPDATE SET
+    attempts = progress_category_stats.attempts + EXCLUDED.attempts,
+    score_total = progress_category_stats.score_total + EXCLUDED.score_total,
+    questions_total = progress_category_stats.questions_total + EXCLUDED.questions_total,
+    last_played = GREATEST(progress_category_stats.last_played, EXCLUDED.last_played)
+"""
+CATEGORY_ROLLUP_TEMPLATE = "(%s, %s, %s, %s, NOW() - %s * INTERVAL '1 second')"
+
+SESSION_ROLLUP_SQL = """
+INSERT INTO progress_session_stats (student_session, category_id, attempts, score_total, questions_total, last_played)
+VALUES %s
+ON CONFLICT (student_session, category_id) DO UPDATE SET
+    attempts = progress_session_stats.attempts + EXCLUDED.attempts,
+    score_total = progress_session_stats.score_total + EXCLUDED.score_total,
+    questions_total = progress_session_stats.questions_total + EXCLUDED.questions_total,
+    last_played = GREATEST(progress_session_stats.last_played, EXCLUDED.last_played)
+"""
+SESSION_ROLLUP_TEMPLATE = "(%s, %s, %s, %s, %s, NOW() - %s * INTERVAL '1 second')"
+
+def _rollup(records: list, key) -> list:
+    """Sum a batch per key: [(key, attempts, score, questions, newest age)], in key order."""
+    groups = {}
+    for r in records:
+        k = key(r)
+        g = groups.get(k)
+        if g is None:
+            groups[k] = [1, r["score"], r["total_questions"], r.get("age", 0.0)]
+        else:
+            g[0] += 1
+            g[1] += r["score"]
+            g[2] += r["total_questions"]
+            g[3] = min(g[3], r.get("age", 0.0))
+    # Sorted so concurrent flushes lock rollup rows in the same order
+    return [(k, *g) for k, g in sorted(groups.items())]
+
+
+def record_progress(cur, records: list) -> int:
+    """
+    Append finished games to game_progress and fold them into the rollups,
+    in the caller's transaction. Each record has `category_id`,
+    `student_session`, `score`, `total_questions` and optionally `age`:
+    seconds since the game finished (for rows written late by the buffer).
+    """
+    if not records:
+        return 0
+    psycopg2.extras.execute_values(
+        cur, PROGRESS_INSERT_SQL,
+        [(r["category_id"], r["student_session"], r["score"], r["total_questions"], r.get("age", 0.0)) for r in records],
+        template=PROGRESS_TEMPLATE, page_size=BULK_PAGE_SIZE,
+    )
+    psycopg2.extras.execute_values(
+        cur, CATEGORY_ROLLUP_SQL,
+        [(k, *g) for k, *g in _rollup(records, lambda r: r["category_id"])],
+        template=CATEGORY_ROLLUP_TEMPLATE, page_size=BULK_PAGE_SIZE,
+    )
+    psycopg2.extras.execute_values(
+        cur, SESSION_ROLLUP_SQL,
+        [(*k, *g) for k, *g in _rollup(records, lambda r: (r["student_session"], r["category_id"]))],
+        template=SESSION_ROLLUP_TEMPLATE, page_size=BULK_PAGE_SIZE,
+    )
+    return len(records)
+
+
+CATEGORY_STATS_PAGE_SQL = """
+SELECT s.category_id AS id, c.name, s.attempts, s.score_total, s.questions_total, s.last_played
+FROM progress_category_stats s
+JOIN categories c ON c.id = s.category_id
+WHERE s.category_id > %s
+ORDER BY s.category_id
+LIMIT %s
+"""
+
+SESSION_STATS_SQL = """
+SELECT s.category_id AS id, c.name, s.attempts, s.score_total, s.questions_total, s.last_played
+FROM progress_session_stats s
+JOIN categories c ON c.id = s.category_id
+WHERE s.student_session = %s
+ORDER BY s.last_played DESC
+"""
+
+
+def _stats(row: dict) -> dict:
+    """Rollup counters -> attempts, averages and last played time."""
+    attempts = row["attempts"]
+    return {
+        "attempts": attempts,
+        "average_score": round(row["score_total"] / attempts, 2) if attempts else 0.0,
+        "average_percent": round(100 * row["score_total"] / row["questions_total"], 1) if row["questions_total"] else 0.0,
+        "last_played": row["last_played"].isoformat() if row["last_played"] else None,
+    }
+
+
+def fetch_category_stats_page(cur, after_id: int = 0, limit: int = 50):
+    """One page of per-category stats in category id order, plus the next cursor."""
+    rows, next_cursor = _page(cur, CATEGORY_STATS_PAGE_SQL, (after_id, limit + 1), limit)
+    return [{"category_id": r["id"], "name": r["name"], **_stats(r)} for r in rows], next_cursor
+
+
+def fetch_session_stats(cur, student_session: str) -> dict:
+    """A student session's totals plus its per-category stats (most recent first)."""
+    cur.execute(SESSION_STATS_SQL, (student_session,))
+    rows = [dict(r) for r in cur.fetchall()]
+    totals = {
+        "attempts": sum(r["attempts"] for r in rows),
+        "score_total": sum(r["score_total"] for r in rows),
+        "questions_total": sum(r["questions_total"] for r in rows),
+        "last_played": max((r["last_played"] for r in rows if r["last_played"]), default=None),
+    }
+    return {
+        "student_session": student_session,
+        **_stats(totals),
+        "categories": [{"category_id": r["id"], "name": r["name"], **_stats(r)} for r in rows],
+    }
@@ -5,229 +5,471 @@ All API endpoints for the Revision Games feature.
 Updated to integrate Gemini 2.0 Flash and Gemini 3 Pro Image Preview.
 """
 
-from flask import Blueprint, request, jsonify
-# import psycopg2.extras 
+from flask import Blueprint, Response, request, jsonify, send_file, abort
+import itertools
 import json
-# from .revision_config import get_connection 
+import logging
+from urllib.parse import urlencode
+from config import Config
+from .revision_config import db_cursor
+from .revision_queries import (
+    decode_cursor, fetch_categories_page, fetch_questions_page, fetch_category_bundle,
+    insert_categories, activity_to_category,
+    record_progress, fetch_category_stats_page, fetch_session_stats,
+)
 
-from .gemini_services import generate_questions, generate_feedback
+from .gemini_services import (
+    generate_questions, iter_game_events, generate_feedback, prime_feedback_bank,
+)
+from .image_store import image_store, MIME_EXTENSIONS
+from .image_variants import best_variant
+from .generation_jobs import get_job_manager, QueueFullError
+from .progress_buffer import get_progress_buffer, BufferFullError
+from .response_cache import cached_response, invalidate
+from .metrics import stage_timer, CACHE_EVENTS
+from .game_bank import find_similar_game, remember_game
+from .game_bundle import build_bundle
+
+logger = logging.getLogger(__name__)
 
 revision_games_bp = Blueprint("revision_games", __name__, url_prefix="/api")
 
 # --- Categories ---
 
+def _page_args():
+    """Reads `?cursor=&limit=` into (after_id, limit). Raises ValueError if invalid."""
+    after_id = decode_cursor(request.args.get("cursor", ""))
+    limit = request.args.get("limit", Config.PAGE_SIZE_DEFAULT, type=int)
+    if limit is None or limit < 1:
+        raise ValueError("Invalid limit.")
+    return after_id, min(limit, Config.PAGE_SIZE_MAX)
+
+def _paged_response(rows, next_cursor):
+    """
+    The body stays a plain JSON list; the next page is advertised through the
+    `X-Next-Cursor` and `Link` headers so existing clients keep working.
+    """
+    response = jsonify(rows)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+        next_args = request.args.to_dict()
+        next_args["cursor"] = next_cursor
+        response.headers["Link"] = f'<{request.path}?{urlencode(next_args)}>; rel="next"'
+    return response
+
 @revision_games_bp.route("/categories", methods=["GET"])
+@cached_response("categories")
 def get_categories():
-    # TODO: Implement DB fetch once postgres is set up
-    return jsonify([])
-    
-    # conn = get_connection()
-    # try:
-    #     with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-    #         cur.execute("SELECT id, name, description, icon_url, color FROM categories ORDER BY id")
-    #         rows = cur.fetchall()
-    #     return jsonify([dict(r) for r in rows])
-    # finally:
-    #     conn.close()
+    if not Config.DB_ENABLED:
+        return jsonify([])
+
+    try:
+        after_id, limit = _page_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    with db_cursor() as cur:
+        rows, next_cursor = fetch_categories_page(cur, after_id, limit)
+    return _paged_response(rows, next_cursor)
 
 @revision_games_bp.route("/categories", methods=["POST"])
 def create_category():
-    # Mock response for frontend testing
-    return jsonify({"id": 1, "name": "Mock Category", "description": "Temp mock"}), 201
-    
-    # data = request.json
-    # conn = get_connection()
-    # try:
-    #     with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-    #         cur.execute(
-    #             """INSERT INTO categories (name, description, icon_url, color)
-    #                VALUES (%s, %s, %s, %s)
-    #                RETURNING id, name, description, icon_url, color""",
-    #             (data["name"], data.get("description", ""), data.get("icon_url", ""), data.get("color", "bg-gray-100")),
-    #         )
-    #         cat = dict(cur.fetchone())
-    #     conn.commit()
-    #     return jsonify(cat), 201
-    # finally:
-    #     conn.close()
+    if not Config.DB_ENABLED:
+        # Mock response for frontend testing
+        return jsonify({"id": 1, "name": "Mock Category", "description": "Temp mock"}), 201
+
+    data = request.json
+    with db_cursor() as cur:
+        cur.execute(
+            """INSERT INTO categories (name, description, icon_url, color)
+               VALUES (%s, %s, %s, %s)
+               RETURNING id, name, description, icon_url, color""",
+            (data["name"], data.get("description", ""), data.get("icon_url", ""), data.get("color", "bg-gray-100")),
+        )
+        cat = dict(cur.fetchone())
+    invalidate("categories", f"category-{cat['id']}")
+    return jsonify(cat), 201
 
 # --- Questions ---
 
 @revision_games_bp.route("/categories/<int:category_id>/questions", methods=["GET"])
+@cached_response("category-{category_id}")
 def get_questions(category_id):
-    # TODO: Implement DB fetch
-    return jsonify([])
-    
-    # conn = get_connection()
-    # try:
-    #     with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-    #         cur.execute(
-    #             "SELECT id, category_id, target_item, correct_answer, audio_url FROM questions WHERE category_id = %s",
-    #             (category_id,),
-    #         )
-    #         questions = [dict(q) for q in cur.fetchall()]
-    #
-    #         for q in questions:
-    #             cur.execute(
-    #                 "SELECT id, label, image_url FROM question_options WHERE question_id = %s",
-    #                 (q["id"],),
-    #             )
-    #             q["options"] = [dict(o) for o in cur.fetchall()]
-    #
-    #     return jsonify(questions)
-    # finally:
-    #     conn.close()
+    if not Config.DB_ENABLED:
+        return jsonify([])
+
+    try:
+        after_id, limit = _page_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    with db_cursor() as cur:
+        questions, next_cursor = fetch_questions_page(cur, category_id, after_id, limit)
+    return _paged_response(questions, next_cursor)
+
+@revision_games_bp.route("/categories/<int:category_id>/bundle", methods=["GET"])
+@cached_response("category-{category_id}")
+def get_category_bundle(category_id):
+    """
+    Everything needed to play a category in one cacheable response: questions,
+    options, image URLs and sizes, feedback for every option and a prefetch
+    manifest (see game_bundle).
+    """
+    if not Config.DB_ENABLED:
+        return jsonify({"error": "Category not found."}), 404
+
+    with db_cursor() as cur:
+        category, truncated = fetch_category_bundle(cur, category_id, Config.BUNDLE_MAX_QUESTIONS)
+    if category is None:
+        return jsonify({"error": "Category not found."}), 404
+
+    with stage_timer("bundle_build"):
+        bundle = build_bundle(category, truncated)
+    return jsonify(bundle)
 
 @revision_games_bp.route("/categories/<int:category_id>/questions", methods=["POST"])
 def create_question(category_id):
-    # Mock response
-    return jsonify({"id": 1, "options": []}), 201
-    
-    # data = request.json
-    # conn = get_connection()
-    # try:
-    #     with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-    #         cur.execute(
-    #             """INSERT INTO questions (category_id, target_item, correct_answer, audio_url)
-    #                VALUES (%s, %s, %s, %s) RETURNING id""",
-    #             (category_id, data["target_item"], data["correct_answer"], data.get("audio_url")),
-    #         )
-    #         q_id = cur.fetchone()["id"]
-    #
-    #         options = []
-    #         for opt in data.get("options", []):
-    #             cur.execute(
-    #                 """INSERT INTO question_options (question_id, label, image_url)
-    #                    VALUES (%s, %s, %s) RETURNING id, label, image_url""",
-    #                 (q_id, opt["label"], opt.get("image_url", "")),
-    #             )
-    #             options.append(dict(cur.fetchone()))
-    #
-    #     conn.commit()
-    #     return jsonify({"id": q_id, "options": options}), 201
-    # finally:
-    #     conn.close()
+    if not Config.DB_ENABLED:
+        # Mock response
+        return jsonify({"id": 1, "options": []}), 201
+
+    data = request.json
+    with db_cursor() as cur:
+        cur.execute(
+            """INSERT INTO questions (category_id, target_item, correct_answer, audio_url)
+               VALUES (%s, %s, %s, %s) RETURNING id""",
+            (category_id, data["target_item"], data["correct_answer"], data.get("audio_url")),
+        )
+        q_id = cur.fetchone()["id"]
+
+        options = []
+        for opt in data.get("options", []):
+            cur.execute(
+                """INSERT INTO question_options (question_id, label, image_url)
+                   VALUES (%s, %s, %s) RETURNING id, label, image_url""",
+                (q_id, opt["label"], opt.get("image_url", "")),
+            )
+            options.append(dict(cur.fetchone()))
+
+    invalidate(f"category-{category_id}")
+    return jsonify({"id": q_id, "options": options}), 201
 
 # --- AI Generation ---
 
+STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def encode_event(event: dict, sse: bool) -> str:
+    """One generation event as a Server-Sent Event or an NDJSON line."""
+    payload = json.dumps(event)
+    return f"event: {event['type']}\ndata: {payload}\n\n" if sse else payload + "\n"
+
+def _json_body():
+    """
+    The parsed JSON body, whatever its Content-Type, or None when it is
+    missing or invalid: the same parsing as async_routes.AsyncRequest, so
+    both serving modes answer a bad body with the same 400.
+    """
+    return request.get_json(force=True, silent=True)
+
+def _stream_events(events, sse: bool) -> Response:
+    """Wraps generation events as Server-Sent Events or newline-delimited JSON."""
+    def body():
+        try:
+            for event in events:
+                yield encode_event(event, sse)
+        except Exception as e:
+            logger.error(f"Stream Error: {e}")
+            yield encode_event({"type": "error", "error": str(e)}, sse)
+
+    return Response(
+        body(),
+        mimetype="text/event-stream" if sse else "application/x-ndjson",
+        headers=STREAM_HEADERS,
+    )
+
 @revision_games_bp.route("/generate", methods=["POST"])
 def ai_generate_questions():
     """
     Triggers the Gemini text generation and AI image generation.
+
+    With `?stream=1` the response is streamed as NDJSON (or SSE when the client
+    sends `Accept: text/event-stream` or uses `?stream=sse`): each question event
+    goes out as soon as it is parsed from the streamed text, and image events
+    follow as each option image is ready.
+
+    With `"reuse": true` in the body, a previously generated game for a similar
+    request is returned instead when one is close enough (`"shuffleOptions":
+    true` reorders its options).
     """
-    data = request.json
+    data = _json_body()
+    if not isinstance(data, dict):
+        return jsonify({"error": "The JSON body must be an object."}), 400
     game_topic = data.get("gameTopic", "General Knowledge")
     subject = data.get("subject", "General")
     description = data.get("description", "")
+    stream = request.args.get("stream", "")
+    streaming = bool(stream) and stream != "0"
+    sse = stream == "sse" or request.accept_mimetypes.best == "text/event-stream"
     
     print(f"Mochi AI Request: {game_topic} | {subject}")
 
+    if data.get("reuse"):
+        match = find_similar_game(game_topic, subject, description, bool(data.get("shuffleOptions")))
+        CACHE_EVENTS.inc("game_bank", "hit" if match else "miss")
+        if match:
+            similarity, questions = match
+            headers = {"X-Mochi-Reused": f"{similarity:.3f}"}
+            if streaming:
+                events = [{"type": "question", "index": i, "question": q} for i, q in enumerate(questions)]
+                events.append({"type": "done", "questions": len(questions)})
+                response = _stream_events(events, sse)
+                response.headers.update(headers)
+                return response
+            return jsonify(questions), 200, headers
+
+    if streaming:
+        generation = iter_game_events(game_topic, subject, description)
+        first = next(generation)
+        if first["type"] == "done":
+            return jsonify({"error": "Failed to generate content."}), 500
+
+        def events():
+            questions = []
+            for event in itertools.chain([first], generation):
+                if event["type"] == "question":
+                    questions.append(event["question"])
+                yield event
+            remember_game(game_topic, subject, description, questions)
+
+        return _stream_events(events(), sse)
+
     try:
-        generated_data = generate_questions(
-            game_topic=game_topic,
-            subject=subject,
-            description=description
-        )
+        with stage_timer("generate_pipeline"):
+            generated_data = generate_questions(
+                game_topic=game_topic,
+                subject=subject,
+                description=description
+            )
         
         if not generated_data:
             return jsonify({"error": "Failed to generate content."}), 500
 
-        return jsonify(generated_data)
+        remember_game(game_topic, subject, description, generated_data)
+
+        with stage_timer("generate_serialize"):
+            return jsonify(generated_data)
 
     except Exception as e:
         print(f"Route Error: {e}")
         return jsonify({"error": str(e)}), 500
 
+# --- Background Generation Jobs ---
+
+@revision_games_bp.route("/generate/jobs", methods=["POST"])
+def create_generation_job():
+    """Queues a generation and returns its job id straight away."""
+    data = request.json
+    if not isinstance(data, dict):
+        return jsonify({"error": "The JSON body must be an object."}), 400
+    try:
+        job = get_job_manager().submit(
+            game_topic=data.get("gameTopic", "General Knowledge"),
+            subject=data.get("subject", "General"),
+            description=data.get("description", ""),
+        )
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 503
+
+    return jsonify(job), 202, {"Location": f"/api/generate/jobs/{job['id']}"}
+
+@revision_games_bp.route("/generate/jobs/<job_id>", methods=["GET"])
+def get_generation_job(job_id):
+    """Job status, with whatever questions and images are ready so far."""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found."}), 404
+    return jsonify(job)
+
+@revision_games_bp.route("/generate/jobs/<job_id>", methods=["DELETE"])
+def cancel_generation_job(job_id):
+    job = get_job_manager().cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found."}), 404
+    return jsonify(job)
+
+# --- Generated Image Assets ---
+
+@revision_games_bp.route("/images/<asset_id>", methods=["GET"])
+def get_image(asset_id):
+    """
+    Serves a generated image. Asset ids are content hashes, so the response
+    never changes and can be cached by the browser indefinitely.
+
+    `?w=256` asks for a resized variant; the format (AVIF, WebP, or the
+    original PNG) follows the Accept header.
+    """
+    found = image_store.find(asset_id)
+    if not found:
+        abort(404)
+
+    path, mime = found
+    etag = asset_id
+    width = request.args.get("w", type=int)
+    variant = best_variant(asset_id, width, request.accept_mimetypes) if width else None
+    if variant:
+        path, mime, size = variant
+        etag = f"{asset_id}-{size}.{MIME_EXTENSIONS[mime]}"
+
+    response = send_file(path, mimetype=mime, etag=etag, conditional=True, max_age=31536000)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    if width:
+        response.vary.add("Accept")
+    return response
+
 # --- AI Feedback ---
 
 @revision_games_bp.route("/feedback", methods=["POST"])
 def get_feedback():
-    data = request.json
-    result = generate_feedback(
-        user_answer=data["user_answer"],
-        correct_answer=data["correct_answer"],
-        target_item=data["target_item"],
-    )
+    data = _json_body()
+    try:
+        user_answer, correct_answer, target_item = data["user_answer"], data["correct_answer"], data["target_item"]
+    except (KeyError, TypeError):
+        return jsonify({"error": "user_answer, correct_answer and target_item are required."}), 400
+
+    with stage_timer("feedback_pipeline"):
+        result = generate_feedback(
+            user_answer=user_answer,
+            correct_answer=correct_answer,
+            target_item=target_item,
+        )
     return jsonify(result)
 
+def _bank_questions(data) -> list:
+    """Validates a posted feedback bank request. Raises ValueError if invalid."""
+    questions = data.get("questions") if isinstance(data, dict) else None
+    if not isinstance(questions, list):
+        raise ValueError("questions must be a list.")
+    if len(questions) > Config.FEEDBACK_BANK_MAX_QUESTIONS:
+        raise ValueError(f"At most {Config.FEEDBACK_BANK_MAX_QUESTIONS} questions per request.")
+
+    cleaned = []
+    for q in questions:
+        options = q.get("options") if isinstance(q, dict) else None
+        if (not isinstance(options, list) or not 0 < len(options) <= Config.FEEDBACK_BANK_MAX_OPTIONS
+                or not all(isinstance(o, dict) and isinstance(o.get("label"), str) and o["label"] for o in options)):
+            raise ValueError(f"Each question needs 1 to {Config.FEEDBACK_BANK_MAX_OPTIONS} options with a label.")
+        target_item = q.get("questionText") or q.get("target_item") or ""
+        correct_answer = q.get("correct_answer") or ""
+        if not isinstance(target_item, str) or not isinstance(correct_answer, str):
+            raise ValueError("questionText, target_item and correct_answer must be strings.")
+        cleaned.append({"questionText": target_item, "correct_answer": correct_answer,
+                        "options": [{"label": o["label"]} for o in options]})
+    return cleaned
+
+@revision_games_bp.route("/feedback/bank", methods=["POST"])
+def precompute_feedback_bank():
+    """Queues feedback generation for every option of the posted questions."""
+    try:
+        questions = _bank_questions(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    prime_feedback_bank(questions)
+    return jsonify({"queued": sum(len(q["options"]) for q in questions)}), 202
+
 # --- Save Generated Game ---
 
 @revision_games_bp.route("/activities", methods=["POST"])
 def save_activity():
-    # Frontend handles local save for now
-    return jsonify({"message": "OK", "id": 1}), 201
-    
-    # data = request.json
-    # conn = get_connection()
-    # try:
-    #     with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-    #         cur.execute(
-    #             """INSERT INTO categories (name, description, icon_url, color)
-    #                VALUES (%s, %s, %s, %s) RETURNING id""",
-    #             (data["category_name"], data.get("description", ""), "Sparkles", "bg-cyan-100"),
-    #         )
-    #         cat_id = cur.fetchone()["id"]
-    #
-    #         for qd in data.get("questions", []):
-    #             cur.execute(
-    #                 """INSERT INTO questions (category_id, target_item, correct_answer)
-    #                    VALUES (%s, %s, %s) RETURNING id""",
-    #                 (cat_id, qd.get("questionText", "Look!"), qd.get("correct_answer", "Option 1")),
-    #             )
-    #             q_id = cur.fetchone()["id"]
-    #
-    #             for opt in qd.get("options", []):
-    #                 cur.execute(
-    #                     """INSERT INTO question_options (question_id, label, image_url)
-    #                        VALUES (%s, %s, %s)""",
-    #                     (q_id, opt["label"], opt.get("image_url", "")),
-    #                 )
-    #
-    #     conn.commit()
-    #     return jsonify({"message": "Saved!", "id": cat_id}), 201
-    # except Exception as e:
-    #     conn.rollback()
-    #     return jsonify({"error": str(e)}), 500
-    # finally:
-    #     conn.close()
+    if not Config.DB_ENABLED:
+        # Frontend handles local save for now
+        return jsonify({"message": "OK", "id": 1}), 201
+
+    data = request.json
+    try:
+        with db_cursor() as cur:
+            cat_id = insert_categories(cur, [activity_to_category(data)])[0]
+        invalidate("categories", f"category-{cat_id}")
+        return jsonify({"message": "Saved!", "id": cat_id}), 201
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
 # --- Progress Logs ---
 
+def _progress_record(data: dict) -> dict:
+    """Validates a posted game result. Raises ValueError if invalid."""
+    try:
+        record = {
+            "category_id": int(data["category_id"]),
+            "student_session": str(data["student_session"]),
+            "score": int(data.get("score", 0)),
+            "total_questions": int(data.get("total_questions", 0)),
+        }
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("category_id, student_session, score and total_questions are required.")
+    if not record["student_session"] or len(record["student_session"]) > 100:
+        raise ValueError("Invalid student_session.")
+    return record
+
 @revision_games_bp.route("/progress", methods=["POST"])
 def save_progress():
-    # TODO: Implement progress tracking in DB
-    return jsonify({"id": 1, "completed_at": "2026-02-22T23:37:29"}), 201
-    
-    # data = request.json
-    # conn = get_connection()
-    # try:
-    #     with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-    #         cur.execute(
-    #             """INSERT INTO game_progress (category_id, student_session, score, total_questions)
-    #                VALUES (%s, %s, %s, %s)
-    #                RETURNING id, completed_at""",
-    #             (data["category_id"], data["student_session"], data["score"], data["total_questions"]),
-    #         )
-    #         res = dict(cur.fetchone())
-    #         if res["completed_at"]:
-    #             res["completed_at"] = res["completed_at"].isoformat()
-    #     conn.commit()
-    #     return jsonify(res), 201
-    # finally:
-    #     conn.close()
+    """
+    Records a finished game. With PROGRESS_BUFFER_ENABLED the row is queued
+    and written in the next batch (202); otherwise it is written now (201).
+    """
+    if not Config.DB_ENABLED:
+        return jsonify({"id": 1, "completed_at": "2026-02-22T23:37:29"}), 201
+
+    try:
+        record = _progress_record(request.json or {})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if Config.PROGRESS_BUFFER_ENABLED:
+        try:
+            get_progress_buffer().add(record)
+        except BufferFullError as e:
+            return jsonify({"error": str(e)}), 503, {"Retry-After": str(int(Config.PROGRESS_FLUSH_SECONDS) + 1)}
+        return jsonify({"status": "queued"}), 202
+
+    with db_cursor() as cur:
+        record_progress(cur, [record])
+    return jsonify({"status": "saved"}), 201
+
+@revision_games_bp.route("/progress/stats", methods=["GET"])
+def get_progress_stats():
+    """Per-category attempts, average score and last played time, paginated like /categories."""
+    if not Config.DB_ENABLED:
+        return jsonify([])
+
+    try:
+        after_id, limit = _page_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    with db_cursor() as cur:
+        rows, next_cursor = fetch_category_stats_page(cur, after_id, limit)
+    return _paged_response(rows, next_cursor)
+
+@revision_games_bp.route("/progress/stats/sessions/<path:student_session>", methods=["GET"])
+def get_session_stats(student_session):
+    """A student session's totals and per-category stats."""
+    if not Config.DB_ENABLED:
+        return jsonify({"student_session": student_session, "attempts": 0, "average_score": 0.0,
+                        "average_percent": 0.0, "last_played": None, "categories": []})
+
+    with db_cursor() as cur:
+        return jsonify(fetch_session_stats(cur, student_session))
 
 @revision_games_bp.route("/activities/recent", methods=["GET"])
+@cached_response("categories")
 def get_recent_activities():
-    # TODO: Fetch from DB
-    return jsonify([])
-    
-    # conn = get_connection()
-    # try:
-    #     with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-    #         cur.execute(
-    #             "SELECT id, name, description, icon_url, color FROM categories ORDER BY created_at DESC LIMIT 5"
-    #         )
-    #         rows = [dict(r) for r in cur.fetchall()]
-    #     return jsonify(rows)
-    # finally:
-    #     conn.close()
\ No newline at end of file
+    if not Config.DB_ENABLED:
+        return jsonify([])
+
+    with db_cursor() as cur:
+        cur.execute(
+            "SELECT id, name, description, icon_url, color FROM categories ORDER BY created_at DESC LIMIT 5"
+        )
+        rows = [dict(r) for r in cur.fetchall()]
+    return jsonify(rows)
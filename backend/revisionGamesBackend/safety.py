@@ -0,0 +1,145 @@
+"""
+Safety Matcher
+===============
+Blocklist matching for everything that reaches the models.
+
+All terms are compiled into one regular expression, factored as a prefix
+trie so matching cost barely grows with the size of the list. Matches must
+sit on word boundaries (so "warm" is not "war").
+
+Blocklist entries:
+- `term`:   matched as written; list inflections and compounds that must
+            also be blocked ("war", "wars", "warfare") as entries of their own
+- `term*`:  any word that starts with `term` ("gun*" blocks "guns",
+            "gunshot", "gunfire"); only for stems whose continuations are
+            almost never innocent
+- `!phrase`: allowed; a blocked term inside it is ignored ("bullet journal",
+            "pillow fight", "swordfish")
+"""
+
+import bisect
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BLOCKLIST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "safety_blocklist.txt")
+
+def _normalize(text: str) -> str:
+    return " ".join(str(text).split()).casefold()
+
+
+def load_blocklist(path: str) -> list:
+    """One term per line; blank lines and `#` comments are ignored."""
+    terms = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            term = line.split("#", 1)[0].strip()
+            if term:
+                terms.append(term)
+    return terms
+
+
+def _trie_pattern(terms) -> str:
+    """Build a regex alternation factored by shared prefixes."""
+    trie = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch != ""]
+        if not branches:
+            return ""
+        ends_here = "" in node
+        if len(branches) == 1 and not ends_here:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        return group + "?" if ends_here else group
+
+    return build(trie)
+
+
+class SafetyMatcher:
+    """Precompiled, word-boundary-aware blocklist matcher."""
+
+    def __init__(self, entries):
+        exact, prefixes, allowed = set(), set(), set()
+        for entry in entries:
+            entry = _normalize(entry)
+            if entry.startswith("!"):
+                allowed.add(_normalize(entry[1:]))
+            elif entry.endswith("*"):
+                prefixes.add(_normalize(entry[:-1]))
+            else:
+                exact.add(entry)
+        exact.discard("")
+        prefixes.discard("")
+        allowed.discard("")
+        self.terms = sorted(exact | prefixes)
+        self.allowed = sorted(allowed)
+
+        branches = []
+        if prefixes:
+            # The rest of the word, whatever it is
+            branches.append("(?:" + _trie_pattern(prefixes) + r")\w*")
+        if exact:
+            branches.append("(?:" + _trie_pattern(exact) + ")")
+        self._regex = re.compile(r"(?<!\w)(?:" + "|".join(branches) + r")(?!\w)") if branches else None
+        self._allowed = re.compile(r"(?<!\w)(?:" + _trie_pattern(allowed) + r")(?!\w)") if allowed else None
+
+    def _blocked(self, text: str):
+        """Blocked matches in normalised `text`, minus those inside an allowed phrase."""
+        matches = self._regex.finditer(text)
+        if self._allowed is None:
+            return matches
+        spans = [m.span() for m in self._allowed.finditer(text)]
+        if not spans:
+            return matches
+        return (m for m in matches if not any(start <= m.start() and m.end() <= end for start, end in spans))
+
+    def find(self, text: str):
+        """Return the first blocked term found in `text`, or None."""
+        if self._regex is None or not text:
+            return None
+        match = next(iter(self._blocked(_normalize(text))), None)
+        return match.group(0) if match else None
+
+    def is_safe(self, text: str) -> bool:
+        return self.find(text) is None
+
+    def check_batch(self, texts) -> list:
+        """
+        Scan many texts in a single pass. Returns one entry per input: the
+        first blocked term found in it, or None when it is safe.
+        """
+        texts = [_normalize(t) if t else "" for t in texts]
+        results = [None] * len(texts)
+        if self._regex is None or not texts:
+            return results
+
+        # Newlines never occur in normalised text, so they act as hard separators
+        starts = []
+        offset = 0
+        for t in texts:
+            starts.append(offset)
+            offset += len(t) + 1
+
+        for match in self._blocked("\n".join(texts)):
+            index = bisect.bisect_right(starts, match.start()) - 1
+            if results[index] is None:
+                results[index] = match.group(0)
+        return results
+
+
+def build_matcher(path: str = None) -> SafetyMatcher:
+    """Matcher for the blocklist file at `path` (the bundled list by default)."""
+    path = path or DEFAULT_BLOCKLIST_PATH
+    try:
+        return SafetyMatcher(load_blocklist(path))
+    except OSError as e:
+        logger.error(f"🛡️ Could not load safety blocklist '{path}': {e}; using the bundled list.")
+        return SafetyMatcher(load_blocklist(DEFAULT_BLOCKLIST_PATH))
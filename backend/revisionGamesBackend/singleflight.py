@@ -0,0 +1,243 @@
+"""
+Single Flight
+==============
+Coalesces identical work that is already in flight. When a class of
+teachers uses the same template, their identical requests arrive together:
+the first caller for a key does the work and every concurrent duplicate
+waits for it and shares the result instead of paying for another model call.
+
+- SingleFlight:   across the threads of one process
+- AsyncSingleFlight: across the coroutines of one event loop
+- DatabaseFlight: across processes and hosts, using a lease row per key in
+                  the `request_flights` table, which also hands the result
+                  to callers in other processes (JSON results only)
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+import psycopg2
+from .revision_config import db_connection
+
+logger = logging.getLogger(__name__)
+
+
+def flight_key(*parts) -> str:
+    """Stable key (hex sha256) for normalised request parts."""
+    normalized = [" ".join(str(p).split()).casefold() for p in parts]
+    return hashlib.sha256(json.dumps(normalized).encode("utf-8")).hexdigest()
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    In-process request coalescing. `do(key, fn)` runs fn once per key at a
+    time; callers arriving while it runs get the same result (or exception).
+    With a `DatabaseFlight`, the leader also coalesces with other processes.
+    """
+
+    def __init__(self, shared: "DatabaseFlight" = None):
+        self.shared = shared
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn, store_if=bool):
+        """
+        Returns (result, shared), where `shared` is True when the result came
+        from someone else's call. `store_if(result)` decides whether a
+        result may be handed to other processes.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            if self.shared is not None:
+                call.result, shared = self.shared.do(key, fn, store_if)
+            else:
+                call.result, shared = fn(), False
+            return call.result, shared
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines: duplicates await the leader's task instead of blocking a thread."""
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key: str, fn):
+        """Awaits fn() once per key at a time; returns (result, shared) like SingleFlight.do."""
+        task = self._calls.get(key)
+        if task is not None:
+            # shield: a follower that gives up must not cancel everyone else's call
+            return await asyncio.shield(task), True
+
+        task = self._calls[key] = asyncio.ensure_future(fn())
+        task.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(task), False
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+class DatabaseFlight:
+    """
+    Cross-process coalescing through Postgres. The leader claims a lease on
+    the key's `request_flights` row, renews it while it works and stores the
+    JSON result there; other processes poll for that result and take over if
+    the lease runs out (the leader went away). Finished results are served to
+    late duplicates for `ttl_seconds`.
+
+    Every database step is a short transaction on a pooled connection, so
+    no connection is held while the generation runs. Once fn() has run, a
+    database error only costs sharing its result; fn() is never run again.
+    """
+
+    CLAIM_SQL = """
+        INSERT INTO request_flights (key, owner, leased_until)
+        VALUES (%(key)s, %(owner)s, NOW() + %(lease)s * INTERVAL '1 second')
+        ON CONFLICT (key) DO UPDATE
+            SET owner = EXCLUDED.owner, leased_until = EXCLUDED.leased_until, result = NULL, finished_at = NULL
+            WHERE (request_flights.finished_at IS NULL
+                   OR request_flights.finished_at < NOW() - %(ttl)s * INTERVAL '1 second')
+              AND (request_flights.leased_until IS NULL OR request_flights.leased_until < NOW())
+        RETURNING key
+    """
+
+    def __init__(self, ttl_seconds: float, wait_timeout: float, poll_interval: float, lease_seconds: float = 30.0):
+        self.ttl_seconds = ttl_seconds
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+
+    def _fetch(self, cur, key: str):
+        cur.execute(
+            "SELECT result FROM request_flights"
+            " WHERE key = %s AND finished_at > NOW() - %s * INTERVAL '1 second'",
+            (key, self.ttl_seconds),
+        )
+        row = cur.fetchone()
+        return row[0] if row else None
+
+    def _claim(self, key: str, owner: str):
+        """One short transaction: ("result", value) if finished, ("lead", None) if claimed, else None."""
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cached = self._fetch(cur, key)
+                if cached is not None:
+                    return "result", cached
+                cur.execute(self.CLAIM_SQL, {"key": key, "owner": owner,
+                                             "lease": self.lease_seconds, "ttl": self.ttl_seconds})
+                if cur.fetchone() is not None:
+                    return "lead", None
+        return None
+
+    def _renew(self, key: str, owner: str, stop: threading.Event):
+        """Heartbeat: extend the lease every third of it until `stop` is set."""
+        while not stop.wait(self.lease_seconds / 3):
+            try:
+                with db_connection() as conn:
+                    with conn.cursor() as cur:
+                        cur.execute(
+                            "UPDATE request_flights SET leased_until = NOW() + %s * INTERVAL '1 second'"
+                            " WHERE key = %s AND owner = %s",
+                            (self.lease_seconds, key, owner),
+                        )
+            except psycopg2.Error as e:
+                logger.warning(f"🛬 Could not renew single flight lease: {e}")
+
+    def _finish(self, key: str, owner: str, result, share: bool):
+        """Store the result for other processes (or give the lease up). Never raises."""
+        try:
+            with db_connection() as conn:
+                with conn.cursor() as cur:
+                    if share:
+                        cur.execute(
+                            "UPDATE request_flights SET result = %s, finished_at = NOW(), leased_until = NULL"
+                            " WHERE key = %s AND owner = %s",
+                            (json.dumps(result), key, owner),
+                        )
+                    else:
+                        cur.execute("DELETE FROM request_flights WHERE key = %s AND owner = %s AND finished_at IS NULL",
+                                    (key, owner))
+                    cur.execute(
+                        "DELETE FROM request_flights WHERE finished_at < NOW() - %s * INTERVAL '1 second'"
+                        " OR (finished_at IS NULL AND leased_until < NOW() - %s * INTERVAL '1 second')",
+                        (self.ttl_seconds, self.ttl_seconds),
+                    )
+        except psycopg2.Error as e:
+            logger.error(f"🛬 Could not share result with other processes: {e}")
+
+    def _lead(self, key: str, owner: str, fn, store_if):
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._renew, args=(key, owner, stop), daemon=True,
+                                     name="mochi-flight-lease")
+        heartbeat.start()
+        try:
+            result = fn()
+        except Exception:
+            stop.set()
+            self._finish(key, owner, None, share=False)
+            raise
+        stop.set()
+        self._finish(key, owner, result, share=bool(store_if(result)))
+        return result
+
+    def _wait_or_claim(self, key: str, owner: str):
+        """("result", value), ("lead", None), or None when the wait for another process timed out."""
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            outcome = self._claim(key, owner)
+            if outcome is not None:
+                return outcome
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+    def do(self, key: str, fn, store_if=bool):
+        """Returns (result, shared), like SingleFlight.do."""
+        owner = f"{socket.gethostname()[:20]}:{os.getpid()}:{uuid.uuid4().hex[:16]}"
+        try:
+            outcome = self._wait_or_claim(key, owner)
+        except psycopg2.Error as e:
+            logger.error(f"🛬 Cross-process single flight unavailable, running locally: {e}")
+            return fn(), False
+        if outcome is None:
+            logger.warning("🛬 Gave up waiting on another process's identical request; running it here.")
+            return fn(), False
+        if outcome[0] == "result":
+            return outcome[1], True
+        return self._lead(key, owner, fn, store_if), False
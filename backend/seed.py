@@ -1,75 +1,104 @@
 """
 Seed script — run once to populate initial categories and questions.
 Usage: python seed.py
+       python seed.py --pack questions.json   (or .csv) to load a question pack
+
+JSON packs look like:
+    {"categories": [{"name": "Fruits", "description": "...", "icon_url": "...", "color": "bg-red-100",
+                     "questions": [{"target_item": "Apple", "correct_answer": "Apple",
+                                    "options": [{"label": "Apple", "image_url": "..."}]}]}]}
+
+CSV packs have one row per option with the columns
+    category, target_item, correct_answer, option_label, option_image_url
+and optionally category_description, category_icon_url, category_color.
 """
 
-from revisionGamesBackend.revision_config import get_connection, init_db
+import argparse
+import csv
+import json
+from revisionGamesBackend.revision_config import db_connection, init_db
+from revisionGamesBackend.revision_queries import insert_categories
+from revisionGamesBackend.response_cache import invalidate
+
+
+DEFAULT_PACK = [
+    {"name": "Fruits", "description": "Learn fruits using games", "icon_url": "https://images.unsplash.com/photo-1619566636858-adf3ef46400b?w=400&h=300&fit=crop", "color": "bg-red-100",
+     "questions": [
+         {"target_item": "Apple", "correct_answer": "Apple", "options": [
+             {"label": "Apple", "image_url": "https://images.unsplash.com/photo-1560806887-1e4cd0b6cbd6?w=300&h=300&fit=crop"},
+             {"label": "Banana", "image_url": "https://images.unsplash.com/photo-1571771894821-ce9b6c11b08e?w=300&h=300&fit=crop"},
+             {"label": "Grapes", "image_url": "https://images.unsplash.com/photo-1537640538966-79f369143f8f?w=300&h=300&fit=crop"},
+         ]},
+         {"target_item": "Banana", "correct_answer": "Banana", "options": [
+             {"label": "Orange", "image_url": "https://images.unsplash.com/photo-1547514701-42782101795e?w=300&h=300&fit=crop"},
+             {"label": "Banana", "image_url": "https://images.unsplash.com/photo-1571771894821-ce9b6c11b08e?w=300&h=300&fit=crop"},
+             {"label": "Strawberry", "image_url": "https://images.unsplash.com/photo-1464965911861-746a04b4bca6?w=300&h=300&fit=crop"},
+         ]},
+     ]},
+    {"name": "Numbers", "description": "Count and learn numbers", "icon_url": "https://images.unsplash.com/photo-1509228468518-180dd4864904?w=400&h=300&fit=crop", "color": "bg-blue-100"},
+    {"name": "Shapes", "description": "Identify different shapes", "icon_url": "https://images.unsplash.com/photo-1558618666-fcd25c85cd64?w=400&h=300&fit=crop", "color": "bg-purple-100"},
+    {"name": "Animals", "description": "Meet friendly animals", "icon_url": "https://images.unsplash.com/photo-1474511320723-9a56873571b7?w=400&h=300&fit=crop", "color": "bg-green-100"},
+    {"name": "Colours", "description": "Explore rainbow colours", "icon_url": "https://images.unsplash.com/photo-1502691876148-a84978e59af8?w=400&h=300&fit=crop", "color": "bg-yellow-100"},
+    {"name": "Vegetables", "description": "Healthy veggies fun", "icon_url": "https://images.unsplash.com/photo-1540420773420-3366772f4999?w=400&h=300&fit=crop", "color": "bg-orange-100"},
+]
+
+
+def load_pack(path: str) -> list:
+    """Read a JSON or CSV question pack into a list of category dicts."""
+    if path.lower().endswith(".csv"):
+        categories = {}
+        questions = {}
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                name = row["category"]
+                if name not in categories:
+                    categories[name] = {
+                        "name": name,
+                        "description": row.get("category_description") or "",
+                        "icon_url": row.get("category_icon_url") or "",
+                        "color": row.get("category_color") or "bg-gray-100",
+                        "questions": [],
+                    }
+                q_key = (name, row["target_item"], row["correct_answer"])
+                if q_key not in questions:
+                    questions[q_key] = {"target_item": row["target_item"], "correct_answer": row["correct_answer"], "options": []}
+                    categories[name]["questions"].append(questions[q_key])
+                questions[q_key]["options"].append(
+                    {"label": row["option_label"], "image_url": row.get("option_image_url") or ""}
+                )
+        return list(categories.values())
+
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return data["categories"] if isinstance(data, dict) else data
 
 
-def seed():
+def seed(pack_path: str = None):
     init_db()
 
-    conn = get_connection()
-    try:
+    with db_connection() as conn:
         with conn.cursor() as cur:
-            # Skip if data exists
-            cur.execute("SELECT COUNT(*) FROM categories")
-            if cur.fetchone()[0] > 0:
-                print("Database already seeded.")
-                return
-
-            categories_data = [
-                ("Fruits", "Learn fruits using games", "https://images.unsplash.com/photo-1619566636858-adf3ef46400b?w=400&h=300&fit=crop", "bg-red-100"),
-                ("Numbers", "Count and learn numbers", "https://images.unsplash.com/photo-1509228468518-180dd4864904?w=400&h=300&fit=crop", "bg-blue-100"),
-                ("Shapes", "Identify different shapes", "https://images.unsplash.com/photo-1558618666-fcd25c85cd64?w=400&h=300&fit=crop", "bg-purple-100"),
-                ("Animals", "Meet friendly animals", "https://images.unsplash.com/photo-1474511320723-9a56873571b7?w=400&h=300&fit=crop", "bg-green-100"),
-                ("Colours", "Explore rainbow colours", "https://images.unsplash.com/photo-1502691876148-a84978e59af8?w=400&h=300&fit=crop", "bg-yellow-100"),
-                ("Vegetables", "Healthy veggies fun", "https://images.unsplash.com/photo-1540420773420-3366772f4999?w=400&h=300&fit=crop", "bg-orange-100"),
-            ]
-
-            cat_ids = []
-            for name, desc, icon, color in categories_data:
-                cur.execute(
-                    """INSERT INTO categories (name, description, icon_url, color)
-                       VALUES (%s, %s, %s, %s) RETURNING id""",
-                    (name, desc, icon, color),
-                )
-                cat_ids.append(cur.fetchone()[0])
-
-            # Fruits questions (category index 0)
-            fruits_id = cat_ids[0]
-            fruits_questions = [
-                ("Apple", "Apple", [
-                    ("Apple", "https://images.unsplash.com/photo-1560806887-1e4cd0b6cbd6?w=300&h=300&fit=crop"),
-                    ("Banana", "https://images.unsplash.com/photo-1571771894821-ce9b6c11b08e?w=300&h=300&fit=crop"),
-                    ("Grapes", "https://images.unsplash.com/photo-1537640538966-79f369143f8f?w=300&h=300&fit=crop"),
-                ]),
-                ("Banana", "Banana", [
-                    ("Orange", "https://images.unsplash.com/photo-1547514701-42782101795e?w=300&h=300&fit=crop"),
-                    ("Banana", "https://images.unsplash.com/photo-1571771894821-ce9b6c11b08e?w=300&h=300&fit=crop"),
-                    ("Strawberry", "https://images.unsplash.com/photo-1464965911861-746a04b4bca6?w=300&h=300&fit=crop"),
-                ]),
-            ]
-
-            for target, correct, options in fruits_questions:
-                cur.execute(
-                    """INSERT INTO questions (category_id, target_item, correct_answer)
-                       VALUES (%s, %s, %s) RETURNING id""",
-                    (fruits_id, target, correct),
-                )
-                q_id = cur.fetchone()[0]
-                for label, img_url in options:
-                    cur.execute(
-                        """INSERT INTO question_options (question_id, label, image_url)
-                           VALUES (%s, %s, %s)""",
-                        (q_id, label, img_url),
-                    )
+            if pack_path:
+                categories = load_pack(pack_path)
+            else:
+                # Skip if data exists
+                cur.execute("SELECT COUNT(*) FROM categories")
+                if cur.fetchone()[0] > 0:
+                    print("Database already seeded.")
+                    return
+                categories = DEFAULT_PACK
+
+            cat_ids = insert_categories(cur, categories)
+
+    # Let running servers on this host drop their cached category lists
+    invalidate("categories", *(f"category-{cat_id}" for cat_id in cat_ids))
 
-        conn.commit()
-        print("✅ Database seeded successfully!")
-    finally:
-        conn.close()
+    n_questions = sum(len(c.get("questions", [])) for c in categories)
+    print(f"✅ Database seeded successfully! ({len(categories)} categories, {n_questions} questions)")
 
 
 if __name__ == "__main__":
-    seed()
+    parser = argparse.ArgumentParser(description="Seed the Mochi database.")
+    parser.add_argument("--pack", help="JSON or CSV question pack to load")
+    args = parser.parse_args()
+    seed(args.pack)
@@ -0,0 +1,11 @@
+"""
+Tests import the backend the way the app and benchmarks do
+(`from revisionGamesBackend import ...`), so backend/ goes on the path.
+
+Run from backend/:  python -m pytest tests
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,160 @@
+"""
+CallGovernor against the offline FakeBackend: retries and retry-after,
+the circuit breaker's open / half-open / closed cycle, and errors that must
+not be retried. Time is a fake clock, so nothing here actually waits.
+"""
+
+import asyncio
+import time
+import pytest
+from revisionGamesBackend.call_governor import CallGovernor, CircuitBreaker, CircuitOpenError
+from revisionGamesBackend.model_backends import FakeBackend, ModelBackendError
+
+
+class FakeClock:
+    """Monotonic clock that only moves when something sleeps on it."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def make_governor(clock: FakeClock = None, **overrides) -> CallGovernor:
+    settings = dict(rate=1000, burst=1000, max_concurrency=4, max_retries=3, base_delay=0.5, max_delay=8.0,
+                    failure_threshold=5, reset_timeout=30.0)
+    if clock is not None:
+        settings.update(clock=clock, sleep=clock.sleep)
+    settings.update(overrides)
+    return CallGovernor("test", **settings)
+
+
+def call_text(governor: CallGovernor, backend: FakeBackend):
+    return governor.call(backend.generate_text, "text-model", "Game Theme: Apples")
+
+
+def test_retries_wait_at_least_retry_after():
+    clock = FakeClock()
+    governor = make_governor(clock)
+    backend = FakeBackend(error_rate=1.0, error_status=429, retry_after=2.5)
+
+    with pytest.raises(ModelBackendError) as raised:
+        call_text(governor, backend)
+
+    assert raised.value.status == 429
+    assert backend.calls["text"] == 1 + governor.max_retries
+    assert len(clock.sleeps) == governor.max_retries
+    assert all(delay >= 2.5 for delay in clock.sleeps)
+
+
+def test_retry_succeeds_once_the_upstream_recovers():
+    clock = FakeClock()
+    governor = make_governor(clock)
+    backend = FakeBackend(error_rate=1.0, error_status=503, retry_after=1.0)
+
+    def flaky(model, prompt):
+        if backend.calls["errors"] == 2:
+            backend.error_rate = 0.0
+        return backend.generate_text(model, prompt)
+
+    assert governor.call(flaky, "text-model", "Game Theme: Apples")
+    assert backend.calls["text"] == 3
+    assert clock.sleeps and all(delay >= 1.0 for delay in clock.sleeps)
+    assert governor.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_backoff_without_retry_after_is_capped_full_jitter():
+    governor = make_governor(FakeClock(), base_delay=0.5, max_delay=4.0)
+    for attempt in range(8):
+        delay = governor.backoff(attempt)
+        assert 0.0 <= delay <= min(4.0, 0.5 * 2 ** attempt)
+
+
+def test_breaker_opens_after_threshold_and_fails_fast():
+    clock = FakeClock()
+    governor = make_governor(clock, max_retries=0, failure_threshold=3)
+    backend = FakeBackend(error_rate=1.0, error_status=503)
+
+    for _ in range(3):
+        with pytest.raises(ModelBackendError):
+            call_text(governor, backend)
+    assert governor.breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(CircuitOpenError) as raised:
+        call_text(governor, backend)
+    assert backend.calls["text"] == 3  # rejected without reaching the model
+    assert 0 < raised.value.retry_after <= governor.breaker.reset_timeout
+
+
+def test_breaker_half_opens_after_reset_timeout_and_closes_on_success():
+    clock = FakeClock()
+    governor = make_governor(clock, max_retries=0, failure_threshold=2, reset_timeout=30.0)
+    backend = FakeBackend(error_rate=1.0, error_status=503)
+    for _ in range(2):
+        with pytest.raises(ModelBackendError):
+            call_text(governor, backend)
+
+    clock.now += 29.0
+    with pytest.raises(CircuitOpenError):
+        call_text(governor, backend)
+
+    clock.now += 1.5
+    backend.error_rate = 0.0
+    assert call_text(governor, backend)
+    assert governor.breaker.state == CircuitBreaker.CLOSED
+    assert backend.calls["text"] == 3
+
+
+def test_half_open_trial_failure_reopens_the_breaker():
+    clock = FakeClock()
+    governor = make_governor(clock, max_retries=3, failure_threshold=2, reset_timeout=30.0)
+    backend = FakeBackend(error_rate=1.0, error_status=503)
+    with pytest.raises(ModelBackendError):
+        call_text(governor, backend)  # the second failure opens it, ending the retries
+    assert governor.breaker.state == CircuitBreaker.OPEN
+    assert backend.calls["text"] == 2
+
+    clock.now += 30.5
+    with pytest.raises(ModelBackendError) as raised:
+        call_text(governor, backend)  # the one trial call, not retried
+    assert not isinstance(raised.value, CircuitOpenError)
+    assert backend.calls["text"] == 3
+    assert governor.breaker.state == CircuitBreaker.OPEN
+
+
+@pytest.mark.parametrize("status", [400, 403])
+def test_non_retryable_errors_are_raised_at_once(status):
+    clock = FakeClock()
+    governor = make_governor(clock, failure_threshold=1)
+    backend = FakeBackend(error_rate=1.0, error_status=status, retry_after=5.0)
+
+    with pytest.raises(ModelBackendError) as raised:
+        call_text(governor, backend)
+
+    assert raised.value.status == status
+    assert backend.calls["text"] == 1
+    assert clock.sleeps == []
+    # The upstream answered; a refused request says nothing about its health
+    assert governor.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_async_retries_wait_at_least_retry_after():
+    # acall waits with asyncio.sleep, so this one runs on real time
+    governor = make_governor(base_delay=0.001)
+    backend = FakeBackend(error_rate=1.0, error_status=429, retry_after=0.02)
+
+    async def run():
+        started = time.monotonic()
+        with pytest.raises(ModelBackendError):
+            await governor.acall(backend.agenerate_text, "text-model", "Game Theme: Apples")
+        return time.monotonic() - started
+
+    elapsed = asyncio.run(run())
+    assert backend.calls["text"] == 1 + governor.max_retries
+    assert elapsed >= 0.02 * governor.max_retries
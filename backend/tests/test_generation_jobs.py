@@ -0,0 +1,153 @@
+"""
+Generation job stores: a job accepted by one worker can be read and
+cancelled through another (two FileJobStores on one directory stand in for
+two processes), finished jobs keep their verdict, and jobs past the TTL
+expire. Generation itself is replaced by a scripted event list.
+"""
+
+import time
+import pytest
+from revisionGamesBackend import generation_jobs
+from revisionGamesBackend.generation_jobs import (
+    JobManager, FileJobStore, MemoryJobStore, QueueFullError,
+    QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED, EXPIRED,
+)
+
+
+class ManualQueue:
+    """Holds submitted jobs until the test runs them."""
+
+    def __init__(self, full: bool = False):
+        self.full = full
+        self.tasks = []
+
+    def submit(self, handler, job_id: str):
+        if self.full:
+            raise QueueFullError("full")
+        self.tasks.append((handler, job_id))
+
+    def run_all(self):
+        for handler, job_id in self.tasks:
+            handler(job_id)
+        self.tasks.clear()
+
+
+def question(n: int) -> dict:
+    return {"id": f"q{n}", "options": [{"label": "a"}, {"label": "b"}]}
+
+
+@pytest.fixture(autouse=True)
+def no_game_bank(monkeypatch):
+    monkeypatch.setattr(generation_jobs, "remember_game", lambda *args: None)
+
+
+@pytest.fixture(params=["file", "memory"])
+def store(request, tmp_path):
+    if request.param == "file":
+        return FileJobStore(str(tmp_path), ttl_seconds=60)
+    return MemoryJobStore(ttl_seconds=60)
+
+
+def script(monkeypatch, events, on_event=None):
+    def fake_events(game_topic, subject, description):
+        for event in events:
+            if on_event:
+                on_event(event)
+            yield event
+    monkeypatch.setattr(generation_jobs, "iter_game_events", fake_events)
+
+
+def test_job_runs_to_success_with_progress(store, monkeypatch):
+    script(monkeypatch, [
+        {"type": "question", "question": question(1)},
+        {"type": "image"},
+        {"type": "image"},
+        {"type": "done"},
+    ])
+    queue = ManualQueue()
+    manager = JobManager(queue, store)
+    job = manager.submit("Apples", "Maths", "")
+    assert job["status"] == QUEUED
+
+    queue.run_all()
+    job = manager.get(job["id"])
+    assert job["status"] == SUCCEEDED
+    assert job["progress"] == {"imagesDone": 2, "imagesTotal": 2}
+    assert [q["id"] for q in job["questions"]] == ["q1"]
+
+
+def test_other_worker_sees_and_cancels_a_running_job(tmp_path, monkeypatch):
+    accepting = JobManager(ManualQueue(), FileJobStore(str(tmp_path), ttl_seconds=60))
+    other = JobManager(ManualQueue(), FileJobStore(str(tmp_path), ttl_seconds=60))
+    seen = []
+
+    def cancel_from_other_worker(event):
+        if event["type"] == "image":
+            seen.append(other.get(job_id)["status"])
+            other.cancel(job_id)
+
+    script(monkeypatch, [
+        {"type": "question", "question": question(1)},
+        {"type": "image"},
+        {"type": "image"},
+    ], on_event=cancel_from_other_worker)
+    job_id = accepting.submit("Apples", "Maths", "")["id"]
+    assert other.get(job_id)["status"] == QUEUED
+
+    accepting.queue.run_all()
+    assert seen == [RUNNING]
+    job = other.get(job_id)
+    assert job["status"] == CANCELLED
+    # The runner stopped at its first update after the cancel
+    assert job["progress"]["imagesDone"] == 0
+
+
+def test_cancelled_before_it_starts_never_runs(store, monkeypatch):
+    script(monkeypatch, [{"type": "question", "question": question(1)}])
+    queue = ManualQueue()
+    manager = JobManager(queue, store)
+    job_id = manager.submit("Apples", "Maths", "")["id"]
+    assert manager.cancel(job_id)["status"] == CANCELLED
+
+    queue.run_all()
+    job = manager.get(job_id)
+    assert job["status"] == CANCELLED
+    assert job["questions"] == []
+
+
+def test_finished_job_keeps_its_verdict(store, monkeypatch):
+    script(monkeypatch, [])
+    queue = ManualQueue()
+    manager = JobManager(queue, store)
+    job_id = manager.submit("Apples", "Maths", "")["id"]
+    queue.run_all()
+
+    assert manager.get(job_id)["status"] == FAILED
+    assert manager.cancel(job_id)["status"] == FAILED
+    assert not store.update(job_id, status=SUCCEEDED)
+
+
+def test_jobs_past_the_ttl_expire_then_drop(store, monkeypatch):
+    manager = JobManager(ManualQueue(), store)
+    job_id = manager.submit("Apples", "Maths", "")["id"]
+    store.ttl_seconds = 0
+    time.sleep(0.01)
+
+    assert manager.get(job_id)["status"] == EXPIRED
+    assert not store.update(job_id, status=RUNNING)
+    # Finished and past the TTL: gone
+    assert manager.get(job_id) is None
+
+
+def test_queue_full_leaves_no_record(store):
+    manager = JobManager(ManualQueue(full=True), store)
+    with pytest.raises(QueueFullError):
+        manager.submit("Apples", "Maths", "")
+    assert store._ids() == []
+
+
+def test_unknown_and_malformed_ids(tmp_path):
+    manager = JobManager(ManualQueue(), FileJobStore(str(tmp_path), ttl_seconds=60))
+    assert manager.get("0" * 32) is None
+    assert manager.get("../../etc/passwd") is None
+    assert manager.cancel("../../etc/passwd") is None